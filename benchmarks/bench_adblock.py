@@ -0,0 +1,84 @@
+import argparse
+import os
+import sys
+import time
+from urllib.parse import urlsplit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from web import AdBlocker, FilterMatcher
+
+DEFAULT_CORPUS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "urls.txt")
+
+
+class LinearMatcher:
+    # The matcher AdBlocker used before rules were compiled: one substring
+    # check per rule against the lowercased URL
+    def __init__(self, rules):
+        self.blocked_hosts = set(rules)
+
+    def matches(self, url, host):
+        for blocked_host in self.blocked_hosts:
+            if blocked_host in url:
+                return True
+        return False
+
+
+def builtin_rules():
+    return sorted(AdBlocker.BUILTIN_RULES)
+
+
+def synthetic_rules(count):
+    # Extra host rules so the scaling behaviour shows; none of them appear in the corpus
+    return [f"tracker-{i:06d}.adnet{i % 97}.com" for i in range(count)]
+
+
+def load_corpus(path):
+    requests = []
+    with open(path, encoding="utf-8") as corpus:
+        for line in corpus:
+            url = line.strip().lower()
+            if url:
+                requests.append((url, urlsplit(url).hostname or ""))
+    return requests
+
+
+def time_matcher(matcher, requests, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter_ns()
+        for url, host in requests:
+            matcher.matches(url, host)
+        elapsed = time.perf_counter_ns() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best / len(requests)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a URL corpus through the old and new ad block matchers")
+    parser.add_argument("--corpus", default=DEFAULT_CORPUS, help="file with one recorded request URL per line")
+    parser.add_argument("--sizes", default="0,1000,10000,100000",
+                        help="comma separated counts of extra synthetic rules to add to the built-in list")
+    parser.add_argument("--repeat", type=int, default=5, help="runs per measurement, the fastest is reported")
+    args = parser.parse_args()
+
+    requests = load_corpus(args.corpus)
+    base = builtin_rules()
+    print(f"corpus: {len(requests)} requests from {args.corpus}")
+    print(f"{'rules':>8} {'linear ns/req':>15} {'compiled ns/req':>17} {'speedup':>9} {'blocked':>9}")
+
+    for extra in (int(size) for size in args.sizes.split(",")):
+        rules = base + synthetic_rules(extra)
+        linear = LinearMatcher(rules)
+        compiled = FilterMatcher(rules)
+        blocked = sum(compiled.matches(url, host) for url, host in requests)
+
+        # Keep the slow path bounded on large rule sets
+        linear_repeat = args.repeat if len(rules) < 10000 else 1
+        linear_ns = time_matcher(linear, requests, linear_repeat)
+        compiled_ns = time_matcher(compiled, requests, args.repeat)
+        print(f"{len(rules):>8} {linear_ns:>15.0f} {compiled_ns:>17.0f} {linear_ns / compiled_ns:>8.1f}x {blocked:>9}")
+
+
+if __name__ == "__main__":
+    main()
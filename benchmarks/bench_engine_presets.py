@@ -0,0 +1,184 @@
+import argparse
+import functools
+import json
+import os
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from web import EngineConfig
+
+# Loopback addresses are separate sites to Chromium, so the process model has
+# something to group. Linux answers on all of 127.0.0.0/8; elsewhere only the
+# first one may bind
+HOSTS = ["127.0.0.1", "127.0.0.2", "127.0.0.3", "127.0.0.4"]
+
+WORDS = ("render process site cache layout paint script frame style image table list "
+         "memory budget thread raster heap compositor tile queue").split()
+
+
+class QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+def write_pages(directory, count, seed=20):
+    # Fixed page set: text, a table, SVG images, a stylesheet and a script
+    # that builds part of the DOM, so layout, raster and V8 all get work
+    rng = random.Random(seed)
+    with open(os.path.join(directory, "style.css"), "w", encoding="utf-8") as css:
+        css.write("body { font: 15px sans-serif; margin: 2em; } td { border: 1px solid #ccc; padding: 2px; }\n"
+                  ".card { display: inline-block; width: 180px; margin: 4px; box-shadow: 0 1px 4px #888; }\n")
+    with open(os.path.join(directory, "build.js"), "w", encoding="utf-8") as script:
+        script.write("const list = document.getElementById('cards');\n"
+                     "for (let i = 0; i < 1500; i++) {\n"
+                     "  const card = document.createElement('div');\n"
+                     "  card.className = 'card';\n"
+                     "  card.textContent = 'card ' + i + ' ' + Math.sqrt(i).toFixed(3);\n"
+                     "  list.appendChild(card);\n"
+                     "}\n")
+    for i in range(8):
+        with open(os.path.join(directory, f"image{i}.svg"), "w", encoding="utf-8") as image:
+            circles = "".join(f'<circle cx="{rng.randint(0, 400)}" cy="{rng.randint(0, 300)}" '
+                              f'r="{rng.randint(5, 60)}" fill="#{rng.randint(0, 0xffffff):06x}"/>'
+                              for _ in range(60))
+            image.write(f'<svg xmlns="http://www.w3.org/2000/svg" width="400" height="300">{circles}</svg>')
+    for page in range(count):
+        paragraphs = "".join("<p>" + " ".join(rng.choice(WORDS) for _ in range(120)) + "</p>" for _ in range(40))
+        rows = "".join("<tr>" + "".join(f"<td>{rng.random():.4f}</td>" for _ in range(8)) + "</tr>"
+                       for _ in range(150))
+        images = "".join(f'<img src="image{(page + i) % 8}.svg" width="200">' for i in range(6))
+        with open(os.path.join(directory, f"page{page}.html"), "w", encoding="utf-8") as html:
+            html.write(f"<!doctype html><title>page {page}</title><link rel=stylesheet href=style.css>"
+                       f"<h1>Page {page}</h1>{images}{paragraphs}<table>{rows}</table>"
+                       f"<div id=cards></div><script src=build.js></script>")
+
+
+def start_servers(directory):
+    servers = []
+    handler = functools.partial(QuietHandler, directory=directory)
+    for host in HOSTS:
+        try:
+            server = ThreadingHTTPServer((host, 0), handler)
+        except OSError:
+            continue
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+    return servers
+
+
+def run_child(preset, urls, timeout, settle):
+    # Runs in its own process: Chromium reads its flags once per process
+    import psutil
+    EngineConfig(preset).apply()
+    from PySide6.QtCore import QEventLoop, QTimer, QUrl
+    from PySide6.QtWidgets import QApplication
+    from PySide6.QtWebEngineCore import QWebEngineProfile, QWebEnginePage
+    from PySide6.QtWebEngineWidgets import QWebEngineView
+
+    app = QApplication(sys.argv[:1])
+    # Off the record, so no preset starts with a warm disk cache
+    profile = QWebEngineProfile(app)
+    views, load_ms, failed = [], [], 0
+    for url in urls:
+        view = QWebEngineView()
+        view.setPage(QWebEnginePage(profile, view))
+        view.resize(1280, 800)
+        view.show()
+        loop = QEventLoop()
+        result = {}
+        view.loadFinished.connect(lambda ok, result=result, loop=loop: (result.setdefault("ok", ok), loop.quit()))
+        QTimer.singleShot(int(timeout * 1000), loop.quit)
+        start = time.perf_counter()
+        view.load(QUrl(url))
+        loop.exec()
+        load_ms.append((time.perf_counter() - start) * 1000)
+        failed += not result.get("ok", False)
+        # Pages stay open, so memory reflects the whole set under this process model
+        views.append(view)
+
+    loop = QEventLoop()
+    QTimer.singleShot(int(settle * 1000), loop.quit)
+    loop.exec()
+
+    processes = [psutil.Process()] + psutil.Process().children(recursive=True)
+    memory = 0
+    for process in processes:
+        try:
+            info = process.memory_full_info()
+            # PSS splits shared pages between processes; RSS would count them once per process
+            memory += getattr(info, "pss", info.rss)
+        except psutil.Error:
+            pass
+    print(json.dumps({"preset": preset, "load_ms": load_ms, "failed": failed,
+                      "memory": memory, "processes": len(processes)}), flush=True)
+
+
+def measure(preset, urls, args):
+    env = dict(os.environ)
+    # Only the preset's flags, whatever the calling shell has set
+    env.pop("QTWEBENGINE_CHROMIUM_FLAGS", None)
+    if not args.visible:
+        env["QT_QPA_PLATFORM"] = "offscreen"
+    command = [sys.executable, os.path.abspath(__file__), "--child", preset,
+               "--timeout", str(args.timeout), "--settle", str(args.settle)] + urls
+    output = subprocess.run(command, env=env, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                            text=True, timeout=args.timeout * len(urls) + 120).stdout
+    for line in output.splitlines():
+        if line.startswith("{"):
+            return json.loads(line)
+    raise RuntimeError(f"preset {preset} produced no result")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare memory and page-load time across engine presets")
+    parser.add_argument("--presets", default="default,low-memory,throughput,headless-server")
+    parser.add_argument("--pages", type=int, default=12, help="pages in the local page set")
+    parser.add_argument("--timeout", type=float, default=30, help="seconds to wait for each page")
+    parser.add_argument("--settle", type=float, default=3, help="seconds to wait before measuring memory")
+    parser.add_argument("--visible", action="store_true", help="use the real display instead of offscreen")
+    parser.add_argument("--json", help="also write the results to this file")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    parser.add_argument("urls", nargs="*", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child, args.urls, args.timeout, args.settle)
+        return
+
+    directory = tempfile.mkdtemp(prefix="arcweb-pages-")
+    servers = []
+    try:
+        write_pages(directory, args.pages)
+        servers = start_servers(directory)
+        urls = [f"http://{server.server_address[0]}:{server.server_address[1]}/page{page}.html"
+                for page, server in zip(range(args.pages), (servers * args.pages))]
+        print(f"{args.pages} pages over {len(servers)} sites")
+        print(f"{'preset':<16} {'median ms':>10} {'max ms':>9} {'total ms':>9} {'memory MiB':>11} "
+              f"{'processes':>10} {'failed':>7}")
+        results = []
+        for preset in args.presets.split(","):
+            result = measure(preset, urls, args)
+            results.append(result)
+            load_ms = result["load_ms"]
+            print(f"{preset:<16} {statistics.median(load_ms):>10.1f} {max(load_ms):>9.1f} {sum(load_ms):>9.1f} "
+                  f"{result['memory'] / 2 ** 20:>11.1f} {result['processes']:>10} {result['failed']:>7}")
+        if args.json:
+            with open(args.json, "w", encoding="utf-8") as output:
+                json.dump(results, output, indent=2)
+    finally:
+        for server in servers:
+            server.shutdown()
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from urllib.parse import urlsplit
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from web import AdBlocker, FilterEngine
+from bench_adblock import DEFAULT_CORPUS, load_corpus
+
+
+def synthetic_list(path, count, seed=80):
+    # EasyList-shaped rules: mostly host anchors, some paths, options and exceptions
+    rng = random.Random(seed)
+    words = ["ad", "ads", "banner", "track", "pixel", "promo", "sponsor", "popup", "beacon", "stats"]
+    with open(path, "w", encoding="utf-8") as filter_list:
+        filter_list.write("[Adblock Plus 2.0]\n! Title: synthetic benchmark list\n")
+        for i in range(count):
+            word = rng.choice(words)
+            kind = rng.random()
+            if kind < 0.55:
+                filter_list.write(f"||{word}{i}.example{i % 500}.com^\n")
+            elif kind < 0.70:
+                filter_list.write(f"||cdn{i}.net^$third-party\n")
+            elif kind < 0.85:
+                filter_list.write(f"/{word}/{i:x}_\n")
+            elif kind < 0.93:
+                filter_list.write(f"/{word}*{i}.js$script,domain=site{i % 50}.com|~safe.site{i % 50}.com\n")
+            elif kind < 0.97:
+                filter_list.write(f"@@||good{i}.example.com^$image\n")
+            else:
+                filter_list.write(f"example{i % 300}.com##.{word}-{i}\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare parsing filter lists with loading the binary cache")
+    parser.add_argument("--list", help="EasyList/ABP file to load (default: a generated list)")
+    parser.add_argument("--rules", type=int, default=80000, help="size of the generated list")
+    parser.add_argument("--corpus", default=DEFAULT_CORPUS)
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix="arcweb-filters-")
+    try:
+        list_dir = os.path.join(work_dir, "filters")
+        os.makedirs(list_dir)
+        if args.list:
+            shutil.copy(args.list, os.path.join(list_dir, os.path.basename(args.list)))
+        else:
+            synthetic_list(os.path.join(list_dir, "synthetic.txt"), args.rules)
+        cache_path = os.path.join(work_dir, "filters.cache")
+        rules = sorted(AdBlocker.BUILTIN_RULES)
+
+        start = time.perf_counter()
+        built = FilterEngine.load(rules, list_dir, cache_path)
+        cold = time.perf_counter() - start
+
+        start = time.perf_counter()
+        cached = FilterEngine.load(rules, list_dir, cache_path)
+        warm = time.perf_counter() - start
+
+        requests = load_corpus(args.corpus)
+        mismatches = sum(built.should_block(url, host, "www.example.com", "script")
+                         != cached.should_block(url, host, "www.example.com", "script")
+                         for url, host in requests)
+
+        print(f"rules compiled:        {len(built)}")
+        print(f"cache size:            {os.path.getsize(cache_path) / 1024:.0f} KiB")
+        print(f"parse + compile:       {cold * 1000:.0f} ms")
+        print(f"load from cache:       {warm * 1000:.0f} ms (from_cache={cached.from_cache})")
+        print(f"decision mismatches:   {mismatches} of {len(requests)}")
+    finally:
+        shutil.rmtree(work_dir)
+
+
+if __name__ == "__main__":
+    main()
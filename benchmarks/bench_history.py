@@ -0,0 +1,67 @@
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from web import HistoryStore
+
+
+WORDS = ["news", "python", "docs", "github", "issue", "release", "weather", "recipe", "video", "forum",
+         "review", "search", "login", "account", "settings", "cloud", "linux", "kernel", "music", "travel"]
+
+
+def fill(store, visits, seed=10):
+    # Zipf-ish: a few sites get most visits, with a long tail of one-off pages
+    rng = random.Random(seed)
+    hosts = [f"{rng.choice(WORDS)}{i}.example{i % 40}.com" for i in range(5000)]
+    now = int(time.time())
+    db = store.connect()
+    with db:
+        for i in range(visits):
+            host = hosts[min(int(rng.paretovariate(1.2)) - 1, len(hosts) - 1)] if rng.random() < 0.6 \
+                else rng.choice(hosts)
+            path = "/".join(rng.choice(WORDS) for _ in range(rng.randint(1, 3)))
+            url = f"https://{host}/{path}/{rng.randint(0, 40000)}"
+            title = " ".join(rng.choice(WORDS).title() for _ in range(rng.randint(2, 6)))
+            store.write_visit(db, url, title, now - rng.randint(0, 150 * 86400))
+    db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure URL bar suggestion latency over a large history")
+    parser.add_argument("--visits", type=int, default=500000)
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix="arcweb-history-")
+    try:
+        store = HistoryStore(os.path.join(work_dir, "history.db"))
+        start = time.perf_counter()
+        fill(store, args.visits)
+        urls = store.db.execute("SELECT count(*) FROM urls").fetchone()[0]
+        print(f"filled {args.visits} visits ({urls} urls) in {time.perf_counter() - start:.1f} s")
+
+        # Every prefix of each query, as if typed one keystroke at a time
+        queries = ["github", "python docs", "news12", "weather forecast", "linux kernel release", "zz", "re"]
+        timings = []
+        for query in queries:
+            for end in range(1, len(query) + 1):
+                start = time.perf_counter()
+                store.suggest(query[:end])
+                timings.append(time.perf_counter() - start)
+        timings.sort()
+        print(f"keystrokes: {len(timings)}")
+        print(f"median: {timings[len(timings) // 2] * 1000:.2f} ms")
+        print(f"p95:    {timings[int(len(timings) * 0.95)] * 1000:.2f} ms")
+        print(f"max:    {timings[-1] * 1000:.2f} ms")
+        store.close()
+    finally:
+        shutil.rmtree(work_dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from web import PageIndex
+
+
+def vocabulary(size, rng):
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    return ["".join(rng.choice(letters) for _ in range(rng.randint(3, 10))) for _ in range(size)]
+
+
+def fill(index, pages, words_per_page, seed=11):
+    # Zipf-distributed words, so a few are in nearly every page and most are rare;
+    # every tenth page repeats an earlier one under a new URL
+    rng = random.Random(seed)
+    words = vocabulary(20000, rng)
+    weights = [1 / (rank + 1) for rank in range(len(words))]
+    now = int(time.time())
+    texts = []
+    db = index.connect()
+    with db:
+        for i in range(pages):
+            if texts and i % 10 == 0:
+                title, text = rng.choice(texts)
+            else:
+                body = rng.choices(words, weights, k=words_per_page)
+                title, text = " ".join(body[:6]).title(), " ".join(body)
+                texts.append((title, text))
+            index.index(db, f"https://site{i % 300}.example.com/page/{i}", title, text, now - i)
+        index.prune(db)
+    db.close()
+    return words
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure full-text search latency over indexed page text")
+    parser.add_argument("--pages", type=int, default=30000)
+    parser.add_argument("--words", type=int, default=800, help="words of text per page")
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix="arcweb-pages-")
+    try:
+        index = PageIndex(os.path.join(work_dir, "pages.db"))
+        start = time.perf_counter()
+        words = fill(index, args.pages, args.words)
+        documents = index.db.execute("SELECT count(*) FROM documents").fetchone()[0]
+        print(f"indexed {args.pages} pages ({documents} distinct texts) in {time.perf_counter() - start:.1f} s, "
+              f"{os.path.getsize(index.path) / 2 ** 20:.0f} MiB")
+
+        # Common, mid-frequency and rare words, alone and combined, plus half-typed prefixes
+        rng = random.Random(3)
+        queries = [words[0], words[5], words[200], words[5000], words[19000],
+                   f"{words[1]} {words[300]}", f"{words[40]} {words[900]} {words[7000]}",
+                   words[0][:2], words[300][:3], f"{words[2]} {words[60][:3]}"]
+        queries += [" ".join(rng.sample(words[:3000], 2)) for _ in range(40)]
+        timings = []
+        for query in queries:
+            start = time.perf_counter()
+            index.search(query)
+            timings.append(time.perf_counter() - start)
+        timings.sort()
+        print(f"queries: {len(timings)}")
+        print(f"median: {timings[len(timings) // 2] * 1000:.2f} ms")
+        print(f"p95:    {timings[int(len(timings) * 0.95)] * 1000:.2f} ms")
+        print(f"max:    {timings[-1] * 1000:.2f} ms")
+        index.close()
+    finally:
+        shutil.rmtree(work_dir)
+
+
+if __name__ == "__main__":
+    main()
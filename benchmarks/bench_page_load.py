@@ -0,0 +1,297 @@
+import argparse
+import json
+import os
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Every host name resolves to the fixture server, so pages can pull from CDN
+# and ad-like hosts that the ad blocker recognises without touching the network
+SITE = "www.fixture.test"
+CDN_HOSTS = ["cdn1.fixture.test", "cdn2.fixture.test", "cdn3.fixture.test", "cdn4.fixture.test"]
+AD_HOSTS = ["ads.adnet.test", "tracker.metrics.test", "banner.promo.test", "stats.counter.test",
+            "adserver.exchange.test"]
+RESOLVER_FLAGS = ["--host-resolver-rules=MAP * 127.0.0.1", "--no-proxy-server"]
+
+WORDS = ("browser render layout network request filter tab cache script style frame image "
+         "table list queue thread memory budget paint compositor").split()
+
+# Compared against a baseline: (metric, absolute change ignored as noise)
+METRICS = [("load_ms", 5.0), ("tab_ms", 2.0), ("peak_rss_mb", 5.0), ("interceptor_calls", 0)]
+
+
+def text(rng, words):
+    return " ".join(rng.choice(WORDS) for _ in range(words))
+
+
+def resource(host, port, name):
+    return f"http://{host}:{port}/r/{name}"
+
+
+def heavy_dom(rng, port):
+    rows = "".join(f"<tr>{''.join(f'<td><span>{rng.random():.3f}</span></td>' for _ in range(10))}</tr>"
+                   for _ in range(400))
+    nested = "<div>" * 300 + "deep" + "</div>" * 300
+    return f"<h1>Heavy DOM</h1><table>{rows}</table>{nested}<p>{text(rng, 2000)}</p>"
+
+
+def many_subresources(rng, port):
+    images = "".join(f'<img src="{resource(CDN_HOSTS[i % 4], port, f"img{i}.svg")}" width="64">'
+                     for i in range(150))
+    scripts = "".join(f'<script src="{resource(CDN_HOSTS[i % 4], port, f"lib{i}.js")}"></script>' for i in range(25))
+    styles = "".join(f'<link rel="stylesheet" href="{resource(CDN_HOSTS[i % 4], port, f"style{i}.css")}">'
+                     for i in range(15))
+    return f"{styles}<h1>Many subresources</h1>{images}<p>{text(rng, 300)}</p>{scripts}"
+
+
+def ad_heavy(rng, port):
+    ads = "".join(f'<script src="{resource(AD_HOSTS[i % 4], port, f"ad{i}.js")}"></script>' for i in range(30))
+    banners = "".join(f'<img src="{resource("banner.promo.test", port, f"banner{i}.svg")}">' for i in range(20))
+    pixels = "".join(f'<img src="{resource("stats.counter.test", port, f"pixel{i}.svg")}" width="1">'
+                     for i in range(10))
+    frames = "".join(f'<iframe src="http://adserver.exchange.test:{port}/frame/{i}.html" width="300" '
+                     f'height="250"></iframe>' for i in range(5))
+    content = "".join(f'<img src="{resource(CDN_HOSTS[i % 4], port, f"photo{i}.svg")}" width="200">'
+                      for i in range(20))
+    return f"<h1>Ad heavy</h1>{content}{''.join(f'<p>{text(rng, 150)}</p>' for _ in range(20))}" \
+           f"{banners}{pixels}{frames}{ads}"
+
+
+def single_page_app(rng, port):
+    api = f"http://api.fixture.test:{port}/r"
+    return ("<h1>Single page app</h1><div id=app></div><script>"
+            "const app = document.getElementById('app');"
+            "for (let i = 0; i < 3000; i++) {"
+            "  const item = document.createElement('div');"
+            "  item.textContent = 'item ' + i; app.appendChild(item);"
+            "}"
+            f"for (let i = 0; i < 20; i++) fetch('{api}/data' + i + '.json').then(r => r.json());"
+            "</script>")
+
+
+def news(rng, port):
+    images = "".join(f'<img src="{resource(CDN_HOSTS[i % 4], port, f"news{i}.svg")}" width="120">' for i in range(60))
+    scripts = "".join(f'<script src="{resource(CDN_HOSTS[i % 4], port, f"app{i}.js")}"></script>' for i in range(10))
+    ads = "".join(f'<script src="{resource(AD_HOSTS[i % 4], port, f"tag{i}.js")}"></script>' for i in range(12))
+    articles = "".join(f"<article><h2>{text(rng, 6)}</h2><p>{text(rng, 80)}</p></article>" for _ in range(150))
+    return f"<h1>News</h1>{images}{articles}{scripts}{ads}"
+
+
+CORPUS = {
+    "heavy-dom": heavy_dom,
+    "many-subresources": many_subresources,
+    "ad-heavy": ad_heavy,
+    "spa": single_page_app,
+    "news": news,
+}
+
+
+def build_corpus(port, seed=23):
+    # Deterministic: the same seed gives the same bytes on every run
+    pages = {}
+    for name, builder in CORPUS.items():
+        body = builder(random.Random(f"{seed}-{name}"), port)
+        pages[f"/{name}.html"] = f"<!doctype html><html><head><title>{name}</title></head><body>{body}</body></html>"
+    return pages
+
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    # Pages come from the corpus; subresources are generated from their file name
+    pages = {}
+    latency = 0.0
+
+    def do_GET(self):
+        if self.latency:
+            time.sleep(self.latency)
+        path = urlsplit(self.path).path
+        name = path.rpartition("/")[2]
+        if path in self.pages:
+            body, content_type = self.pages[path], "text/html"
+        elif path.startswith("/frame/"):
+            body, content_type = f"<p>frame {name}</p><img src='/r/{name}.svg'>", "text/html"
+        elif name.endswith(".js"):
+            body, content_type = f"window.loaded = (window.loaded || 0) + 1; /* {'x' * 2048} */", "text/javascript"
+        elif name.endswith(".css"):
+            body = "".join(f".c{i} {{ color: #{i * 4099 % 0xffffff:06x}; margin: {i % 7}px; }}\n" for i in range(60))
+            content_type = "text/css"
+        elif name.endswith(".svg"):
+            body = (f'<svg xmlns="http://www.w3.org/2000/svg" width="64" height="64">'
+                    f'<rect width="64" height="64" fill="#{zlib.crc32(name.encode()) & 0xffffff:06x}"/></svg>')
+            content_type = "image/svg+xml"
+        elif name.endswith(".json"):
+            body, content_type = json.dumps({"items": list(range(200))}), "application/json"
+        else:
+            self.send_error(404)
+            return
+        data = body.encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        # Every repeat loads everything again
+        self.send_header("Cache-Control", "no-store")
+        self.send_header("Access-Control-Allow-Origin", "*")
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def run_child(args):
+    # Runs in its own process with a throwaway HOME: the real Browser, default
+    # settings, built-in filter rules only and an ephemeral profile
+    import psutil
+    from web import Browser, EngineConfig, once
+    if args.engine_preset:
+        EngineConfig(args.engine_preset).apply()
+    from PySide6.QtCore import QEventLoop, QTimer
+    from PySide6.QtWidgets import QApplication
+
+    app = QApplication(sys.argv[:1] + RESOLVER_FLAGS)
+    browser = Browser(["about:blank"], ephemeral=True)
+    browser.show()
+    results = {}
+    for name in CORPUS:
+        url = f"http://{SITE}:{args.port}/{name}.html"
+        runs = []
+        for _ in range(args.repeat):
+            loop = QEventLoop()
+            peak = [0]
+            finished = []
+
+            start = time.perf_counter()
+            view = browser.add_new_tab(url)
+            created = time.perf_counter()
+
+            def sample():
+                pid = view.page().renderProcessPid()
+                if pid > 0:
+                    try:
+                        peak[0] = max(peak[0], psutil.Process(pid).memory_info().rss)
+                    except psutil.Error:
+                        pass
+
+            sampler = QTimer()
+            sampler.setInterval(args.sample_ms)
+            sampler.timeout.connect(sample)
+            sampler.start()
+            once(view.page().loadFinished, lambda ok: (finished.append((time.perf_counter(), ok)), loop.quit()))
+            QTimer.singleShot(int(args.timeout * 1000), loop.quit)
+            loop.exec()
+            sample()
+            sampler.stop()
+
+            stats = view.page().request_stats
+            loaded_at, ok = finished[0] if finished else (time.perf_counter(), False)
+            runs.append({"load_ms": (loaded_at - start) * 1000, "tab_ms": (created - start) * 1000,
+                         "peak_rss_mb": peak[0] / 2 ** 20, "interceptor_calls": stats.allowed + stats.blocked,
+                         "blocked": stats.blocked, "ok": ok})
+            browser.close_tab(browser.tabs.indexOf(view))
+        results[name] = {metric: statistics.median(run[metric] for run in runs)
+                         for metric in ("load_ms", "tab_ms", "peak_rss_mb", "interceptor_calls", "blocked")}
+        results[name]["failed"] = sum(not run["ok"] for run in runs)
+    print(json.dumps(results), flush=True)
+
+
+def measure(args, port):
+    home = tempfile.mkdtemp(prefix="arcweb-pageload-")
+    env = dict(os.environ, HOME=home,
+               XDG_CONFIG_HOME=os.path.join(home, ".config"),
+               XDG_DATA_HOME=os.path.join(home, ".local", "share"),
+               XDG_CACHE_HOME=os.path.join(home, ".cache"))
+    env.pop("QTWEBENGINE_CHROMIUM_FLAGS", None)
+    if not args.visible:
+        env["QT_QPA_PLATFORM"] = "offscreen"
+    command = [sys.executable, os.path.abspath(__file__), "--child", "--port", str(port),
+               "--repeat", str(args.repeat), "--timeout", str(args.timeout), "--sample-ms", str(args.sample_ms)]
+    if args.engine_preset:
+        command += ["--engine-preset", args.engine_preset]
+    try:
+        output = subprocess.run(command, env=env, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True,
+                                timeout=args.timeout * args.repeat * len(CORPUS) + 120).stdout
+    finally:
+        shutil.rmtree(home, ignore_errors=True)
+    for line in output.splitlines():
+        if line.startswith("{"):
+            return json.loads(line)
+    raise RuntimeError("the benchmark run produced no result")
+
+
+def compare(results, baseline, tolerance):
+    # Regressions: worse than the baseline by more than the tolerance and the noise floor
+    regressions = []
+    print(f"\n{'page':<18} {'metric':<18} {'baseline':>10} {'current':>10} {'change':>8}")
+    for name, metrics in results["pages"].items():
+        previous = baseline["pages"].get(name)
+        if previous is None:
+            continue
+        for metric, noise in METRICS:
+            old, new = previous[metric], metrics[metric]
+            change = (new - old) / old if old else 0.0
+            regressed = new - old > noise and change > tolerance
+            if regressed:
+                regressions.append((name, metric))
+            print(f"{name:<18} {metric:<18} {old:>10.1f} {new:>10.1f} {change:>+7.0%}"
+                  f"{'  REGRESSION' if regressed else ''}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offscreen page-load benchmark against a local fixture server")
+    parser.add_argument("--repeat", type=int, default=5, help="loads per page, the median is reported")
+    parser.add_argument("--timeout", type=float, default=30, help="seconds to wait for each load")
+    parser.add_argument("--latency", type=float, default=0, help="server delay per response, in ms")
+    parser.add_argument("--sample-ms", type=int, default=50, help="renderer RSS sampling interval")
+    parser.add_argument("--engine-preset", help="engine preset to run under (see EngineConfig.PRESETS)")
+    parser.add_argument("--visible", action="store_true", help="use the real display instead of offscreen")
+    parser.add_argument("--json", help="write the results to this file")
+    parser.add_argument("--baseline", help="compare with results saved earlier; exit 1 on a regression")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="relative slowdown allowed per metric")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args)
+        return
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FixtureHandler)
+    FixtureHandler.pages = build_corpus(server.server_address[1])
+    FixtureHandler.latency = args.latency / 1000
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        pages = measure(args, server.server_address[1])
+    finally:
+        server.shutdown()
+
+    results = {"repeat": args.repeat, "latency_ms": args.latency, "engine_preset": args.engine_preset,
+               "pages": pages}
+    print(f"{'page':<18} {'load ms':>9} {'tab ms':>8} {'peak RSS MiB':>13} {'requests':>9} {'blocked':>8} "
+          f"{'failed':>7}")
+    for name, metrics in pages.items():
+        print(f"{name:<18} {metrics['load_ms']:>9.1f} {metrics['tab_ms']:>8.1f} {metrics['peak_rss_mb']:>13.1f} "
+              f"{metrics['interceptor_calls']:>9.0f} {metrics['blocked']:>8.0f} {metrics['failed']:>7}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as output:
+            json.dump(results, output, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as baseline_file:
+            regressions = compare(results, json.load(baseline_file), args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) against {args.baseline}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+import argparse
+import base64
+import hashlib
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from web import SegmentedFetcher
+
+
+class RangeHandler(BaseHTTPRequestHandler):
+    # Serves server.payload with byte ranges, an ETag and a SHA-256 Digest,
+    # capping each connection at server.rate bytes per second the way many
+    # mirrors do
+    protocol_version = "HTTP/1.1"
+    
+    def log_message(self, *args):
+        pass
+    
+    def do_GET(self):
+        payload = self.server.payload
+        start, end = 0, len(payload) - 1
+        status = 200
+        header = self.headers.get("Range")
+        if header and self.server.ranges and self.headers.get("If-Range", self.server.etag) == self.server.etag:
+            first, _, last = header.removeprefix("bytes=").partition("-")
+            start, end = int(first), min(int(last or end), end)
+            status = 206
+        self.send_response(status)
+        self.send_header("Content-Length", str(end - start + 1))
+        self.send_header("ETag", self.server.etag)
+        self.send_header("Digest", "SHA-256=" + self.server.digest)
+        if self.server.ranges:
+            self.send_header("Accept-Ranges", "bytes")
+        if status == 206:
+            self.send_header("Content-Range", f"bytes {start}-{end}/{len(payload)}")
+        self.end_headers()
+        
+        chunk = 64 * 1024
+        started = time.monotonic()
+        for offset in range(start, end + 1, chunk):
+            try:
+                self.wfile.write(payload[offset:min(offset + chunk, end + 1)])
+            except OSError:
+                return
+            ahead = (offset - start + chunk) / self.server.rate - (time.monotonic() - started)
+            if ahead > 0:
+                time.sleep(ahead)
+
+
+def serve(payload, rate, ranges=True, digest=None):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), RangeHandler)
+    server.daemon_threads = True
+    server.payload = payload
+    server.rate = rate
+    server.ranges = ranges
+    server.etag = '"%s"' % hashlib.md5(payload).hexdigest()
+    server.digest = digest or base64.b64encode(hashlib.sha256(payload).digest()).decode()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}/payload.bin"
+
+
+def check(condition, message):
+    print(("ok    " if condition else "FAIL  ") + message)
+    return condition
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the segmented download engine against a local range server")
+    parser.add_argument("--size", type=int, default=64, help="payload size in MiB")
+    parser.add_argument("--rate", type=int, default=16, help="per-connection cap in MiB/s")
+    parser.add_argument("--segments", type=int, default=4)
+    args = parser.parse_args()
+    
+    payload = os.urandom(args.size * 2 ** 20)
+    expected = hashlib.sha256(payload).hexdigest()
+    server, url = serve(payload, args.rate * 2 ** 20)
+    work_dir = tempfile.mkdtemp(prefix="arcweb-segmented-")
+    passed = True
+    try:
+        timings = {}
+        for segments in (1, args.segments):
+            path = os.path.join(work_dir, f"single-{segments}.bin")
+            fetcher = SegmentedFetcher(url, path, segments)
+            start = time.perf_counter()
+            done = fetcher.run()
+            timings[segments] = time.perf_counter() - start
+            with open(path, "rb") as result:
+                intact = done and hashlib.sha256(result.read()).hexdigest() == expected
+            passed &= check(intact and fetcher.digest == expected,
+                            f"{segments} segment(s): {args.size / timings[segments]:.1f} MiB/s, digest verified")
+        print(f"      speedup with {args.segments} segments: {timings[1] / timings[args.segments]:.1f}x")
+        
+        # Stop part way, then carry on with a new fetcher as after a restart
+        path = os.path.join(work_dir, "resumed.bin")
+        fetcher = SegmentedFetcher(url, path, args.segments)
+        runner = threading.Thread(target=fetcher.run)
+        runner.start()
+        while fetcher.received < len(payload) // 2:
+            time.sleep(0.05)
+        fetcher.stop()
+        runner.join()
+        first = fetcher.received
+        resumed = SegmentedFetcher(url, path, args.segments)
+        done = resumed.run()
+        with open(path, "rb") as result:
+            intact = done and hashlib.sha256(result.read()).hexdigest() == expected
+        passed &= check(intact and not os.path.exists(path + ".part.json"),
+                        f"resume: stopped at {first / len(payload):.0%}, finished intact")
+        
+        # A wrong Digest header must fail the download and drop the partial file
+        bad_server, bad_url = serve(payload, args.rate * 2 ** 20, digest=base64.b64encode(b"\0" * 32).decode())
+        path = os.path.join(work_dir, "corrupt.bin")
+        fetcher = SegmentedFetcher(bad_url, path, args.segments)
+        passed &= check(not fetcher.run() and fetcher.error == "Checksum mismatch" and not os.path.exists(path + ".part"),
+                        "digest mismatch detected")
+        bad_server.shutdown()
+        
+        # Without range support the engine declines, and the browser keeps the download
+        plain_server, plain_url = serve(payload[:1024], args.rate * 2 ** 20, ranges=False)
+        passed &= check(not SegmentedFetcher(plain_url, os.path.join(work_dir, "plain.bin")).probe(),
+                        "server without ranges rejected")
+        plain_server.shutdown()
+    finally:
+        server.shutdown()
+        shutil.rmtree(work_dir)
+    sys.exit(0 if passed else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+import argparse
+import json
+import os
+import queue
+import re
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+WEB_PY = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "web.py")
+
+# A page that needs no network, so the timeline only measures the browser
+DEFAULT_URL = "data:text/html,<title>startup</title><h1>startup benchmark</h1>"
+
+TIMELINE_LINE = re.compile(r"^startup: (.+?)\s+([\d.]+) ms")
+
+
+def read_lines(stream, lines):
+    for line in stream:
+        lines.put(line)
+    lines.put(None)
+
+
+def launch(url, timeout, visible):
+    # One cold start: a fresh HOME and XDG directories, so there is no
+    # session, history, filter cache or Chromium profile to reuse
+    home = tempfile.mkdtemp(prefix="arcweb-startup-")
+    env = dict(os.environ, HOME=home,
+               XDG_CONFIG_HOME=os.path.join(home, ".config"),
+               XDG_DATA_HOME=os.path.join(home, ".local", "share"),
+               XDG_CACHE_HOME=os.path.join(home, ".cache"))
+    if not visible:
+        env["QT_QPA_PLATFORM"] = "offscreen"
+
+    phases = {}
+    launched = time.perf_counter()
+    process = subprocess.Popen([sys.executable, WEB_PY, "--profile-startup", url], env=env,
+                               stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+    lines = queue.Queue()
+    threading.Thread(target=read_lines, args=(process.stdout, lines), daemon=True).start()
+    try:
+        deadline = launched + timeout
+        while "first loadFinished" not in phases:
+            try:
+                line = lines.get(timeout=max(deadline - time.perf_counter(), 0))
+            except queue.Empty:
+                raise RuntimeError(f"no complete timeline within {timeout} s")
+            if line is None:
+                raise RuntimeError(f"web.py exited with {process.wait()} before the first page loaded")
+            match = TIMELINE_LINE.match(line)
+            if match:
+                phases[match.group(1)] = float(match.group(2))
+        # The timeline starts when web.py starts importing; this adds interpreter startup
+        phases["process launch to report"] = (time.perf_counter() - launched) * 1000
+        return phases
+    finally:
+        process.terminate()
+        try:
+            process.wait(10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+        shutil.rmtree(home, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cold-start timeline of web.py, median over several launches")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--url", default=DEFAULT_URL, help="page to open (default: an inline data: URL)")
+    parser.add_argument("--timeout", type=float, default=60, help="seconds to wait for each launch")
+    parser.add_argument("--visible", action="store_true", help="use the real display instead of offscreen")
+    parser.add_argument("--json", help="also write the medians to this file, to compare releases")
+    args = parser.parse_args()
+
+    runs = []
+    for run in range(args.runs):
+        runs.append(launch(args.url, args.timeout, args.visible))
+        print(f"run {run + 1}: first paint {runs[-1]['first paint']:.1f} ms")
+
+    order = sorted(runs[0], key=lambda phase: runs[0][phase])
+    medians = {phase: statistics.median(run[phase] for run in runs) for phase in order}
+    print(f"\n{'phase':<26} {'median ms':>10} {'min ms':>10} {'max ms':>10}")
+    for phase in order:
+        values = [run[phase] for run in runs]
+        print(f"{phase:<26} {medians[phase]:>10.1f} {min(values):>10.1f} {max(values):>10.1f}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as results:
+            json.dump({"runs": args.runs, "url": args.url, "median_ms": medians}, results, indent=2)
+
+
+if __name__ == "__main__":
+    main()
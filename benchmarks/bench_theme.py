@@ -0,0 +1,95 @@
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PySide6.QtWidgets import (QApplication, QMainWindow, QTabWidget, QWidget, QVBoxLayout, QLineEdit,
+                               QPushButton, QListWidget, QDialog, QLabel, QStatusBar, QToolBar)
+from PySide6.QtGui import QPalette
+
+from web import ThemeEngine
+
+
+def build_window(tabs, dialogs):
+    # Stand-ins for the browser's widget tree: web views are left out so only
+    # styling cost is measured
+    window = QMainWindow()
+    window.setStatusBar(QStatusBar())
+    window.addToolBar(QToolBar("Navigation"))
+    tab_widget = QTabWidget()
+    for i in range(tabs):
+        page = QWidget()
+        layout = QVBoxLayout(page)
+        layout.addWidget(QLineEdit(f"https://example.com/{i}"))
+        layout.addWidget(QPushButton("Reload"))
+        layout.addWidget(QLabel(f"Tab {i}"))
+        tab_widget.addTab(page, f"Tab {i}")
+    window.setCentralWidget(tab_widget)
+    window.show()
+    
+    open_dialogs = []
+    for i in range(dialogs):
+        dialog = QDialog(window)
+        layout = QVBoxLayout(dialog)
+        items = QListWidget()
+        items.addItems([f"Item {j}" for j in range(50)])
+        layout.addWidget(items)
+        layout.addWidget(QPushButton("Close"))
+        dialog.show()
+        open_dialogs.append(dialog)
+    return window, open_dialogs
+
+
+def apply_per_widget(app, window, dialogs, name):
+    # The old approach: the window's own style sheet plus a palette built in each dialog
+    palette, style = ThemeEngine.dark_palette(), ThemeEngine.DARK_STYLE
+    if name != "dark":
+        palette, style = app.style().standardPalette(), ThemeEngine.LIGHT_STYLE
+    app.setPalette(palette)
+    window.setStyleSheet(style)
+    for dialog in dialogs:
+        dialog.setPalette(ThemeEngine.dark_palette())
+
+
+def time_switches(app, switch, count):
+    timings = []
+    for i in range(count):
+        start = time.perf_counter()
+        switch("light" if i % 2 == 0 else "dark")
+        # Include the polish and layout work Qt defers to the event loop
+        app.processEvents()
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    return timings[len(timings) // 2], timings[-1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time a light/dark theme switch with many tabs and dialogs open")
+    parser.add_argument("--tabs", type=int, default=60)
+    parser.add_argument("--dialogs", type=int, default=6)
+    parser.add_argument("--switches", type=int, default=20)
+    args = parser.parse_args()
+    
+    app = QApplication(sys.argv)
+    app.setStyle("Fusion")
+    window, dialogs = build_window(args.tabs, args.dialogs)
+    app.processEvents()
+    
+    median, worst = time_switches(app, lambda name: apply_per_widget(app, window, dialogs, name), args.switches)
+    print(f"per-widget themes:   median {median * 1000:.1f} ms, max {worst * 1000:.1f} ms")
+    
+    # Back to inheriting everything from the application
+    window.setStyleSheet("")
+    for dialog in dialogs:
+        dialog.setPalette(QPalette())
+    engine = ThemeEngine(app)
+    median, worst = time_switches(app, engine.apply, args.switches)
+    print(f"shared theme engine: median {median * 1000:.1f} ms, max {worst * 1000:.1f} ms")
+    print(f"({args.tabs} tabs, {args.dialogs} dialogs, {args.switches} switches)")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,150 +1,4214 @@
+import time
+# Origin of the --profile-startup timeline, taken before the heavy imports below
+STARTUP_ORIGIN = time.perf_counter()
 import sys
 import os
-from PySide6.QtCore import QUrl, Qt, QSize, Signal, QSettings, QByteArray
+import re
+import mmap
+import struct
+import marshal
+import json
+import hashlib
+import threading
+import argparse
+import logging
+import itertools
+import sqlite3
+import queue
+import math
+import html
+import base64
+import secrets
+import hmac
+from html.parser import HTMLParser
+from urllib.parse import urlsplit
+from collections import OrderedDict, deque
+from concurrent.futures import Future, InvalidStateError, TimeoutError as FutureTimeout
+from PySide6.QtCore import (QUrl, Qt, QSize, Signal, QSettings, QByteArray, QStandardPaths,
+                            QTimer, QFileSystemWatcher, QObject, QDataStream, QIODevice,
+                            QAbstractListModel, QModelIndex, QStringListModel, QEvent,
+                            QAbstractTableModel, QSortFilterProxyModel)
 from PySide6.QtWidgets import (QApplication, QMainWindow, QTabWidget, 
                               QToolBar, QLineEdit, QPushButton, QMenu, 
                               QStatusBar, QProgressBar, QDialog, QVBoxLayout, 
-                              QHBoxLayout, QLabel, QListWidget, QWidget, 
-                              QTabBar, QFrame, QCheckBox, QColorDialog, QFileDialog)
+                              QHBoxLayout, QLabel, QListWidget, QListWidgetItem, QWidget, 
+                              QTabBar, QFrame, QCheckBox, QColorDialog, QFileDialog,
+                              QSpinBox, QListView, QCompleter, QComboBox, QTableView,
+                              QHeaderView)
 from PySide6.QtGui import QIcon, QAction, QFont, QColor, QPalette, QCursor
 from PySide6.QtWebEngineWidgets import QWebEngineView
 from PySide6.QtWebEngineCore import (QWebEngineProfile, QWebEngineDownloadRequest, 
                                     QWebEnginePage, QWebEngineUrlRequestInterceptor,
-                                    QWebEngineSettings)
+                                    QWebEngineUrlRequestInfo, QWebEngineSettings,
+                                    QWebEngineScript, QWebEngineLoadingInfo)
+
+log = logging.getLogger("arcweb")
+
+
+class StartupProfiler:
+    # Timeline of startup phases for --profile-startup, in wall-clock time
+    # since web.py started importing. Each phase is stamped the first time
+    # it is reached; the timeline is printed once the first page has loaded
+    LAST_PHASE = "first loadFinished"
+    
+    def __init__(self, origin):
+        self.origin = origin
+        self.enabled = False
+        self.marks = {}
+    
+    def mark(self, phase):
+        if phase in self.marks:
+            return
+        self.marks[phase] = time.perf_counter()
+        if self.enabled and phase == self.LAST_PHASE:
+            self.report()
+    
+    def report(self):
+        previous = self.origin
+        for phase, stamp in sorted(self.marks.items(), key=lambda item: item[1]):
+            print(f"startup: {phase:<20} {(stamp - self.origin) * 1000:8.1f} ms"
+                  f"  (+{(stamp - previous) * 1000:.1f})", flush=True)
+            previous = stamp
+
+
+startup = StartupProfiler(STARTUP_ORIGIN)
+startup.mark("imports")
+
+
+# Adblock Plus resource type names, with the aliases used by common lists
+FILTER_TYPES = {
+    "script": "script", "image": "image", "stylesheet": "stylesheet", "css": "stylesheet",
+    "object": "object", "xmlhttprequest": "xmlhttprequest", "xhr": "xmlhttprequest",
+    "subdocument": "subdocument", "frame": "subdocument", "ping": "ping", "beacon": "ping",
+    "websocket": "websocket", "font": "font", "media": "media", "other": "other",
+    "document": "document", "doc": "document",
+}
+
+# "||example.com^" style rules that only name a host
+HOST_FILTER = re.compile(r"\|\|([a-z0-9-]+(?:\.[a-z0-9-]+)+)\^?")
+
+# Host-level verdicts; anything else means only URL rules can decide
+VERDICT_ALLOW = "allow"
+VERDICT_BLOCK = "block"
+VERDICT_NONE = "none"
+
+# Fragments shorter than this are too common to index and get checked on every request
+MIN_FRAGMENT_KEY = 3
+MAX_FRAGMENT_KEY = 16
+
+
+def registrable_domain(host):
+    # Rough eTLD+1 without a public suffix list: keeps "bbc.co.uk" together
+    labels = host.split(".")
+    if len(labels) > 2 and len(labels[-1]) == 2 and labels[-2] in ("co", "com", "net", "org", "gov", "ac", "edu"):
+        return ".".join(labels[-3:])
+    return ".".join(labels[-2:])
+
+
+def domain_in(host, domains):
+    for domain in domains:
+        if host == domain or host.endswith("." + domain):
+            return True
+    return False
+
+
+def filter_regex(pattern):
+    # Translate Adblock Plus wildcards and anchors to a regular expression
+    prefix, suffix = "", ""
+    if pattern.startswith("||"):
+        prefix = r"^[a-z][a-z0-9+.-]*://(?:[^/?#]*\.)?"
+        pattern = pattern[2:]
+    elif pattern.startswith("|"):
+        prefix = "^"
+        pattern = pattern[1:]
+    if pattern.endswith("|"):
+        suffix = "$"
+        pattern = pattern[:-1]
+    body = re.escape(pattern).replace(r"\*", ".*").replace(r"\^", r"(?:[^\w.%-]|$)")
+    return prefix + body + suffix
+
+
+def parse_network_filter(line):
+    # Returns (exception, kind, target, conditions) for a lowercased filter line,
+    # or None for rules this blocker does not understand
+    exception = line.startswith("@@")
+    if exception:
+        line = line[2:]
+    pattern, options = line, ""
+    if "$" in line:
+        pattern, _, options = line.rpartition("$")
+    if len(pattern) > 1 and pattern.startswith("/") and pattern.endswith("/"):
+        # Raw regular expression filters are not supported
+        return None
+
+    third_party = None
+    include, exclude = [], []
+    types, negated_types = set(), set()
+    for option in options.split(","):
+        if not option:
+            continue
+        negate = option.startswith("~")
+        name = option.lstrip("~")
+        if name in ("third-party", "3p"):
+            third_party = not negate
+        elif name in ("first-party", "1p"):
+            third_party = negate
+        elif name.startswith("domain="):
+            for domain in name[len("domain="):].split("|"):
+                if domain.startswith("~"):
+                    exclude.append(domain[1:])
+                elif domain:
+                    include.append(domain)
+        elif name in FILTER_TYPES:
+            (negated_types if negate else types).add(FILTER_TYPES[name])
+        elif name in ("match-case", "important"):
+            continue
+        else:
+            # Unknown options change what a rule means, so skip it rather than guess
+            return None
+    if negated_types:
+        types = (types or set(FILTER_TYPES.values())) - negated_types
+
+    conditions = (third_party, tuple(include) or None, tuple(exclude) or None, frozenset(types) or None)
+
+    host_rule = HOST_FILTER.fullmatch(pattern)
+    if host_rule:
+        return exception, "host", host_rule.group(1), conditions + (None, None)
+
+    literal = max(re.split(r"[*^|]", pattern), key=len)
+    if not literal and not include:
+        # A rule that matches everything everywhere is almost always a list error
+        return None
+    regex = None if pattern == literal else filter_regex(pattern)
+    needle = literal if regex is None and len(literal) > MAX_FRAGMENT_KEY else None
+    return exception, "pattern", literal[:MAX_FRAGMENT_KEY], conditions + (needle, regex)
+
+
+class DomainTrie:
+    # Reversed-label trie: "ads.example.com" is stored as com -> example -> ads,
+    # so a lookup costs one dict hit per label of the host, not one per rule
+    TERMINAL = ""
+
+    def __init__(self):
+        self.root = {}
+        self.size = 0
+
+    def add(self, domain, value):
+        node = self.root
+        for label in reversed(domain.split(".")):
+            node = node.setdefault(label, {})
+        node[self.TERMINAL] = node.get(self.TERMINAL, ()) + (value,)
+        self.size += 1
+
+    def lookup_all(self, host):
+        # Values of every rule that host equals or is a subdomain of, shortest domain first
+        node = self.root
+        for label in reversed(host.split(".")):
+            node = node.get(label)
+            if node is None:
+                return
+            if self.TERMINAL in node:
+                yield node[self.TERMINAL]
+
+
+class PatternAutomaton:
+    # Aho-Corasick automaton: finds any of the registered fragments in a
+    # single pass over the text, however many fragments there are
+    def __init__(self):
+        self.goto = [{}]
+        self.fail = [0]
+        self.terminal = [()]
+        self.out = [()]
+        self.size = 0
+
+    def add(self, pattern, value):
+        state = 0
+        for char in pattern:
+            next_state = self.goto[state].get(char)
+            if next_state is None:
+                next_state = len(self.goto)
+                self.goto[state][char] = next_state
+                self.goto.append({})
+                self.fail.append(0)
+                self.terminal.append(())
+            state = next_state
+        self.terminal[state] = self.terminal[state] + (value,)
+        self.size += 1
+
+    def compile(self):
+        # Breadth-first pass to fill in failure links and merge outputs
+        self.out = list(self.terminal)
+        queue = list(self.goto[0].values())
+        for state in queue:
+            for char, next_state in self.goto[state].items():
+                queue.append(next_state)
+                fallback = self.fail[state]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                target = self.goto[fallback].get(char, 0)
+                self.fail[next_state] = target if target != next_state else 0
+                self.out[next_state] = self.out[next_state] + self.out[self.fail[next_state]]
+        # Only the merged outputs are needed from here on
+        self.terminal = None
+
+    def iter_matches(self, text):
+        if not self.size:
+            return
+        goto, fail, out = self.goto, self.fail, self.out
+        state = 0
+        for char in text:
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if out[state]:
+                yield from out[state]
+
+    def to_state(self):
+        return self.goto, self.fail, self.out, self.size
+
+    @classmethod
+    def from_state(cls, state):
+        automaton = cls()
+        automaton.goto, automaton.fail, automaton.out, automaton.size = state
+        automaton.terminal = None
+        return automaton
+
+
+class FilterMatcher:
+    # Compiled form of a block list. Rules are sorted into buckets:
+    #   "doubleclick.net", "||doubleclick.net^"  -> host or any subdomain of it (domain trie)
+    #   "ads."                                   -> any host with a label named "ads" (label set)
+    #   "facebook.com/tr", "/banner/*/ad_"       -> fragment anywhere in the URL (automaton)
+    # Each rule id maps to its conditions ($third-party, $domain=, types, and
+    # a needle or regex to confirm the fragment hit), or None if it always applies
+    def __init__(self, rules=()):
+        self.domains = DomainTrie()
+        self.labels = set()
+        self.fragments = PatternAutomaton()
+        self.generic = []
+        self.rules = []
+        self._regex_cache = {}
+        if rules:
+            for rule in rules:
+                self.add(rule)
+            self.compile()
+
+    def add(self, rule):
+        # Built-in shorthand: domains, "label." prefixes and plain URL fragments
+        rule = rule.strip().lower()
+        if not rule:
+            return
+        if "/" in rule:
+            self.add_filter("pattern", rule, None)
+        elif rule.endswith("."):
+            self.labels.add(rule[:-1])
+        else:
+            self.add_filter("host", rule, None)
+
+    def add_filter(self, kind, target, conditions):
+        if conditions is not None and all(value is None for value in conditions):
+            conditions = None
+        rule_id = len(self.rules)
+        self.rules.append(conditions)
+        if kind == "host":
+            self.domains.add(target, rule_id)
+        elif len(target) >= MIN_FRAGMENT_KEY:
+            self.fragments.add(target, rule_id)
+        else:
+            self.generic.append(rule_id)
+
+    def compile(self):
+        self.fragments.compile()
+
+    def __len__(self):
+        return len(self.rules) + len(self.labels)
+
+    def _applies(self, rule_id, url, host, first_party, resource_type):
+        rule = self.rules[rule_id]
+        if rule is None:
+            return True
+        third_party, include, exclude, types, needle, regex = rule
+        if types is not None and resource_type not in types:
+            return False
+        if third_party is not None and first_party:
+            if third_party != (registrable_domain(host) != registrable_domain(first_party)):
+                return False
+        if include is not None and not domain_in(first_party, include):
+            return False
+        if exclude is not None and domain_in(first_party, exclude):
+            return False
+        if needle is not None and needle not in url:
+            return False
+        if regex is not None:
+            compiled = self._regex_cache.get(regex)
+            if compiled is None:
+                compiled = self._regex_cache[regex] = re.compile(regex)
+            if compiled.search(url) is None:
+                return False
+        return True
+
+    def match_host(self, host, first_party="", resource_type="other"):
+        # Rules that depend only on the request host, the page and the resource type
+        if self.labels and not self.labels.isdisjoint(host.split(".")):
+            return True
+        for rule_ids in self.domains.lookup_all(host):
+            for rule_id in rule_ids:
+                if self._applies(rule_id, None, host, first_party, resource_type):
+                    return True
+        return False
+
+    def match_url(self, url, host, first_party="", resource_type="other"):
+        # Rules that need the full URL
+        for rule_id in self.fragments.iter_matches(url):
+            if self._applies(rule_id, url, host, first_party, resource_type):
+                return True
+        for rule_id in self.generic:
+            if self._applies(rule_id, url, host, first_party, resource_type):
+                return True
+        return False
+
+    def matches(self, url, host, first_party="", resource_type="other"):
+        return (self.match_host(host, first_party, resource_type)
+                or self.match_url(url, host, first_party, resource_type))
+
+    def to_state(self):
+        return (self.domains.root, self.domains.size, tuple(self.labels),
+                self.fragments.to_state(), tuple(self.generic), tuple(self.rules))
+
+    @classmethod
+    def from_state(cls, state):
+        matcher = cls()
+        root, size, labels, fragments, generic, rules = state
+        matcher.domains.root, matcher.domains.size = root, size
+        matcher.labels = set(labels)
+        matcher.fragments = PatternAutomaton.from_state(fragments)
+        matcher.generic = list(generic)
+        matcher.rules = list(rules)
+        return matcher
+
+
+class CosmeticFilters:
+    # Element hiding ("##") rules. Generic selectors are combined once into a
+    # shared stylesheet; site-specific sheets are built on the first visit to
+    # a host and cached, so a navigation costs one dict lookup
+    GROUP_SIZE = 100
+    MAX_SITE_SHEETS = 1024
+
+    def __init__(self):
+        self.generic = []
+        self.generic_exceptions = set()
+        self.domains = {}
+        self.exceptions = {}
+        self.generic_sheet = ""
+        self.generic_excluded = ()
+        self._site_sheets = {}
+
+    def __len__(self):
+        return len(self.generic) + sum(len(selectors) for selectors in self.domains.values())
+
+    def add(self, domains, selector, exception):
+        if not selector or "{" in selector or "}" in selector or ":-abp-" in selector:
+            # Anything that could break out of the selector list is dropped
+            return
+        domains = [domain for domain in domains.lower().split(",") if domain and not domain.endswith(".*")]
+        included = [domain for domain in domains if not domain.startswith("~")]
+        excluded = [domain[1:] for domain in domains if domain.startswith("~")]
+        if exception:
+            if not included:
+                self.generic_exceptions.add(selector)
+            for domain in included:
+                self.exceptions.setdefault(domain, set()).add(selector)
+            return
+        if included:
+            for domain in included:
+                self.domains.setdefault(domain, []).append(selector)
+        else:
+            self.generic.append(selector)
+        for domain in excluded:
+            self.exceptions.setdefault(domain, set()).add(selector)
+
+    @classmethod
+    def stylesheet(cls, selectors):
+        # One invalid selector voids its whole rule, so keep the groups small
+        return "".join(
+            ",\n".join(selectors[start:start + cls.GROUP_SIZE]) + " { display: none !important; }\n"
+            for start in range(0, len(selectors), cls.GROUP_SIZE))
+
+    def compile(self):
+        self.generic = [selector for selector in dict.fromkeys(self.generic)
+                        if selector not in self.generic_exceptions]
+        self.generic_sheet = self.stylesheet(self.generic)
+        # Sites with exceptions for generic selectors skip the shared sheet and
+        # get a filtered copy of it in their own sheet instead
+        generic = set(self.generic)
+        self.generic_excluded = tuple(sorted(domain for domain, selectors in self.exceptions.items()
+                                             if not selectors.isdisjoint(generic)))
+        self._site_sheets = {}
+
+    def excludes_generic(self, host):
+        return bool(self.generic_excluded) and domain_in(host, self.generic_excluded)
+
+    def site_sheet(self, host):
+        sheet = self._site_sheets.get(host)
+        if sheet is not None:
+            return sheet
+        
+        labels = host.split(".")
+        suffixes = [".".join(labels[i:]) for i in range(len(labels))]
+        selectors = list(self.generic) if self.excludes_generic(host) else []
+        hidden_here = set()
+        for domain in suffixes:
+            selectors.extend(self.domains.get(domain, ()))
+            hidden_here |= self.exceptions.get(domain, set())
+        sheet = self.stylesheet([selector for selector in dict.fromkeys(selectors)
+                                 if selector not in hidden_here])
+        
+        if len(self._site_sheets) >= self.MAX_SITE_SHEETS:
+            self._site_sheets.clear()
+        self._site_sheets[host] = sheet
+        return sheet
+
+    def to_state(self):
+        return (tuple(self.generic), tuple(self.generic_exceptions),
+                {domain: tuple(selectors) for domain, selectors in self.domains.items()},
+                {domain: tuple(selectors) for domain, selectors in self.exceptions.items()})
+
+    @classmethod
+    def from_state(cls, state):
+        filters = cls()
+        generic, generic_exceptions, domains, exceptions = state
+        filters.generic = list(generic)
+        filters.generic_exceptions = set(generic_exceptions)
+        filters.domains = {domain: list(selectors) for domain, selectors in domains.items()}
+        filters.exceptions = {domain: set(selectors) for domain, selectors in exceptions.items()}
+        filters.compile()
+        return filters
+
+
+class FilterEngine:
+    # Blocking and exception (@@) matchers built from the built-in rules plus
+    # any Adblock Plus / EasyList files in the filter directory. The compiled
+    # result is cached in a versioned binary file keyed on the source lists,
+    # so later launches map the cache instead of parsing every rule again
+    CACHE_MAGIC = b"ARCF"
+    CACHE_VERSION = 2
+    CACHE_HEADER = struct.Struct("<4sI32s")
+
+    def __init__(self):
+        self.blocking = FilterMatcher()
+        self.exceptions = FilterMatcher()
+        self.cosmetic = CosmeticFilters()
+        self.fingerprint = b""
+        self.from_cache = False
+        self.build_seconds = 0.0
+        self.cache_bytes = 0
+
+    def __len__(self):
+        return len(self.blocking) + len(self.exceptions) + len(self.cosmetic)
+
+    def host_verdict(self, host, first_party="", resource_type="other"):
+        # Decision from host-level rules alone, which depend only on
+        # (page host, request host, resource type) and so can be cached
+        if self.exceptions.match_host(host, first_party, resource_type):
+            return VERDICT_ALLOW
+        if self.blocking.match_host(host, first_party, resource_type):
+            return VERDICT_BLOCK
+        return VERDICT_NONE
+
+    def should_block(self, url, host, first_party="", resource_type="other", verdict=None):
+        if verdict is None:
+            verdict = self.host_verdict(host, first_party, resource_type)
+        if verdict == VERDICT_ALLOW:
+            return False
+        if verdict != VERDICT_BLOCK and not self.blocking.match_url(url, host, first_party, resource_type):
+            return False
+        return not self.exceptions.match_url(url, host, first_party, resource_type)
+
+    def add_filter(self, line):
+        line = line.strip()
+        if not line or line.startswith(("!", "[")):
+            return
+        if "#?#" in line or "#$#" in line or "#@?#" in line or "#@$#" in line:
+            # Extended CSS and snippet rules are not supported
+            return
+        for marker, exception in (("#@#", True), ("##", False)):
+            index = line.find(marker)
+            if index >= 0:
+                # Selectors are case sensitive, so only the network rules get lowercased
+                self.cosmetic.add(line[:index], line[index + len(marker):].strip(), exception)
+                return
+        parsed = parse_network_filter(line.lower())
+        if parsed is None:
+            return
+        exception, kind, target, conditions = parsed
+        (self.exceptions if exception else self.blocking).add_filter(kind, target, conditions)
+
+    @classmethod
+    def build(cls, builtin_rules, paths):
+        engine = cls()
+        for rule in builtin_rules:
+            engine.blocking.add(rule)
+        for path in paths:
+            with open(path, encoding="utf-8", errors="replace") as filter_list:
+                for line in filter_list:
+                    engine.add_filter(line)
+        engine.blocking.compile()
+        engine.exceptions.compile()
+        engine.cosmetic.compile()
+        return engine
+
+    @staticmethod
+    def list_files(list_dir):
+        if not list_dir or not os.path.isdir(list_dir):
+            return []
+        return sorted(os.path.join(list_dir, name) for name in os.listdir(list_dir)
+                      if name.endswith(".txt") and os.path.isfile(os.path.join(list_dir, name)))
+
+    @classmethod
+    def fingerprint_for(cls, builtin_rules, paths):
+        digest = hashlib.sha256(str(cls.CACHE_VERSION).encode())
+        for rule in builtin_rules:
+            digest.update(rule.encode() + b"\n")
+        for path in paths:
+            stat = os.stat(path)
+            digest.update(f"{path}\0{stat.st_size}\0{stat.st_mtime_ns}\n".encode())
+        return digest.digest()
+
+    @classmethod
+    def load(cls, builtin_rules, list_dir, cache_path):
+        started = time.perf_counter()
+        paths = cls.list_files(list_dir)
+        fingerprint = cls.fingerprint_for(builtin_rules, paths)
+        engine = cls.read_cache(cache_path, fingerprint)
+        if engine is None:
+            # Lists changed (or first run): parse them and refresh the cache
+            engine = cls.build(builtin_rules, paths)
+            engine.fingerprint = fingerprint
+            try:
+                engine.write_cache(cache_path)
+            except OSError:
+                pass
+        engine.build_seconds = time.perf_counter() - started
+        engine.cache_bytes = os.path.getsize(cache_path) if os.path.exists(cache_path) else 0
+        return engine
+
+    @classmethod
+    def read_cache(cls, cache_path, fingerprint):
+        try:
+            with open(cache_path, "rb") as cache_file, \
+                    mmap.mmap(cache_file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                magic, version, stored = cls.CACHE_HEADER.unpack_from(data)
+                if magic != cls.CACHE_MAGIC or version != cls.CACHE_VERSION or stored != fingerprint:
+                    return None
+                view = memoryview(data)
+                try:
+                    blocking, exceptions, cosmetic = marshal.loads(view[cls.CACHE_HEADER.size:])
+                finally:
+                    view.release()
+        except (OSError, ValueError, EOFError, TypeError, struct.error):
+            return None
+        engine = cls()
+        try:
+            engine.blocking = FilterMatcher.from_state(blocking)
+            engine.exceptions = FilterMatcher.from_state(exceptions)
+            engine.cosmetic = CosmeticFilters.from_state(cosmetic)
+        except Exception:
+            # A damaged cache with a valid header; the caller parses the lists again
+            log.warning("Ignoring unreadable filter cache %s", cache_path, exc_info=True)
+            return None
+        engine.fingerprint = fingerprint
+        engine.from_cache = True
+        return engine
+
+    def write_cache(self, cache_path):
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        payload = marshal.dumps((self.blocking.to_state(), self.exceptions.to_state(),
+                                 self.cosmetic.to_state()))
+        # Write next to the target and rename so a crash never leaves a torn cache
+        temp_path = cache_path + ".tmp"
+        with open(temp_path, "wb") as cache_file:
+            cache_file.write(self.CACHE_HEADER.pack(self.CACHE_MAGIC, self.CACHE_VERSION, self.fingerprint))
+            cache_file.write(payload)
+        os.replace(temp_path, cache_path)
+
+
+class DecisionCache:
+    # Bounded LRU of host-level verdicts keyed by (page host, request host,
+    # resource type). Pages ask for the same tracker and CDN hosts over and
+    # over, so most requests skip the rule lookups entirely. The cache is
+    # tied to one FilterEngine and empties itself when the engine is swapped
+    def __init__(self, capacity=4096):
+        self.capacity = capacity
+        self.entries = OrderedDict()
+        self.engine = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def verdict(self, engine, first_party, host, resource_type):
+        if engine is not self.engine:
+            if self.engine is not None:
+                self.invalidations += 1
+            self.entries.clear()
+            self.engine = engine
+        key = (first_party, host, resource_type)
+        entries = self.entries
+        verdict = entries.get(key)
+        if verdict is not None:
+            entries.move_to_end(key)
+            self.hits += 1
+            return verdict
+        self.misses += 1
+        verdict = entries[key] = engine.host_verdict(host, first_party, resource_type)
+        if len(entries) > self.capacity:
+            entries.popitem(last=False)
+            self.evictions += 1
+        return verdict
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self.entries),
+            "capacity": self.capacity,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+class RequestStats:
+    # Allowed/blocked request counts for one tab, in total and per request host
+    def __init__(self):
+        self.allowed = 0
+        self.blocked = 0
+        self.hosts = {}
+
+    def record(self, host, blocked):
+        counts = self.hosts.get(host)
+        if counts is None:
+            counts = self.hosts[host] = [0, 0]
+        if blocked:
+            counts[1] += 1
+            self.blocked += 1
+        else:
+            counts[0] += 1
+            self.allowed += 1
+
+    def top_blocked(self, count=10):
+        ranked = sorted(self.hosts.items(), key=lambda item: item[1][1], reverse=True)
+        return [(host, counts[1]) for host, counts in ranked[:count] if counts[1]]
+
+
+def har_time(seconds):
+    # ISO 8601 in UTC with milliseconds, as HAR's startedDateTime wants
+    return time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(seconds)) + f".{int(seconds * 1000) % 1000:03d}Z"
+
+
+class NetworkRecorder:
+    # Opt-in request log for one tab, exported as HAR. The tab's interceptor
+    # adds a request as it is decided; RESOURCE_TIMING, injected into the
+    # page, buffers PerformanceResourceTiming entries until the page takes
+    # them with COLLECT. Requests and timings are both rings, so a tab left
+    # recording keeps only the last CAPACITY of each
+    CAPACITY = 2000
+    SCRIPT_NAME = "arcweb-resource-timing"
+    
+    RESOURCE_TIMING = """
+        (function() {
+            if (window.__arcwebTimings !== undefined || !window.PerformanceObserver) return;
+            var buffer = window.__arcwebTimings = [];
+            function keep(list) {
+                list.getEntries().forEach(function(entry) {
+                    if (buffer.length >= __CAPACITY__) buffer.shift();
+                    buffer.push({
+                        url: entry.name, kind: entry.entryType, initiator: entry.initiatorType || "",
+                        started: performance.timeOrigin + entry.startTime, start: entry.startTime,
+                        duration: entry.duration, dnsStart: entry.domainLookupStart,
+                        dnsEnd: entry.domainLookupEnd, connectStart: entry.connectStart,
+                        connectEnd: entry.connectEnd, sslStart: entry.secureConnectionStart,
+                        requestStart: entry.requestStart, responseStart: entry.responseStart,
+                        responseEnd: entry.responseEnd, transferSize: entry.transferSize,
+                        encodedSize: entry.encodedBodySize, decodedSize: entry.decodedBodySize,
+                        status: entry.responseStatus || 0, protocol: entry.nextHopProtocol || "",
+                        contentLoaded: entry.domContentLoadedEventEnd || 0, loaded: entry.loadEventEnd || 0
+                    });
+                });
+            }
+            new PerformanceObserver(keep).observe({type: "resource", buffered: true});
+            new PerformanceObserver(keep).observe({type: "navigation", buffered: true});
+        })();
+    """
+    
+    # Empties the page's buffer in place; the observers keep appending to the same array
+    COLLECT = "window.__arcwebTimings ? window.__arcwebTimings.splice(0) : []"
+    
+    def __init__(self, capacity=CAPACITY):
+        self.requests = deque(maxlen=capacity)
+        self.timings = deque(maxlen=capacity)
+    
+    @classmethod
+    def timing_source(cls):
+        return cls.RESOURCE_TIMING.replace("__CAPACITY__", str(cls.CAPACITY))
+    
+    @classmethod
+    def timing_script(cls):
+        script = QWebEngineScript()
+        script.setName(cls.SCRIPT_NAME)
+        script.setInjectionPoint(QWebEngineScript.InjectionPoint.DocumentCreation)
+        script.setWorldId(QWebEngineScript.ScriptWorldId.ApplicationWorld)
+        script.setSourceCode(cls.timing_source())
+        return script
+    
+    def record(self, info, blocked):
+        resource_type = AdBlocker.RESOURCE_TYPES.get(info.resourceType(), "other")
+        method = info.requestMethod().data().decode("ascii", "replace")
+        self.requests.append((time.time(), method, info.requestUrl().toString(), resource_type, blocked))
+    
+    def add_timings(self, timings):
+        self.timings.extend(timing for timing in timings or () if isinstance(timing, dict))
+    
+    @staticmethod
+    def phases(timing):
+        # HAR timings in ms. Cross-origin responses without Timing-Allow-Origin
+        # only expose their duration, which is then all counted as waiting
+        if not timing["requestStart"]:
+            return {"blocked": -1, "dns": -1, "connect": -1, "ssl": -1,
+                    "send": 0, "wait": timing["duration"], "receive": 0}
+        return {
+            "blocked": max(timing["dnsStart"] - timing["start"], 0),
+            "dns": timing["dnsEnd"] - timing["dnsStart"],
+            "connect": timing["connectEnd"] - timing["connectStart"],
+            "ssl": timing["connectEnd"] - timing["sslStart"] if timing["sslStart"] else -1,
+            "send": 0,
+            "wait": max(timing["responseStart"] - timing["requestStart"], 0),
+            "receive": max(timing["responseEnd"] - timing["responseStart"], 0),
+        }
+    
+    def har(self):
+        # Requests are paired with timing entries for the same URL in order.
+        # Blocked requests never reach the network, so they have no timing
+        timings = {}
+        for timing in self.timings:
+            timings.setdefault(timing["url"], deque()).append(timing)
+        pages, entries = [], []
+        for started, method, url, resource_type, blocked in self.requests:
+            pending = timings.get(url)
+            timing = pending.popleft() if pending and not blocked else None
+            if resource_type == "document":
+                # Each main-frame document starts a page
+                loaded = timing or {}
+                pages.append({
+                    "startedDateTime": har_time(started),
+                    "id": f"page_{len(pages) + 1}",
+                    "title": url,
+                    "pageTimings": {"onContentLoad": loaded.get("contentLoaded") or -1,
+                                    "onLoad": loaded.get("loaded") or -1},
+                })
+            phases = self.phases(timing) if timing else {"send": 0, "wait": 0, "receive": 0}
+            entry = {
+                "startedDateTime": har_time(timing["started"] / 1000 if timing else started),
+                "time": sum(value for name, value in phases.items() if name != "ssl" and value > 0),
+                "request": {"method": method, "url": url, "httpVersion": timing["protocol"] if timing else "",
+                            "cookies": [], "headers": [], "queryString": [], "headersSize": -1, "bodySize": -1},
+                "response": {"status": timing["status"] if timing else 0, "statusText": "",
+                             "httpVersion": timing["protocol"] if timing else "", "cookies": [], "headers": [],
+                             "content": {"size": timing["decodedSize"] if timing else 0, "mimeType": ""},
+                             "redirectURL": "", "headersSize": -1,
+                             "bodySize": timing["encodedSize"] if timing else -1},
+                "cache": {},
+                "timings": phases,
+                "_resourceType": resource_type,
+                "_blocked": blocked,
+            }
+            if timing:
+                entry["_initiatorType"] = timing["initiator"]
+                entry["_transferSize"] = timing["transferSize"]
+            if pages:
+                entry["pageref"] = pages[-1]["id"]
+            entries.append(entry)
+        return {"log": {"version": "1.2", "creator": {"name": "ArcWeb", "version": ""},
+                        "pages": pages, "entries": entries}}
+
+
+def app_data_path(*parts):
+    # Same organization/application names the QSettings store uses
+    base = QStandardPaths.writableLocation(QStandardPaths.GenericDataLocation)
+    return os.path.join(base, "ModernBrowser", "WebBrowser", *parts)
+
+
+def memory_database(name):
+    # An in-memory SQLite database shared by every connection opened on this path
+    return f"file:arcweb-{name}?mode=memory&cache=shared"
+
+
+def connect_database(path):
+    # A store's database file, or a memory_database() for an ephemeral profile.
+    # Shared-cache connections lock whole tables, so they read uncommitted data
+    # rather than wait on a writer thread
+    if path.startswith("file:"):
+        db = sqlite3.connect(path, uri=True)
+        db.execute("PRAGMA read_uncommitted=1")
+        return db
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    return sqlite3.connect(path)
 
 
 class AdBlocker(QWebEngineUrlRequestInterceptor):
-    def __init__(self, parent=None):
+    # Common ad domains, always active on top of any filter lists
+    BUILTIN_RULES = [
+        "ads.", "ad.", "banner.", "banners.", "adserv.", "adserver.",
+        "advert.", "popup.", "pop-up.", "track.", "tracker.", "tracking.",
+        "stats.", "stat.", "analytics.", "metric.", "googleadservices.",
+        "googlesyndication.", "doubleclick.", "amazon-adsystem.",
+        "facebook.net", "facebook.com/tr", "analytics.google.com",
+        "pagead2.", "2mdn.net", "serving-sys.com", "scdn.cxense.com", 
+        "scorecardresearch.com", "adnxs.com", "taboola.com", "outbrain.com"
+    ]
+
+    RESOURCE_TYPES = {
+        QWebEngineUrlRequestInfo.ResourceType.ResourceTypeMainFrame: "document",
+        QWebEngineUrlRequestInfo.ResourceType.ResourceTypeSubFrame: "subdocument",
+        QWebEngineUrlRequestInfo.ResourceType.ResourceTypeStylesheet: "stylesheet",
+        QWebEngineUrlRequestInfo.ResourceType.ResourceTypeScript: "script",
+        QWebEngineUrlRequestInfo.ResourceType.ResourceTypeImage: "image",
+        QWebEngineUrlRequestInfo.ResourceType.ResourceTypeFavicon: "image",
+        QWebEngineUrlRequestInfo.ResourceType.ResourceTypeFontResource: "font",
+        QWebEngineUrlRequestInfo.ResourceType.ResourceTypeObject: "object",
+        QWebEngineUrlRequestInfo.ResourceType.ResourceTypePluginResource: "object",
+        QWebEngineUrlRequestInfo.ResourceType.ResourceTypeMedia: "media",
+        QWebEngineUrlRequestInfo.ResourceType.ResourceTypeXhr: "xmlhttprequest",
+        QWebEngineUrlRequestInfo.ResourceType.ResourceTypePing: "ping",
+        QWebEngineUrlRequestInfo.ResourceType.ResourceTypeWebSocket: "websocket",
+    }
+
+    # Emitted from the worker thread once a rebuilt engine is live
+    filtersReloaded = Signal()
+
+    # Injected at document creation to apply an element hiding stylesheet
+    COSMETIC_SCRIPT = """
+        (function() {
+            var css = __CSS__;
+            var skip = __SKIP__;
+            var host = location.hostname;
+            for (var i = 0; i < skip.length; i++) {
+                if (host === skip[i] || host.endsWith("." + skip[i])) return;
+            }
+            function insert() {
+                var style = document.createElement("style");
+                style.textContent = css;
+                (document.head || document.documentElement).appendChild(style);
+            }
+            try {
+                var sheet = new CSSStyleSheet();
+                sheet.replaceSync(css);
+                document.adoptedStyleSheets = document.adoptedStyleSheets.concat([sheet]);
+            } catch (e) {
+                // At document creation there may be no root element to append to yet
+                if (document.documentElement) {
+                    insert();
+                    return;
+                }
+                var observer = new MutationObserver(function() {
+                    if (document.documentElement) {
+                        observer.disconnect();
+                        insert();
+                    }
+                });
+                observer.observe(document, {childList: true});
+            }
+        })();
+    """
+    GENERIC_SCRIPT_NAME = "arcweb-cosmetic-generic"
+    SITE_SCRIPT_NAME = "arcweb-cosmetic-site"
+
+    def __init__(self, parent=None, filter_dir=None, cache_path=None):
+        super().__init__(parent)
+        self.filter_dir = filter_dir or app_data_path("filters")
+        self.cache_path = cache_path or app_data_path("filters.cache")
+        self.blocked_hosts = set()
+        self.enabled = True
+        self.decisions = DecisionCache()
+        self._generic_script = None
+        self._generic_script_engine = None
+        self.load_filters()
+        
+        # Rebuild in the background whenever the filter directory changes
+        self._reload_lock = threading.Lock()
+        self._reload_running = False
+        self._reload_pending = False
+        self.reload_timer = QTimer(self)
+        self.reload_timer.setSingleShot(True)
+        self.reload_timer.setInterval(1000)
+        self.reload_timer.timeout.connect(self.reload_filters)
+        self.watcher = QFileSystemWatcher(self)
+        self.watcher.directoryChanged.connect(self.schedule_reload)
+        self.watcher.fileChanged.connect(self.schedule_reload)
+        self.watch_filter_files()
+        
+    def load_filters(self):
+        # Built-in rules plus every *.txt list (EasyList / Adblock Plus syntax) in the filter directory
+        for domain in self.BUILTIN_RULES:
+            self.blocked_hosts.add(domain)
+        
+        try:
+            os.makedirs(self.filter_dir, exist_ok=True)
+            self.engine = FilterEngine.load(sorted(self.blocked_hosts), self.filter_dir, self.cache_path)
+        except Exception:
+            # A bad list must not keep the browser from starting
+            log.exception("Could not load the filter lists; blocking with the built-in rules only")
+            self.engine = FilterEngine.build(sorted(self.blocked_hosts), [])
+    
+    def watch_filter_files(self):
+        # Directory events only cover added/removed files, so watch each list too
+        watched = set(self.watcher.files()) | set(self.watcher.directories())
+        wanted = {self.filter_dir, *FilterEngine.list_files(self.filter_dir)}
+        if watched - wanted:
+            self.watcher.removePaths(list(watched - wanted))
+        if wanted - watched:
+            self.watcher.addPaths(list(wanted - watched))
+    
+    def schedule_reload(self, path=None):
+        # Editors and downloads touch a file several times; coalesce into one rebuild
+        self.reload_timer.start()
+    
+    def reload_filters(self):
+        self.watch_filter_files()
+        with self._reload_lock:
+            if self._reload_running:
+                self._reload_pending = True
+                return
+            self._reload_running = True
+        threading.Thread(target=self._rebuild_engine, name="filter-rebuild", daemon=True).start()
+    
+    def _rebuild_engine(self):
+        rules = sorted(self.blocked_hosts)
+        reloaded = finished = False
+        try:
+            while True:
+                try:
+                    engine = FilterEngine.load(rules, self.filter_dir, self.cache_path)
+                except Exception:
+                    # A list that vanished or cannot be read; the next change to the directory retries
+                    log.exception("Reloading the filter lists failed; keeping the current rules")
+                else:
+                    # One reference assignment: requests see either the old engine or the
+                    # finished new one, never a partially built one
+                    self.engine = engine
+                    reloaded = True
+                with self._reload_lock:
+                    if not self._reload_pending:
+                        self._reload_running = False
+                        finished = True
+                        break
+                    self._reload_pending = False
+        finally:
+            if not finished:
+                # Otherwise every later reload would be skipped as already running
+                with self._reload_lock:
+                    self._reload_running = False
+                    self._reload_pending = False
+        if reloaded:
+            self.filtersReloaded.emit()
+    
+    def reload_stats(self):
+        engine = self.engine
+        return {
+            "rules": len(engine),
+            "build_ms": engine.build_seconds * 1000,
+            "cache_bytes": engine.cache_bytes,
+            "from_cache": engine.from_cache,
+        }
+    
+    def cosmetic_script(self, name, css, skip_hosts=(), subframes=False):
+        script = QWebEngineScript()
+        script.setName(name)
+        script.setInjectionPoint(QWebEngineScript.InjectionPoint.DocumentCreation)
+        # Isolated from page scripts, so they cannot tamper with how the sheet is added
+        script.setWorldId(QWebEngineScript.ScriptWorldId.ApplicationWorld)
+        script.setRunsOnSubFrames(subframes)
+        script.setSourceCode(self.COSMETIC_SCRIPT.replace("__CSS__", json.dumps(css))
+                                                 .replace("__SKIP__", json.dumps(list(skip_hosts))))
+        return script
+    
+    def generic_cosmetic_script(self):
+        # Built once per engine and shared by every page
+        engine = self.engine
+        if self._generic_script_engine is not engine:
+            self._generic_script = self.cosmetic_script(self.GENERIC_SCRIPT_NAME, engine.cosmetic.generic_sheet,
+                                                        engine.cosmetic.generic_excluded, subframes=True)
+            self._generic_script_engine = engine
+        return engine, self._generic_script
+    
+    def site_cosmetic_script(self, host):
+        css = self.engine.cosmetic.site_sheet(host)
+        return self.cosmetic_script(self.SITE_SCRIPT_NAME, css) if css else None
+    
+    def check_request(self, info):
+        # Returns (request host, blocked) for an intercepted request
+        url = info.requestUrl()
+        host = url.host().lower()
+        if not self.enabled:
+            return host, False
+        
+        # Read the engine once; a background reload may swap it at any time
+        engine = self.engine
+        first_party = info.firstPartyUrl().host().lower()
+        resource_type = self.RESOURCE_TYPES.get(info.resourceType(), "other")
+        verdict = self.decisions.verdict(engine, first_party, host, resource_type)
+        if verdict == VERDICT_ALLOW:
+            return host, False
+        
+        # Block if the request matches a filter and no exception rule allows it
+        return host, engine.should_block(url.toString().lower(), host, first_party, resource_type, verdict)
+    
+    def interceptRequest(self, info):
+        info.block(self.check_request(info)[1])
+
+
+class PageRequestInterceptor(QWebEngineUrlRequestInterceptor):
+    # Installed on each tab's page so every decision can be attributed to the tab
+    def __init__(self, ad_blocker, stats, parent=None):
+        super().__init__(parent)
+        self.ad_blocker = ad_blocker
+        self.stats = stats
+        self.recorder = None
+    
+    def interceptRequest(self, info):
+        host, blocked = self.ad_blocker.check_request(info)
+        self.stats.record(host, blocked)
+        if self.recorder is not None:
+            self.recorder.record(info, blocked)
+        info.block(blocked)
+
+
+class CustomWebEnginePage(QWebEnginePage):
+    def __init__(self, profile, parent=None, ad_blocker=None, request_stats=None):
+        super().__init__(profile, parent)
+        
+        # Route requests through the ad blocker per page so counts can be kept per tab
+        self.ad_blocker = ad_blocker
+        self.cosmetic_engine = None
+        self.request_stats = request_stats or RequestStats()
+        self.request_interceptor = None
+        self.recorder = None
+        self.recorder_timer = None
+        if ad_blocker is not None:
+            self.request_interceptor = PageRequestInterceptor(ad_blocker, self.request_stats, self)
+            self.set_ad_blocking(ad_blocker.enabled)
+        
+        # Web settings come from the profile; see Browser.apply_web_settings
+        
+        # Lets the lifecycle manager tell whether the page has unsaved input
+        self.scripts().insert(TabLifecycleManager.form_tracker_script())
+        
+    def set_ad_blocking(self, enabled):
+        # With blocking off the page gets no interceptor at all, so its requests skip
+        # Python entirely; a recording page keeps it, and check_request then allows everything
+        if self.request_interceptor is not None:
+            keep = enabled or self.recorder is not None
+            self.setUrlRequestInterceptor(self.request_interceptor if keep else None)
+    
+    def set_recording(self, enabled):
+        # Opt-in network capture for HAR export; turning it off drops what was recorded
+        if self.request_interceptor is None:
+            return
+        scripts = self.scripts()
+        for script in scripts.find(NetworkRecorder.SCRIPT_NAME):
+            scripts.remove(script)
+        if enabled:
+            self.recorder = NetworkRecorder()
+            scripts.insert(NetworkRecorder.timing_script())
+            # The current document predates the script; buffered observers still see its earlier entries
+            self.runJavaScript(NetworkRecorder.timing_source(), QWebEngineScript.ScriptWorldId.ApplicationWorld)
+            if self.recorder_timer is None:
+                # Timings are taken before a navigation replaces the document, and
+                # periodically so the page's own buffer stays short
+                self.recorder_timer = QTimer(self)
+                self.recorder_timer.setInterval(5000)
+                self.recorder_timer.timeout.connect(lambda: self.collect_timings())
+                self.loadStarted.connect(lambda: self.collect_timings())
+                self.loadFinished.connect(lambda ok: self.collect_timings())
+            self.recorder_timer.start()
+        else:
+            self.recorder = None
+            if self.recorder_timer is not None:
+                self.recorder_timer.stop()
+        self.request_interceptor.recorder = self.recorder
+        self.set_ad_blocking(self.ad_blocker.enabled)
+    
+    def collect_timings(self, callback=None):
+        # Moves the page's buffered timing entries into the recorder, then calls callback(recorder)
+        recorder = self.recorder
+        if recorder is None:
+            return
+        def taken(timings):
+            recorder.add_timings(timings)
+            if callback is not None:
+                callback(recorder)
+        self.runJavaScript(NetworkRecorder.COLLECT, QWebEngineScript.ScriptWorldId.ApplicationWorld, taken)
+    
+    def acceptNavigationRequest(self, url, type, isMainFrame):
+        # Swap in the element hiding sheet for the new site before its document is created
+        if isMainFrame and self.ad_blocker is not None:
+            self.update_cosmetic_scripts(url)
+        
+        # Always accept navigation request
+        return True
+    
+    def update_cosmetic_scripts(self, url):
+        scripts = self.scripts()
+        for script in scripts.find(AdBlocker.SITE_SCRIPT_NAME):
+            scripts.remove(script)
+        
+        if not self.ad_blocker.enabled:
+            for script in scripts.find(AdBlocker.GENERIC_SCRIPT_NAME):
+                scripts.remove(script)
+            self.cosmetic_engine = None
+            return
+        
+        # The shared generic sheet only changes when the filter lists are reloaded
+        engine, generic = self.ad_blocker.generic_cosmetic_script()
+        if self.cosmetic_engine is not engine:
+            for script in scripts.find(AdBlocker.GENERIC_SCRIPT_NAME):
+                scripts.remove(script)
+            scripts.insert(generic)
+            self.cosmetic_engine = engine
+        
+        site = self.ad_blocker.site_cosmetic_script(url.host().lower())
+        if site is not None:
+            scripts.insert(site)
+        
+    def javaScriptConsoleMessage(self, level, message, line, source):
+        # Optionally log JavaScript console messages for debugging
+        # print(f"JS [{level}] {message} (Line {line} in {source})")
+        pass
+
+
+def format_bytes(count):
+    for unit in ("B", "KB", "MB", "GB"):
+        if count < 1024 or unit == "GB":
+            return f"{count:.0f} {unit}" if unit == "B" else f"{count:.1f} {unit}"
+        count /= 1024
+
+
+def format_duration(seconds):
+    if seconds < 60:
+        return f"{seconds:.0f} s"
+    if seconds < 3600:
+        return f"{seconds // 60:.0f} min {seconds % 60:.0f} s"
+    return f"{seconds // 3600:.0f} h {seconds % 3600 // 60:.0f} min"
+
+
+class DownloadEntry:
+    # What the downloads list shows for one download, refreshed from the
+    # request at most once per model tick
+    RATE_WINDOW = 3.0
+    
+    def __init__(self, download):
+        self.download = download
+        self.filename = download.downloadFileName()
+        self.received = download.receivedBytes()
+        self.total = download.totalBytes()
+        self.state = download.state()
+        self.rate = 0.0
+        self.sampled = time.monotonic()
+    
+    def refresh(self, now):
+        received = self.download.receivedBytes()
+        elapsed = now - self.sampled
+        if elapsed > 0:
+            # Exponentially weighted throughput with a time constant of RATE_WINDOW seconds
+            weight = 1 - math.exp(-elapsed / self.RATE_WINDOW)
+            self.rate += weight * ((received - self.received) / elapsed - self.rate)
+        self.received = received
+        self.total = self.download.totalBytes()
+        self.state = self.download.state()
+        self.sampled = now
+    
+    def status(self, phase):
+        if phase == "queued":
+            return "Queued"
+        if phase == "paused":
+            return f"Paused - {format_bytes(self.received)}"
+        if phase == "retrying":
+            return f"Interrupted ({self.download.interruptReasonString()}), retrying"
+        if phase == "failed":
+            return f"Failed - {self.download.interruptReasonString()}"
+        if self.state == QWebEngineDownloadRequest.DownloadCompleted:
+            return f"Completed - {format_bytes(self.received)}"
+        if self.state == QWebEngineDownloadRequest.DownloadCancelled:
+            return "Cancelled"
+        if self.state == QWebEngineDownloadRequest.DownloadInterrupted:
+            return f"Interrupted - {self.download.interruptReasonString()}"
+        if self.total <= 0:
+            return f"{format_bytes(self.received)} - {format_bytes(self.rate)}/s"
+        text = f"{self.received * 100 // self.total}% of {format_bytes(self.total)} - {format_bytes(self.rate)}/s"
+        if self.rate > 0:
+            text += f", {format_duration((self.total - self.received) / self.rate)} left"
+        return text
+
+
+_positioned_io = threading.Lock()
+
+
+def write_at(fd, data, offset):
+    # Positioned write; Windows has no os.pwrite, so seek and write under a lock there
+    data = memoryview(data)
+    if hasattr(os, "pwrite"):
+        while data:
+            written = os.pwrite(fd, data, offset)
+            data, offset = data[written:], offset + written
+        return
+    with _positioned_io:
+        os.lseek(fd, offset, os.SEEK_SET)
+        while data:
+            data = data[os.write(fd, data):]
+
+
+def read_at(fd, size, offset):
+    if hasattr(os, "pread"):
+        return os.pread(fd, size, offset)
+    with _positioned_io:
+        os.lseek(fd, offset, os.SEEK_SET)
+        return os.read(fd, size)
+
+
+class SegmentedFetcher:
+    # Downloads one URL over several HTTP range requests at once, sharing a
+    # pooled keep-alive session. Each segment writes at its own offset into a
+    # preallocated .part file, and segment progress is saved alongside it so
+    # a stopped or interrupted download resumes where each segment left off.
+    # A SHA-256 follows the contiguous finished prefix of the file as the
+    # segments fill in, and is checked against the server's digest if it
+    # sent one
+    CHUNK = 256 * 1024
+    MIN_SEGMENT = 4 * 1024 * 1024
+    ATTEMPTS = 3
+    SAVE_INTERVAL = 1.0
+    
+    def __init__(self, url, path, segments=4, session=None):
+        self.url = url
+        self.path = path
+        self.part_path = path + ".part"
+        self.state_path = path + ".part.json"
+        self.segment_count = max(1, segments)
+        self.session = session or self.new_session(self.segment_count)
+        self.size = None
+        self.validator = None
+        self.expected_digest = None
+        self.digest = None
+        self.segments = []
+        self.received = 0
+        self.error = None
+        self.discarded = False
+        self.lock = threading.Lock()
+        self.progressed = threading.Condition(self.lock)
+        self.stop_event = threading.Event()
+    
+    @staticmethod
+    def new_session(connections):
+        # Imported on first use: requests adds over 100 ms to startup and most
+        # sessions never make a segmented download
+        import requests
+        session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=connections)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
+    
+    def probe(self):
+        # One-byte range request: a 206 with a Content-Range total means the
+        # server can serve segments. Returns False if it cannot
+        import requests
+        try:
+            with self.session.get(self.url, headers={"Range": "bytes=0-0"}, stream=True, timeout=15) as response:
+                content_range = response.headers.get("Content-Range", "")
+                if response.status_code != 206 or not content_range.startswith("bytes 0-0/"):
+                    return False
+                if response.headers.get("Accept-Ranges", "bytes").lower() == "none":
+                    return False
+                size = content_range.rpartition("/")[2]
+                if not size.isdigit():
+                    return False
+                self.url = response.url
+                self.size = int(size)
+                self.validator = response.headers.get("ETag") or response.headers.get("Last-Modified")
+                self.expected_digest = self.parse_digest(response.headers)
+                return True
+        except requests.RequestException as error:
+            log.info("Range probe failed for %s: %s", self.url, error)
+            return False
+    
+    @staticmethod
+    def parse_digest(headers):
+        # RFC 3230 "Digest: SHA-256=<base64>" or RFC 9530 "Repr-Digest: sha-256=:<base64>:"
+        for name in ("Repr-Digest", "Digest"):
+            for item in headers.get(name, "").split(","):
+                algorithm, _, value = item.strip().partition("=")
+                if algorithm.lower() == "sha-256" and value:
+                    try:
+                        return base64.b64decode(value.strip(":")).hex()
+                    except ValueError:
+                        return None
+        return None
+    
+    def plan(self):
+        # Carry on from saved segments if they describe this same file, else start over
+        self.discarded = False
+        try:
+            with open(self.state_path, encoding="utf-8") as state_file:
+                state = json.load(state_file)
+            if (state["url"] == self.url and state["size"] == self.size and state["validator"] == self.validator
+                    and os.path.getsize(self.part_path) == self.size):
+                self.segments = state["segments"]
+                self.received = sum(position - start for start, _, position in self.segments)
+                return
+        except (OSError, ValueError, KeyError):
+            pass
+        
+        count = max(1, min(self.segment_count, self.size // self.MIN_SEGMENT))
+        bounds = [self.size * i // count for i in range(count + 1)]
+        self.segments = [[bounds[i], bounds[i + 1], bounds[i]] for i in range(count)]
+        self.received = 0
+        os.makedirs(os.path.dirname(self.part_path) or ".", exist_ok=True)
+        with open(self.part_path, "wb") as part_file:
+            if hasattr(os, "posix_fallocate") and self.size:
+                os.posix_fallocate(part_file.fileno(), 0, self.size)
+            else:
+                part_file.truncate(self.size)
+        self.save_state()
+    
+    def save_state(self):
+        # Written under the lock, so a discard() on a worker cannot be undone by a checkpoint
+        with self.lock:
+            if self.discarded:
+                return
+            state = {"url": self.url, "size": self.size, "validator": self.validator,
+                     "segments": [list(segment) for segment in self.segments]}
+            temp_path = self.state_path + ".tmp"
+            with open(temp_path, "w", encoding="utf-8") as state_file:
+                json.dump(state, state_file)
+            os.replace(temp_path, self.state_path)
+    
+    def complete(self):
+        return bool(self.segments) and all(position >= end for _, end, position in self.segments)
+    
+    def contiguous(self):
+        # End of the finished prefix of the file; call with the lock held
+        for _, end, position in self.segments:
+            if position < end:
+                return position
+        return self.size
+    
+    def stop(self):
+        self.stop_event.set()
+        with self.progressed:
+            self.progressed.notify_all()
+    
+    def fail(self, message):
+        if self.error is None:
+            self.error = message
+        self.stop()
+    
+    def run(self):
+        # Blocks until the file is complete, stop() is called or a segment fails.
+        # Returns True once the file is in place at self.path. Clear stop_event
+        # before running again after a stop
+        if self.size is None and not self.probe():
+            self.error = "Server does not support range requests"
+            return False
+        self.plan()
+        self.error = None
+        
+        fd = os.open(self.part_path, os.O_RDWR | getattr(os, "O_BINARY", 0))
+        try:
+            workers = [threading.Thread(target=self.fetch_segment, args=(segment, fd), daemon=True)
+                       for segment in self.segments if segment[2] < segment[1]]
+            hasher = threading.Thread(target=self.hash_prefix, args=(fd,), daemon=True)
+            for worker in workers + [hasher]:
+                worker.start()
+            # Checkpoint segment progress while the workers run
+            alive = workers
+            while alive:
+                alive[0].join(self.SAVE_INTERVAL)
+                self.save_state()
+                alive = [worker for worker in alive if worker.is_alive()]
+            with self.progressed:
+                self.progressed.notify_all()
+            if not self.complete():
+                self.stop()
+            hasher.join()
+        finally:
+            os.close(fd)
+        
+        self.save_state()
+        if self.error or not self.complete():
+            return False
+        if self.expected_digest and self.digest != self.expected_digest:
+            # Corrupt either way; start from scratch next time
+            self.error = "Checksum mismatch"
+            self.discard()
+            return False
+        os.replace(self.part_path, self.path)
+        os.remove(self.state_path)
+        return True
+    
+    def discard(self):
+        with self.lock:
+            self.discarded = True
+            for path in (self.part_path, self.state_path):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+    
+    def fetch_segment(self, segment, fd):
+        import requests
+        attempts = 0
+        while segment[2] < segment[1] and not self.stop_event.is_set():
+            headers = {"Range": f"bytes={segment[2]}-{segment[1] - 1}"}
+            if self.validator:
+                headers["If-Range"] = self.validator
+            before = segment[2]
+            error = None
+            try:
+                with self.session.get(self.url, headers=headers, stream=True, timeout=30) as response:
+                    if response.status_code != 206:
+                        # A 200 here means If-Range failed: the file changed on the server
+                        self.discard()
+                        self.fail(f"Server answered {response.status_code} to a range request")
+                        return
+                    for chunk in response.iter_content(self.CHUNK):
+                        if self.stop_event.is_set():
+                            return
+                        chunk = chunk[:segment[1] - segment[2]]
+                        write_at(fd, chunk, segment[2])
+                        with self.progressed:
+                            segment[2] += len(chunk)
+                            self.received += len(chunk)
+                            self.progressed.notify_all()
+            except (requests.RequestException, OSError) as exc:
+                error = str(exc)
+            # Progress resets the retry count, and a short body that made some just
+            # carries on; an empty one counts as a failed attempt like an error
+            if segment[2] > before:
+                attempts = 0
+                if error is None:
+                    continue
+            attempts += 1
+            if attempts >= self.ATTEMPTS:
+                self.fail(error or "Server sent no data for a range request")
+                return
+            time.sleep(attempts)
+    
+    def hash_prefix(self, fd):
+        # Hash bytes as soon as everything before them has arrived; the data is
+        # still in the page cache, so this reads memory rather than disk
+        hasher = hashlib.sha256()
+        hashed = 0
+        while hashed < self.size:
+            with self.progressed:
+                while self.contiguous() <= hashed and not self.stop_event.is_set():
+                    self.progressed.wait()
+                available = self.contiguous()
+            if self.stop_event.is_set():
+                return
+            while hashed < available:
+                data = read_at(fd, min(self.CHUNK * 4, available - hashed), hashed)
+                hasher.update(data)
+                hashed += len(data)
+        self.digest = hasher.hexdigest()
+
+
+class SegmentedDownloadRequest(QObject):
+    # Stands in for a QWebEngineDownloadRequest, so the scheduler and the
+    # downloads list treat engine downloads exactly like Chromium's. The
+    # fetcher runs on a worker thread; progress is polled from the UI thread
+    # and the outcome comes back through a queued signal
+    receivedBytesChanged = Signal()
+    totalBytesChanged = Signal()
+    stateChanged = Signal(object)
+    isFinishedChanged = Signal()
+    fallbackRequested = Signal()
+    runFinished = Signal(bool)
+    MIN_SIZE = 32 * 1024 * 1024
+    ids = itertools.count(1 << 32)
+    
+    def __init__(self, url, filename, total, segments=4, parent=None):
+        super().__init__(parent)
+        self.download_id = next(self.ids)
+        self.source = QUrl(url)
+        self.filename = filename
+        self.directory = ""
+        self.total = total
+        self.segments = segments
+        self.download_state = QWebEngineDownloadRequest.DownloadRequested
+        self.paused = False
+        self.fetcher = None
+        self.thread = None
+        self.reason = ""
+        self.runFinished.connect(self.run_finished)
+        
+        self.poll_timer = QTimer(self)
+        self.poll_timer.setInterval(100)
+        self.poll_timer.timeout.connect(self.receivedBytesChanged)
+    
+    def id(self):
+        return self.download_id
+    
+    def url(self):
+        return self.source
+    
+    def downloadFileName(self):
+        return self.filename
+    
+    def setDownloadFileName(self, filename):
+        self.filename = filename
+    
+    def downloadDirectory(self):
+        return self.directory
+    
+    def setDownloadDirectory(self, directory):
+        self.directory = directory
+    
+    def totalBytes(self):
+        return self.fetcher.size if self.fetcher and self.fetcher.size is not None else self.total
+    
+    def receivedBytes(self):
+        return self.fetcher.received if self.fetcher else 0
+    
+    def state(self):
+        return self.download_state
+    
+    def isPaused(self):
+        return self.paused
+    
+    def isFinished(self):
+        return self.download_state in (QWebEngineDownloadRequest.DownloadCompleted,
+                                       QWebEngineDownloadRequest.DownloadCancelled,
+                                       QWebEngineDownloadRequest.DownloadInterrupted)
+    
+    def interruptReasonString(self):
+        return self.reason
+    
+    def set_state(self, state):
+        self.download_state = state
+        self.stateChanged.emit(state)
+        if self.isFinished():
+            self.isFinishedChanged.emit()
+    
+    def accept(self):
+        path = os.path.join(self.directory, self.filename)
+        self.fetcher = SegmentedFetcher(self.source.toString(), path, self.segments)
+        self.set_state(QWebEngineDownloadRequest.DownloadInProgress)
+        self.start()
+    
+    def start(self):
+        if self.thread is not None and self.thread.is_alive():
+            # Still winding down from a pause; run_finished restarts it
+            return
+        self.fetcher.stop_event.clear()
+        self.thread = threading.Thread(target=self.run_fetcher, name="segmented-download", daemon=True)
+        self.thread.start()
+        self.poll_timer.start()
+    
+    def run_fetcher(self):
+        # On the worker thread. runFinished must always arrive, or the download
+        # would stay in progress holding its scheduler slot
+        try:
+            done = self.fetcher.run()
+        except Exception as error:
+            log.exception("Segmented download of %s failed", self.fetcher.url)
+            self.fetcher.error = str(error) or type(error).__name__
+            # Segment workers may still be running if a checkpoint failed
+            self.fetcher.stop()
+            done = False
+        self.runFinished.emit(done)
+    
+    def pause(self):
+        if self.download_state == QWebEngineDownloadRequest.DownloadInProgress and not self.paused:
+            self.paused = True
+            self.fetcher.stop()
+    
+    def resume(self):
+        if self.download_state == QWebEngineDownloadRequest.DownloadInProgress and self.paused:
+            self.paused = False
+            self.start()
+    
+    def cancel(self):
+        if self.isFinished():
+            return
+        self.set_state(QWebEngineDownloadRequest.DownloadCancelled)
+        if self.fetcher:
+            self.fetcher.stop()
+            if self.thread is None or not self.thread.is_alive():
+                self.fetcher.discard()
+    
+    def run_finished(self, done):
+        self.poll_timer.stop()
+        self.receivedBytesChanged.emit()
+        self.totalBytesChanged.emit()
+        if self.download_state == QWebEngineDownloadRequest.DownloadCancelled:
+            self.fetcher.discard()
+        elif done:
+            self.set_state(QWebEngineDownloadRequest.DownloadCompleted)
+        elif self.fetcher.size is None:
+            # No range support: let Chromium have it after all
+            self.set_state(QWebEngineDownloadRequest.DownloadCancelled)
+            self.fallbackRequested.emit()
+        elif self.fetcher.error:
+            self.reason = self.fetcher.error
+            self.set_state(QWebEngineDownloadRequest.DownloadInterrupted)
+        elif not self.paused:
+            # Resumed before the pause had finished stopping the segments
+            self.start()
+
+
+class ScheduledDownload:
+    # Scheduler bookkeeping for one download
+    def __init__(self, download, phase):
+        self.download = download
+        self.phase = phase
+        self.retries = 0
+        self.received = download.receivedBytes()
+        self.allowance = 0.0
+
+
+class DownloadScheduler(QObject):
+    # The one pipeline every download goes through. Downloads are accepted as
+    # they arrive and then paused until one of max_active slots is free.
+    # Interrupted downloads cannot be resumed through the API, so they are
+    # requested again and the new request takes over the old one's place.
+    #
+    # QtWebEngine has no throttling API, so bandwidth caps are token buckets
+    # enforced by pausing a download that has overdrawn its allowance and
+    # resuming it once the allowance refills. The cap is kept on average,
+    # in bursts of up to BURST seconds' worth of bytes
+    # Download ids are 64-bit (segmented downloads count up from 1 << 32),
+    # more than an int signal argument carries
+    phaseChanged = Signal(object)
+    downloadReplaced = Signal(object, object)
+    ACTIVE = ("running", "throttled", "retrying")
+    FINISHED = ("done", "failed")
+    TICK_MS = 250
+    BURST = 1.0
+    MAX_RETRIES = 5
+    RETRY_DELAY_MS = 2000
+    
+    def __init__(self, settings, profile, path, parent=None):
+        super().__init__(parent)
+        self.settings = settings
+        self.profile = profile
+        # Where the queue is saved between runs; None keeps nothing on disk
+        self.path = path
+        self.downloads = OrderedDict()
+        self.restoring = {}
+        self.restore_page = None
+        self.total_allowance = 0.0
+        self.ticked = time.monotonic()
+        
+        self.tick_timer = QTimer(self)
+        self.tick_timer.setInterval(self.TICK_MS)
+        self.tick_timer.timeout.connect(self.throttle)
+        
+        # Coalesce queue changes into one write
+        self.save_timer = QTimer(self)
+        self.save_timer.setSingleShot(True)
+        self.save_timer.setInterval(1000)
+        self.save_timer.timeout.connect(self.save)
+        
+        self.load_limits()
+    
+    def load_limits(self):
+        self.max_active = max(1, self.settings.max_downloads)
+        self.rate_limit = self.settings.download_rate_kb * 1024
+        self.total_rate_limit = self.settings.download_total_rate_kb * 1024
+        if not (self.rate_limit or self.total_rate_limit):
+            for entry in self.downloads.values():
+                if entry.phase == "throttled":
+                    self.set_phase(entry, "running")
+                    entry.download.resume()
+        self.schedule()
+    
+    def phase(self, download_id):
+        entry = self.downloads.get(download_id)
+        return entry.phase if entry else None
+    
+    def download(self, download_id):
+        entry = self.downloads.get(download_id)
+        return entry.download if entry else None
+    
+    def add(self, download, directory):
+        # Called from downloadRequested; the request has to be accepted before the handler returns
+        saved = self.take_restoring(download)
+        if saved:
+            directory = saved["directory"]
+            download.setDownloadFileName(saved["filename"])
+        download.setDownloadDirectory(directory)
+        download.accept()
+        
+        download_id = download.id()
+        entry = ScheduledDownload(download, "paused" if saved and saved["phase"] == "paused" else "queued")
+        replaces = saved.get("replaces") if saved else None
+        if replaces in self.downloads:
+            # A retry: take the interrupted download's place in the queue
+            entry.retries = saved["retries"]
+            self.downloads = OrderedDict((download_id, entry) if key == replaces else (key, value)
+                                         for key, value in self.downloads.items())
+            self.downloadReplaced.emit(replaces, download_id)
+        else:
+            self.downloads[download_id] = entry
+        download.stateChanged.connect(lambda state, download_id=download_id: self.state_changed(download_id, state))
+        if entry.phase == "paused":
+            download.pause()
+        self.schedule()
+        self.save_timer.start()
+    
+    def forget(self, download_id):
+        entry = self.downloads.get(download_id)
+        if entry and entry.phase in self.FINISHED:
+            del self.downloads[download_id]
+    
+    def set_phase(self, entry, phase):
+        entry.phase = phase
+        self.phaseChanged.emit(entry.download.id())
+    
+    def schedule(self):
+        # Start queued downloads in arrival order while there is a free slot; hold the rest
+        active = sum(entry.phase in self.ACTIVE for entry in self.downloads.values())
+        for entry in self.downloads.values():
+            if entry.phase != "queued":
+                continue
+            if active < self.max_active:
+                active += 1
+                entry.received = entry.download.receivedBytes()
+                entry.allowance = 0.0
+                self.set_phase(entry, "running")
+                entry.download.resume()
+            elif not entry.download.isPaused():
+                entry.download.pause()
+        
+        throttling = bool(self.rate_limit or self.total_rate_limit) and active > 0
+        if throttling and not self.tick_timer.isActive():
+            self.ticked = time.monotonic()
+            self.tick_timer.start()
+        elif not throttling:
+            self.tick_timer.stop()
+    
+    def throttle(self):
+        now = time.monotonic()
+        elapsed, self.ticked = now - self.ticked, now
+        entries = [entry for entry in self.downloads.values() if entry.phase in ("running", "throttled")]
+        
+        total_delta = 0
+        for entry in entries:
+            received = entry.download.receivedBytes()
+            delta, entry.received = received - entry.received, received
+            total_delta += delta
+            if self.rate_limit:
+                entry.allowance = min(entry.allowance + self.rate_limit * elapsed,
+                                      self.rate_limit * self.BURST) - delta
+        if self.total_rate_limit:
+            self.total_allowance = min(self.total_allowance + self.total_rate_limit * elapsed,
+                                       self.total_rate_limit * self.BURST) - total_delta
+        
+        for entry in entries:
+            over = (self.rate_limit and entry.allowance < 0) or (self.total_rate_limit and self.total_allowance < 0)
+            if over and entry.phase == "running":
+                self.set_phase(entry, "throttled")
+                entry.download.pause()
+            elif not over and entry.phase == "throttled":
+                self.set_phase(entry, "running")
+                entry.download.resume()
+    
+    def state_changed(self, download_id, state):
+        entry = self.downloads.get(download_id)
+        if entry is None:
+            return
+        if state in (QWebEngineDownloadRequest.DownloadCompleted, QWebEngineDownloadRequest.DownloadCancelled):
+            self.set_phase(entry, "done")
+        elif state == QWebEngineDownloadRequest.DownloadInterrupted:
+            if entry.retries < self.MAX_RETRIES:
+                # Back off exponentially; the slot stays taken meanwhile
+                entry.retries += 1
+                self.set_phase(entry, "retrying")
+                log.info("Download %s interrupted (%s), retry %d", entry.download.downloadFileName(),
+                         entry.download.interruptReasonString(), entry.retries)
+                QTimer.singleShot(self.RETRY_DELAY_MS * 2 ** (entry.retries - 1),
+                                  lambda download_id=download_id: self.retry(download_id))
+            else:
+                self.set_phase(entry, "failed")
+        else:
+            return
+        self.schedule()
+        self.save_timer.start()
+    
+    def retry(self, download_id):
+        entry = self.downloads.get(download_id)
+        if entry and entry.phase == "retrying":
+            self.request_again(download_id)
+    
+    def request_again(self, download_id):
+        # A fresh request for the same URL and file, taking this one's place when it arrives
+        entry = self.downloads.get(download_id)
+        if entry is None:
+            return
+        self.request(self.describe(entry, "queued") | {"retries": entry.retries, "replaces": download_id})
+    
+    def pause(self, download_id):
+        entry = self.downloads.get(download_id)
+        if entry and entry.phase in ("queued", "running", "throttled"):
+            entry.download.pause()
+            self.set_phase(entry, "paused")
+            self.schedule()
+            self.save_timer.start()
+    
+    def resume(self, download_id):
+        # Paused or failed downloads go back to the end of the line. An interrupted
+        # request cannot be resumed, so a failed one is asked for again, like a retry
+        entry = self.downloads.get(download_id)
+        if entry is None or entry.phase not in ("paused", "failed"):
+            return
+        entry.retries = 0
+        self.downloads.move_to_end(download_id)
+        if entry.phase == "failed":
+            self.set_phase(entry, "retrying")
+            self.request_again(download_id)
+        else:
+            self.set_phase(entry, "queued")
+            self.schedule()
+        self.save_timer.start()
+    
+    def cancel(self, download_id):
+        entry = self.downloads.get(download_id)
+        if entry and entry.phase not in self.FINISHED:
+            entry.download.cancel()
+    
+    def save(self):
+        # Unfinished downloads only. Chromium cannot pick up a partial file from an
+        # earlier run, so restored downloads start over at the same location
+        if self.path is None:
+            return
+        pending = [self.describe(entry, "paused" if entry.phase == "paused" else "queued")
+                   for entry in self.downloads.values() if entry.phase not in self.FINISHED]
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        temp_path = self.path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as queue_file:
+            json.dump(pending, queue_file)
+        os.replace(temp_path, self.path)
+    
+    @staticmethod
+    def describe(entry, phase):
+        return {"url": entry.download.url().toString(), "directory": entry.download.downloadDirectory(),
+                "filename": entry.download.downloadFileName(), "phase": phase}
+    
+    def request(self, saved):
+        # Ask for a download again; add() recognises it by URL when it comes back
+        if self.restore_page is None:
+            self.restore_page = QWebEnginePage(self.profile, self)
+        self.restoring.setdefault(saved["url"], []).append(saved)
+        self.restore_page.download(QUrl(saved["url"]), saved["filename"])
+    
+    def take_restoring(self, download):
+        # The saved entry a returning request belongs to. Several downloads of one
+        # URL can be pending, each to its own path; the request only carries the
+        # URL and the suggested file name, so match the name first, then go in
+        # the order the requests were made
+        url = download.url().toString()
+        pending = self.restoring.get(url)
+        if not pending:
+            return None
+        filename = download.downloadFileName()
+        saved = next((saved for saved in pending if saved["filename"] == filename), pending[0])
+        pending.remove(saved)
+        if not pending:
+            del self.restoring[url]
+        return saved
+    
+    def restore(self):
+        if self.path is None:
+            return
+        try:
+            with open(self.path, encoding="utf-8") as queue_file:
+                pending = json.load(queue_file)
+        except (OSError, ValueError):
+            return
+        for saved in pending:
+            self.request(saved)
+
+
+class DownloadsModel(QAbstractListModel):
+    # Downloads keyed by QWebEngineDownloadRequest.id(). Progress signals only
+    # mark a download dirty; a timer then refreshes dirty rows at most
+    # UPDATE_HZ times a second with one dataChanged covering all of them, so
+    # hundreds of concurrent downloads cost the view a handful of repaints
+    IdRole = Qt.UserRole
+    UPDATE_HZ = 10
+    
+    def __init__(self, scheduler, parent=None):
+        super().__init__(parent)
+        self.scheduler = scheduler
+        self.scheduler.phaseChanged.connect(self.mark_dirty)
+        self.scheduler.downloadReplaced.connect(self.replace)
+        self.ids = []
+        self.rows = {}
+        self.entries = {}
+        self.dirty = set()
+        self.update_timer = QTimer(self)
+        self.update_timer.setInterval(1000 // self.UPDATE_HZ)
+        self.update_timer.timeout.connect(self.flush)
+    
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.ids)
+    
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        download_id = self.ids[index.row()]
+        entry = self.entries[download_id]
+        if role == Qt.DisplayRole:
+            return f"{entry.filename}\n{entry.status(self.scheduler.phase(download_id))}"
+        if role == Qt.ToolTipRole:
+            return os.path.join(entry.download.downloadDirectory(), entry.filename)
+        if role == self.IdRole:
+            return self.ids[index.row()]
+        return None
+    
+    def add(self, download):
+        download_id = download.id()
+        if download_id in self.entries:
+            return
+        row = len(self.ids)
+        self.beginInsertRows(QModelIndex(), row, row)
+        self.ids.append(download_id)
+        self.rows[download_id] = row
+        self.entries[download_id] = DownloadEntry(download)
+        self.endInsertRows()
+        self.watch(download_id, download)
+    
+    def replace(self, old_id, new_id):
+        # A retried download continues in the same row
+        row = self.rows.pop(old_id, None)
+        if row is None:
+            return
+        download = self.scheduler.download(new_id)
+        del self.entries[old_id]
+        self.dirty.discard(old_id)
+        self.ids[row] = new_id
+        self.rows[new_id] = row
+        self.entries[new_id] = DownloadEntry(download)
+        self.watch(new_id, download)
+        self.dataChanged.emit(self.index(row), self.index(row))
+    
+    def watch(self, download_id, download):
+        for signal in (download.receivedBytesChanged, download.totalBytesChanged, download.stateChanged):
+            signal.connect(lambda *args, download_id=download_id: self.mark_dirty(download_id))
+    
+    def mark_dirty(self, download_id):
+        if download_id in self.entries:
+            self.dirty.add(download_id)
+            if not self.update_timer.isActive():
+                self.update_timer.start()
+    
+    def flush(self):
+        if not self.dirty:
+            self.update_timer.stop()
+            return
+        now = time.monotonic()
+        rows = []
+        for download_id in self.dirty:
+            self.entries[download_id].refresh(now)
+            rows.append(self.rows[download_id])
+        self.dirty.clear()
+        self.dataChanged.emit(self.index(min(rows)), self.index(max(rows)))
+    
+    def finished(self, download_id):
+        return self.scheduler.phase(download_id) in (None,) + DownloadScheduler.FINISHED
+    
+    def clear_finished(self):
+        # Remove finished rows from the bottom up, one contiguous run at a time
+        row = len(self.ids) - 1
+        while row >= 0:
+            if not self.finished(self.ids[row]):
+                row -= 1
+                continue
+            last = row
+            while row > 0 and self.finished(self.ids[row - 1]):
+                row -= 1
+            self.beginRemoveRows(QModelIndex(), row, last)
+            for download_id in self.ids[row:last + 1]:
+                del self.entries[download_id]
+                self.dirty.discard(download_id)
+                self.scheduler.forget(download_id)
+            del self.ids[row:last + 1]
+            self.endRemoveRows()
+            row -= 1
+        self.rows = {download_id: row for row, download_id in enumerate(self.ids)}
+
+
+class DownloadManager(QDialog):
+    def __init__(self, scheduler, parent=None):
+        super().__init__(parent)
+        self.scheduler = scheduler
+        self.setWindowTitle("Downloads")
+        self.setMinimumSize(500, 300)
+        
+        # Main layout
+        layout = QVBoxLayout(self)
+        
+        # Downloads list
+        self.model = DownloadsModel(scheduler, self)
+        self.downloads_list = QListView()
+        self.downloads_list.setModel(self.model)
+        self.downloads_list.setUniformItemSizes(True)
+        layout.addWidget(self.downloads_list)
+        
+        # Bottom buttons
+        btn_layout = QHBoxLayout()
+        self.pause_btn = QPushButton("Pause")
+        self.pause_btn.clicked.connect(lambda: self.for_selected(self.scheduler.pause))
+        self.resume_btn = QPushButton("Resume")
+        self.resume_btn.clicked.connect(lambda: self.for_selected(self.scheduler.resume))
+        self.cancel_btn = QPushButton("Cancel")
+        self.cancel_btn.clicked.connect(lambda: self.for_selected(self.scheduler.cancel))
+        self.clear_btn = QPushButton("Clear Completed")
+        self.clear_btn.clicked.connect(self.clear_completed)
+        self.close_btn = QPushButton("Close")
+        self.close_btn.clicked.connect(self.close)
+        
+        btn_layout.addWidget(self.pause_btn)
+        btn_layout.addWidget(self.resume_btn)
+        btn_layout.addWidget(self.cancel_btn)
+        btn_layout.addWidget(self.clear_btn)
+        btn_layout.addStretch()
+        btn_layout.addWidget(self.close_btn)
+        
+        layout.addLayout(btn_layout)
+        
+    def add_download(self, download):
+        self.model.add(download)
+        
+        # Show the dialog to make downloads visible to user
+        self.show()
+    
+    def for_selected(self, action):
+        index = self.downloads_list.currentIndex()
+        if index.isValid():
+            action(self.model.data(index, DownloadsModel.IdRole))
+    
+    def clear_completed(self):
+        self.model.clear_finished()
+
+
+class BookmarkStore:
+    # SQLite bookmark database. URLs are unique and indexed, so adding or
+    # deleting a bookmark touches one row instead of rewriting the list
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS folders (
+            id INTEGER PRIMARY KEY,
+            parent_id INTEGER REFERENCES folders(id) ON DELETE CASCADE,
+            name TEXT NOT NULL
+        );
+        CREATE UNIQUE INDEX IF NOT EXISTS folders_path ON folders(ifnull(parent_id, 0), name);
+        CREATE TABLE IF NOT EXISTS bookmarks (
+            id INTEGER PRIMARY KEY,
+            url TEXT NOT NULL UNIQUE,
+            title TEXT NOT NULL DEFAULT '',
+            folder_id INTEGER REFERENCES folders(id) ON DELETE SET NULL,
+            added INTEGER NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS bookmarks_folder ON bookmarks(folder_id, id);
+        CREATE TABLE IF NOT EXISTS tags (
+            id INTEGER PRIMARY KEY,
+            name TEXT NOT NULL UNIQUE
+        );
+        CREATE TABLE IF NOT EXISTS bookmark_tags (
+            bookmark_id INTEGER NOT NULL REFERENCES bookmarks(id) ON DELETE CASCADE,
+            tag_id INTEGER NOT NULL REFERENCES tags(id) ON DELETE CASCADE,
+            PRIMARY KEY (bookmark_id, tag_id)
+        ) WITHOUT ROWID;
+    """
+    
+    def __init__(self, path):
+        self.db = connect_database(path)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA foreign_keys=ON")
+        self.db.executescript(self.SCHEMA)
+    
+    def count(self):
+        return self.db.execute("SELECT count(*) FROM bookmarks").fetchone()[0]
+    
+    def page(self, after_id, limit):
+        # Keyset paging: each page is an index range scan, however deep the list is
+        return self.db.execute("SELECT id, title, url FROM bookmarks WHERE id > ? ORDER BY id LIMIT ?",
+                               (after_id, limit)).fetchall()
+    
+    def folder_id(self, name, parent_id=None):
+        row = self.db.execute("SELECT id FROM folders WHERE ifnull(parent_id, 0) = ifnull(?, 0) AND name = ?",
+                              (parent_id, name)).fetchone()
+        if row:
+            return row[0]
+        return self.db.execute("INSERT INTO folders (parent_id, name) VALUES (?, ?)", (parent_id, name)).lastrowid
+    
+    def _upsert(self, url, title, folder_id, tags, added):
+        row = self.db.execute("SELECT id FROM bookmarks WHERE url = ?", (url,)).fetchone()
+        if row:
+            bookmark_id = row[0]
+            self.db.execute("UPDATE bookmarks SET title = ?, folder_id = ifnull(?, folder_id) WHERE id = ?",
+                            (title, folder_id, bookmark_id))
+        else:
+            bookmark_id = self.db.execute(
+                "INSERT INTO bookmarks (url, title, folder_id, added) VALUES (?, ?, ?, ?)",
+                (url, title, folder_id, added)).lastrowid
+        for tag in tags:
+            self.db.execute("INSERT OR IGNORE INTO tags (name) VALUES (?)", (tag,))
+            self.db.execute("INSERT OR IGNORE INTO bookmark_tags (bookmark_id, tag_id) "
+                            "SELECT ?, id FROM tags WHERE name = ?", (bookmark_id, tag))
+        return bookmark_id, row is None
+    
+    def add(self, title, url, folder_id=None, tags=()):
+        # Returns (id, created); an existing URL just gets the new title
+        with self.db:
+            return self._upsert(url, title, folder_id, tags, int(time.time()))
+    
+    def add_many(self, bookmarks):
+        with self.db:
+            for url, title, folder_id, tags, added in bookmarks:
+                self._upsert(url, title, folder_id, tags, added or int(time.time()))
+    
+    def delete(self, bookmark_id):
+        with self.db:
+            self.db.execute("DELETE FROM bookmarks WHERE id = ?", (bookmark_id,))
+    
+    def migrate_settings(self, settings):
+        # One-time move of the old QSettings "bookmarks" array into the database
+        size = settings.beginReadArray("bookmarks")
+        bookmarks = []
+        for i in range(size):
+            settings.setArrayIndex(i)
+            url = settings.value("url")
+            if url:
+                bookmarks.append((url, settings.value("title") or "", None, (), None))
+        settings.endArray()
+        if bookmarks:
+            self.add_many(bookmarks)
+        if size:
+            settings.remove("bookmarks")
+    
+    def import_netscape(self, path):
+        parser = NetscapeBookmarkParser(self)
+        with open(path, encoding="utf-8", errors="replace") as bookmark_file:
+            # Feed in chunks so large files never sit in memory whole
+            for chunk in iter(lambda: bookmark_file.read(65536), ""):
+                parser.feed(chunk)
+        parser.close()
+        parser.flush()
+        return parser.imported
+    
+    def export_netscape(self, path):
+        with open(path, "w", encoding="utf-8") as out:
+            out.write("<!DOCTYPE NETSCAPE-Bookmark-file-1>\n"
+                      '<META HTTP-EQUIV="Content-Type" CONTENT="text/html; charset=UTF-8">\n'
+                      "<TITLE>Bookmarks</TITLE>\n<H1>Bookmarks</H1>\n<DL><p>\n")
+            self._export_folder(out, None, 1)
+            out.write("</DL><p>\n")
+    
+    def _export_folder(self, out, folder_id, depth):
+        indent = "    " * depth
+        folders = self.db.execute("SELECT id, name FROM folders WHERE ifnull(parent_id, 0) = ifnull(?, 0) ORDER BY id",
+                                  (folder_id,)).fetchall()
+        for child_id, name in folders:
+            out.write(f"{indent}<DT><H3>{html.escape(name)}</H3>\n{indent}<DL><p>\n")
+            self._export_folder(out, child_id, depth + 1)
+            out.write(f"{indent}</DL><p>\n")
+        rows = self.db.execute(
+            "SELECT b.url, b.title, b.added, group_concat(t.name) FROM bookmarks b "
+            "LEFT JOIN bookmark_tags bt ON bt.bookmark_id = b.id LEFT JOIN tags t ON t.id = bt.tag_id "
+            "WHERE b.folder_id IS ? GROUP BY b.id ORDER BY b.id", (folder_id,))
+        for url, title, added, tags in rows:
+            tag_attr = f' TAGS="{html.escape(tags)}"' if tags else ""
+            out.write(f'{indent}<DT><A HREF="{html.escape(url)}" ADD_DATE="{added}"{tag_attr}>'
+                      f"{html.escape(title)}</A>\n")
+
+
+class NetscapeBookmarkParser(HTMLParser):
+    # Streams a Netscape bookmark file (the format every browser exports)
+    # into a BookmarkStore, writing in batches as it goes
+    BATCH_SIZE = 2000
+    
+    def __init__(self, store):
+        super().__init__(convert_charrefs=True)
+        self.store = store
+        self.folders = [None]
+        self.pending_folder = None
+        self.text = None
+        self.link = None
+        self.batch = []
+        self.imported = 0
+    
+    def handle_starttag(self, tag, attrs):
+        if tag == "h3":
+            self.text = []
+        elif tag == "a":
+            attrs = dict(attrs)
+            self.link = attrs
+            self.text = []
+        elif tag == "dl":
+            # A list opened right after a folder heading holds that folder's contents
+            self.folders.append(self.pending_folder if self.pending_folder is not None else self.folders[-1])
+            self.pending_folder = None
+    
+    def handle_endtag(self, tag):
+        if tag == "h3" and self.text is not None:
+            # Folder rows must exist before the bookmarks that point at them
+            self.flush()
+            with self.store.db:
+                self.pending_folder = self.store.folder_id("".join(self.text).strip(), self.folders[-1])
+            self.text = None
+        elif tag == "a" and self.link is not None:
+            url = self.link.get("href")
+            if url:
+                tags = tuple(tag for tag in (self.link.get("tags") or "").split(",") if tag)
+                added = self.link.get("add_date")
+                self.batch.append((url, "".join(self.text).strip(), self.folders[-1], tags,
+                                   int(added) if added and added.isdigit() else None))
+                if len(self.batch) >= self.BATCH_SIZE:
+                    self.flush()
+            self.link = None
+            self.text = None
+        elif tag == "dl" and len(self.folders) > 1:
+            self.folders.pop()
+    
+    def handle_data(self, data):
+        if self.text is not None:
+            self.text.append(data)
+    
+    def flush(self):
+        if self.batch:
+            self.store.add_many(self.batch)
+            self.imported += len(self.batch)
+            self.batch = []
+
+
+class BookmarksModel(QAbstractListModel):
+    # List model over the bookmark store that fetches rows a page at a time
+    # as the view scrolls, instead of loading every bookmark up front
+    UrlRole = Qt.UserRole
+    IdRole = Qt.UserRole + 1
+    PAGE_SIZE = 200
+    
+    def __init__(self, store, parent=None):
+        super().__init__(parent)
+        self.store = store
+        self.reload()
+    
+    def reload(self):
+        self.beginResetModel()
+        self.rows = []
+        self.total = self.store.count()
+        self.endResetModel()
+    
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.rows)
+    
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and len(self.rows) < self.total
+    
+    def fetchMore(self, parent=QModelIndex()):
+        after_id = self.rows[-1][0] if self.rows else 0
+        page = self.store.page(after_id, self.PAGE_SIZE)
+        if not page:
+            self.total = len(self.rows)
+            return
+        self.beginInsertRows(QModelIndex(), len(self.rows), len(self.rows) + len(page) - 1)
+        self.rows.extend(page)
+        self.endInsertRows()
+    
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        bookmark_id, title, url = self.rows[index.row()]
+        if role == Qt.DisplayRole:
+            return f"{title} - {url}"
+        if role == Qt.ToolTipRole or role == self.UrlRole:
+            return url
+        if role == self.IdRole:
+            return bookmark_id
+        return None
+    
+    def bookmark_added(self, bookmark_id, title, url, created):
+        if not created:
+            # Same URL bookmarked again: refresh the title if the row is loaded
+            for row, (row_id, _, row_url) in enumerate(self.rows):
+                if row_id == bookmark_id:
+                    self.rows[row] = (bookmark_id, title, row_url)
+                    self.dataChanged.emit(self.index(row), self.index(row))
+                    break
+            return
+        self.total += 1
+        if len(self.rows) == self.total - 1:
+            # Everything is loaded, so the new row belongs at the end right now
+            row = len(self.rows)
+            self.beginInsertRows(QModelIndex(), row, row)
+            self.rows.append((bookmark_id, title, url))
+            self.endInsertRows()
+    
+    def remove_row(self, row):
+        self.beginRemoveRows(QModelIndex(), row, row)
+        del self.rows[row]
+        self.endRemoveRows()
+        self.total -= 1
+
+
+class BookmarksManager(QDialog):
+    bookmarkSelected = Signal(str)
+    
+    def __init__(self, store, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Bookmarks")
+        self.setMinimumSize(500, 300)
+        
+        # Main layout
+        layout = QVBoxLayout(self)
+        
+        # Bookmarks database
+        self.store = store
+        self.model = BookmarksModel(self.store, self)
+        
+        # Bookmarks list
+        self.bookmarks_list = QListView()
+        self.bookmarks_list.setModel(self.model)
+        self.bookmarks_list.setUniformItemSizes(True)
+        self.bookmarks_list.doubleClicked.connect(self.open_bookmark)
+        layout.addWidget(self.bookmarks_list)
+        
+        # Bottom buttons
+        btn_layout = QHBoxLayout()
+        self.delete_btn = QPushButton("Delete")
+        self.delete_btn.clicked.connect(self.delete_bookmark)
+        self.import_btn = QPushButton("Import...")
+        self.import_btn.clicked.connect(self.import_bookmarks)
+        self.export_btn = QPushButton("Export...")
+        self.export_btn.clicked.connect(self.export_bookmarks)
+        self.close_btn = QPushButton("Close")
+        self.close_btn.clicked.connect(self.close)
+        
+        btn_layout.addWidget(self.delete_btn)
+        btn_layout.addWidget(self.import_btn)
+        btn_layout.addWidget(self.export_btn)
+        btn_layout.addStretch()
+        btn_layout.addWidget(self.close_btn)
+        
+        layout.addLayout(btn_layout)
+    
+    def load_bookmarks(self):
+        # Start over from the first page, e.g. after an import
+        self.model.reload()
+    
+    def add_bookmark(self, title, url):
+        bookmark_id, created = self.store.add(title, url)
+        self.model.bookmark_added(bookmark_id, title, url, created)
+    
+    def delete_bookmark(self):
+        index = self.bookmarks_list.currentIndex()
+        if index.isValid():
+            self.store.delete(self.model.data(index, BookmarksModel.IdRole))
+            self.model.remove_row(index.row())
+    
+    def open_bookmark(self, index):
+        self.bookmarkSelected.emit(self.model.data(index, BookmarksModel.UrlRole))
+        self.close()
+    
+    def import_bookmarks(self):
+        path, _ = QFileDialog.getOpenFileName(self, "Import Bookmarks", "", "Bookmark files (*.html *.htm)")
+        if path:
+            count = self.store.import_netscape(path)
+            self.load_bookmarks()
+            if self.parent():
+                self.parent().status_bar.showMessage(f"Imported {count} bookmarks", 3000)
+    
+    def export_bookmarks(self):
+        path, _ = QFileDialog.getSaveFileName(self, "Export Bookmarks", "bookmarks.html", "Bookmark files (*.html)")
+        if path:
+            self.store.export_netscape(path)
+
+
+class BrowserSettings(QObject):
+    # Typed, in-memory copy of the QSettings store, read once at startup.
+    # Fields are plain attributes, so hot paths read them without a lookup
+    # or conversion. Assigning a field emits changed(name) and schedules a
+    # write-behind flush, batching any other writes made in the meantime
+    changed = Signal(str)
+    FLUSH_DELAY = 2000
+    FIELDS = {
+        # attribute: (QSettings key, default)
+        "dark_mode": ("darkMode", True),
+        "ad_blocker": ("adBlocker", True),
+        "cursor_lock": ("cursorLock", True),
+        "autoplay_media": ("autoplayMedia", True),
+        "restore_session": ("restoreSession", True),
+        "home_page": ("homePage", "https://www.google.com"),
+        "download_dir": ("downloadDir", os.path.expanduser("~/Downloads")),
+        "freeze_after_minutes": ("freezeAfterMinutes", 5),
+        "memory_budget_mb": ("memoryBudgetMB", 0),
+        "max_downloads": ("maxDownloads", 3),
+        "download_rate_kb": ("downloadRateKB", 0),
+        "download_total_rate_kb": ("downloadTotalRateKB", 0),
+        "segmented_downloads": ("segmentedDownloads", False),
+        "download_segments": ("downloadSegments", 4),
+        "profile_name": ("profileName", "default"),
+        "profile_dir": ("profileDir", ""),
+        "ephemeral_profile": ("ephemeralProfile", False),
+        "cache_type": ("cacheType", "disk"),
+        "cache_size_mb": ("cacheSizeMB", 0),
+        "engine_preset": ("enginePreset", "default"),
+        "renderer_limit": ("rendererProcessLimit", 0),
+        "process_model": ("processModel", "site-instance"),
+        "raster_threads": ("rasterThreads", 0),
+        "compositing": ("compositing", "auto"),
+        "js_heap_mb": ("jsHeapMB", 0),
+    }
+    
+    def __init__(self, store, parent=None):
+        super().__init__(parent)
+        object.__setattr__(self, "store", store)
+        object.__setattr__(self, "dirty", set())
+        for name, (key, default) in self.FIELDS.items():
+            object.__setattr__(self, name, store.value(key, default, type=type(default)))
+        
+        flush_timer = QTimer(self)
+        flush_timer.setSingleShot(True)
+        flush_timer.setInterval(self.FLUSH_DELAY)
+        flush_timer.timeout.connect(self.flush)
+        object.__setattr__(self, "flush_timer", flush_timer)
+    
+    def __setattr__(self, name, value):
+        if name not in self.FIELDS:
+            object.__setattr__(self, name, value)
+            return
+        value = type(self.FIELDS[name][1])(value)
+        if value == getattr(self, name):
+            return
+        object.__setattr__(self, name, value)
+        self.dirty.add(name)
+        if not self.flush_timer.isActive():
+            self.flush_timer.start()
+        self.changed.emit(name)
+    
+    def flush(self):
+        self.flush_timer.stop()
+        if not self.dirty:
+            return
+        for name in self.dirty:
+            self.store.setValue(self.FIELDS[name][0], getattr(self, name))
+        self.dirty.clear()
+        self.store.sync()
+
+
+class EngineConfig:
+    # Chromium switches for the process model and rendering, handed to
+    # WebEngine through QTWEBENGINE_CHROMIUM_FLAGS. Chromium reads them once
+    # at startup, so they are applied before QApplication exists and changes
+    # take effect on the next start. A preset fixes every option; "custom"
+    # takes each one from settings. 0 and "auto" leave Chromium's default
+    PRESETS = {
+        "default": {},
+        "low-memory": {"renderer_limit": 2, "process_model": "site", "raster_threads": 1,
+                       "compositing": "auto", "js_heap_mb": 256},
+        "throughput": {"renderer_limit": 0, "process_model": "site-instance", "raster_threads": 4,
+                       "compositing": "gpu", "js_heap_mb": 0},
+        "headless-server": {"renderer_limit": 8, "process_model": "site", "raster_threads": 2,
+                            "compositing": "software", "js_heap_mb": 512},
+        "custom": None,
+    }
+    OPTIONS = ("renderer_limit", "process_model", "raster_threads", "compositing", "js_heap_mb")
+    PROCESS_MODELS = {
+        "site-instance": [],
+        "site": ["--process-per-site"],
+    }
+    COMPOSITING = {
+        "auto": [],
+        "gpu": ["--enable-gpu-rasterization"],
+        "software": ["--disable-gpu", "--disable-gpu-compositing"],
+    }
+    RANGES = {"renderer_limit": (0, 64), "raster_threads": (0, 4), "js_heap_mb": (0, 16384)}
+    
+    def __init__(self, preset="default", options=None):
+        self.preset = preset
+        self.options = dict(options if options is not None else self.PRESETS[preset])
+    
+    @classmethod
+    def from_settings(cls, store, preset=None):
+        # Reads QSettings directly: this runs before there is a BrowserSettings
+        preset = preset or store.value(*BrowserSettings.FIELDS["engine_preset"])
+        if preset not in cls.PRESETS:
+            log.warning("Unknown engine preset %r, using Chromium defaults", preset)
+            preset = "default"
+        if preset != "custom":
+            return cls(preset)
+        options = {}
+        for name in cls.OPTIONS:
+            key, default = BrowserSettings.FIELDS[name]
+            options[name] = store.value(key, default, type=type(default))
+        return cls(preset, options)
+    
+    def validate(self):
+        # The valid options; anything else is logged and left at Chromium's default
+        valid = {}
+        for name, value in self.options.items():
+            if name in self.RANGES:
+                low, high = self.RANGES[name]
+                ok = isinstance(value, int) and low <= value <= high
+            elif name == "process_model":
+                ok = value in self.PROCESS_MODELS
+            elif name == "compositing":
+                ok = value in self.COMPOSITING
+            else:
+                ok = False
+            if ok:
+                valid[name] = value
+            else:
+                log.warning("Ignoring engine option %s=%r", name, value)
+        return valid
+    
+    def flags(self):
+        options = self.validate()
+        flags = []
+        if options.get("renderer_limit"):
+            flags.append(f"--renderer-process-limit={options['renderer_limit']}")
+        flags += self.PROCESS_MODELS[options.get("process_model", "site-instance")]
+        if options.get("raster_threads"):
+            flags.append(f"--num-raster-threads={options['raster_threads']}")
+        flags += self.COMPOSITING[options.get("compositing", "auto")]
+        if options.get("js_heap_mb"):
+            flags.append(f"--js-flags=--max-old-space-size={options['js_heap_mb']}")
+        return flags
+    
+    def apply(self):
+        # Flags already in the environment go last, so one set by hand wins
+        flags = self.flags()
+        existing = os.environ.get("QTWEBENGINE_CHROMIUM_FLAGS", "")
+        if flags:
+            os.environ["QTWEBENGINE_CHROMIUM_FLAGS"] = " ".join(flags + [existing]).strip()
+        log.info("Engine preset %s: %s", self.preset, " ".join(flags) or "Chromium defaults")
+        return flags
+
+
+class SettingsDialog(QDialog):
+    def __init__(self, settings, profile, site="", parent=None):
+        super().__init__(parent)
+        self.settings = settings
+        self.profile = profile
+        self.site = site
+        self.setWindowTitle("Settings")
+        self.setMinimumSize(400, 300)
+        
+        # Main layout
+        layout = QVBoxLayout(self)
+        
+        # Dark mode setting
+        self.dark_mode = QCheckBox("Dark Mode")
+        self.dark_mode.setChecked(self.settings.dark_mode)
+        layout.addWidget(self.dark_mode)
+        
+        # Ad blocker setting
+        self.ad_blocker = QCheckBox("Enable Ad Blocker")
+        self.ad_blocker.setChecked(self.settings.ad_blocker)
+        layout.addWidget(self.ad_blocker)
+        
+        # Cursor lock setting
+        self.cursor_lock = QCheckBox("Enable Cursor Lock for Games")
+        self.cursor_lock.setChecked(self.settings.cursor_lock)
+        layout.addWidget(self.cursor_lock)
+        
+        # Media autoplay setting
+        self.autoplay_media = QCheckBox("Allow media to play without a click")
+        self.autoplay_media.setChecked(self.settings.autoplay_media)
+        layout.addWidget(self.autoplay_media)
+        
+        # Session restore setting
+        self.restore_session = QCheckBox("Restore tabs on startup")
+        self.restore_session.setChecked(self.settings.restore_session)
+        layout.addWidget(self.restore_session)
+        
+        # Background tab freezing
+        freeze_layout = QHBoxLayout()
+        freeze_layout.addWidget(QLabel("Freeze background tabs after (minutes, 0 = never):"))
+        self.freeze_after = QSpinBox()
+        self.freeze_after.setRange(0, 1440)
+        self.freeze_after.setValue(self.settings.freeze_after_minutes)
+        freeze_layout.addWidget(self.freeze_after)
+        layout.addLayout(freeze_layout)
+        
+        # Renderer memory budget
+        memory_layout = QHBoxLayout()
+        memory_layout.addWidget(QLabel("Tab memory budget (MB, 0 = unlimited):"))
+        self.memory_budget = QSpinBox()
+        self.memory_budget.setRange(0, 1048576)
+        self.memory_budget.setSingleStep(256)
+        self.memory_budget.setValue(self.settings.memory_budget_mb)
+        memory_layout.addWidget(self.memory_budget)
+        layout.addLayout(memory_layout)
+        
+        # Home page setting
+        home_layout = QHBoxLayout()
+        home_layout.addWidget(QLabel("Home Page:"))
+        self.home_page = QLineEdit()
+        self.home_page.setText(self.settings.home_page)
+        home_layout.addWidget(self.home_page)
+        layout.addLayout(home_layout)
+        
+        # Download directory
+        download_layout = QHBoxLayout()
+        download_layout.addWidget(QLabel("Download Directory:"))
+        self.download_dir = QLineEdit()
+        self.download_dir.setText(self.settings.download_dir)
+        download_layout.addWidget(self.download_dir)
+        browse_btn = QPushButton("Browse")
+        browse_btn.clicked.connect(self.browse_directory)
+        download_layout.addWidget(browse_btn)
+        layout.addLayout(download_layout)
+        
+        # Download scheduling
+        limits_layout = QHBoxLayout()
+        limits_layout.addWidget(QLabel("Simultaneous downloads:"))
+        self.max_downloads = QSpinBox()
+        self.max_downloads.setRange(1, 32)
+        self.max_downloads.setValue(self.settings.max_downloads)
+        limits_layout.addWidget(self.max_downloads)
+        layout.addLayout(limits_layout)
+        
+        rate_layout = QHBoxLayout()
+        rate_layout.addWidget(QLabel("Bandwidth cap (KB/s, 0 = none) per download:"))
+        self.download_rate = QSpinBox()
+        self.download_rate.setRange(0, 1048576)
+        self.download_rate.setSingleStep(100)
+        self.download_rate.setValue(self.settings.download_rate_kb)
+        rate_layout.addWidget(self.download_rate)
+        rate_layout.addWidget(QLabel("total:"))
+        self.download_total_rate = QSpinBox()
+        self.download_total_rate.setRange(0, 1048576)
+        self.download_total_rate.setSingleStep(100)
+        self.download_total_rate.setValue(self.settings.download_total_rate_kb)
+        rate_layout.addWidget(self.download_total_rate)
+        layout.addLayout(rate_layout)
+        
+        segmented_layout = QHBoxLayout()
+        self.segmented_downloads = QCheckBox("Split large downloads over parallel connections:")
+        self.segmented_downloads.setChecked(self.settings.segmented_downloads)
+        segmented_layout.addWidget(self.segmented_downloads)
+        self.download_segments = QSpinBox()
+        self.download_segments.setRange(2, 16)
+        self.download_segments.setValue(self.settings.download_segments)
+        segmented_layout.addWidget(self.download_segments)
+        layout.addLayout(segmented_layout)
+        
+        # Profile, used from the next start
+        profile_layout = QHBoxLayout()
+        profile_layout.addWidget(QLabel("Profile (after restart):"))
+        self.profile_name = QLineEdit()
+        self.profile_name.setText(self.settings.profile_name)
+        profile_layout.addWidget(self.profile_name)
+        self.ephemeral_profile = QCheckBox("Keep nothing on disk")
+        self.ephemeral_profile.setChecked(self.settings.ephemeral_profile)
+        profile_layout.addWidget(self.ephemeral_profile)
+        layout.addLayout(profile_layout)
+        
+        profile_dir_layout = QHBoxLayout()
+        profile_dir_layout.addWidget(QLabel("Profile Directory:"))
+        self.profile_dir = QLineEdit()
+        self.profile_dir.setPlaceholderText("Browser data directory")
+        self.profile_dir.setText(self.settings.profile_dir)
+        profile_dir_layout.addWidget(self.profile_dir)
+        profile_browse_btn = QPushButton("Browse")
+        profile_browse_btn.clicked.connect(self.browse_profile_directory)
+        profile_dir_layout.addWidget(profile_browse_btn)
+        layout.addLayout(profile_dir_layout)
+        
+        # HTTP cache
+        cache_layout = QHBoxLayout()
+        cache_layout.addWidget(QLabel("HTTP cache:"))
+        self.cache_type = QComboBox()
+        for label, cache_type in (("On disk", "disk"), ("In memory", "memory"), ("None", "none")):
+            self.cache_type.addItem(label, cache_type)
+        self.cache_type.setCurrentIndex(max(self.cache_type.findData(self.settings.cache_type), 0))
+        cache_layout.addWidget(self.cache_type)
+        cache_layout.addWidget(QLabel("max MB (0 = automatic):"))
+        self.cache_size = QSpinBox()
+        self.cache_size.setRange(0, 1048576)
+        self.cache_size.setSingleStep(64)
+        self.cache_size.setValue(self.settings.cache_size_mb)
+        cache_layout.addWidget(self.cache_size)
+        layout.addLayout(cache_layout)
+        
+        usage_layout = QHBoxLayout()
+        self.cache_usage = QLabel("Cache usage: measuring...")
+        usage_layout.addWidget(self.cache_usage)
+        usage_layout.addStretch()
+        clear_cache_btn = QPushButton("Clear Cache")
+        clear_cache_btn.clicked.connect(self.clear_cache)
+        usage_layout.addWidget(clear_cache_btn)
+        self.clear_site_btn = QPushButton(f"Clear Data for {site}" if site else "Clear Data for Site")
+        self.clear_site_btn.setEnabled(bool(site))
+        self.clear_site_btn.clicked.connect(self.clear_site)
+        usage_layout.addWidget(self.clear_site_btn)
+        layout.addLayout(usage_layout)
+        self.profile.cacheMeasured.connect(self.show_cache_usage)
+        self.profile.siteCleared.connect(self.site_cleared)
+        self.profile.measure_cache()
+        
+        # Chromium process model and rendering, used from the next start
+        engine_layout = QHBoxLayout()
+        engine_layout.addWidget(QLabel("Engine preset (after restart):"))
+        self.engine_preset = QComboBox()
+        for preset in EngineConfig.PRESETS:
+            self.engine_preset.addItem(preset, preset)
+        self.engine_preset.setCurrentIndex(max(self.engine_preset.findData(self.settings.engine_preset), 0))
+        self.engine_preset.currentIndexChanged.connect(self.update_engine_options)
+        engine_layout.addWidget(self.engine_preset)
+        engine_layout.addStretch()
+        layout.addLayout(engine_layout)
+        
+        engine_options_layout = QHBoxLayout()
+        engine_options_layout.addWidget(QLabel("Renderers (0 = auto):"))
+        self.renderer_limit = QSpinBox()
+        self.renderer_limit.setRange(*EngineConfig.RANGES["renderer_limit"])
+        engine_options_layout.addWidget(self.renderer_limit)
+        engine_options_layout.addWidget(QLabel("Process model:"))
+        self.process_model = QComboBox()
+        for label, model in (("Per site instance", "site-instance"), ("Per site", "site")):
+            self.process_model.addItem(label, model)
+        engine_options_layout.addWidget(self.process_model)
+        engine_options_layout.addWidget(QLabel("Raster threads:"))
+        self.raster_threads = QSpinBox()
+        self.raster_threads.setRange(*EngineConfig.RANGES["raster_threads"])
+        engine_options_layout.addWidget(self.raster_threads)
+        self.compositing = QComboBox()
+        for label, compositing in (("Auto", "auto"), ("GPU raster", "gpu"), ("Software", "software")):
+            self.compositing.addItem(label, compositing)
+        engine_options_layout.addWidget(self.compositing)
+        engine_options_layout.addWidget(QLabel("JS heap MB:"))
+        self.js_heap = QSpinBox()
+        self.js_heap.setRange(*EngineConfig.RANGES["js_heap_mb"])
+        self.js_heap.setSingleStep(256)
+        engine_options_layout.addWidget(self.js_heap)
+        layout.addLayout(engine_options_layout)
+        self.update_engine_options()
+        
+        # Bottom buttons
+        btn_layout = QHBoxLayout()
+        self.save_btn = QPushButton("Save")
+        self.save_btn.clicked.connect(self.save_settings)
+        self.cancel_btn = QPushButton("Cancel")
+        self.cancel_btn.clicked.connect(self.close)
+        
+        btn_layout.addWidget(self.save_btn)
+        btn_layout.addStretch()
+        btn_layout.addWidget(self.cancel_btn)
+        
+        layout.addStretch()
+        layout.addLayout(btn_layout)
+    
+    def browse_directory(self):
+        directory = QFileDialog.getExistingDirectory(self, "Select Download Directory")
+        if directory:
+            self.download_dir.setText(directory)
+    
+    def browse_profile_directory(self):
+        directory = QFileDialog.getExistingDirectory(self, "Select Profile Directory")
+        if directory:
+            self.profile_dir.setText(directory)
+    
+    def update_engine_options(self):
+        # A preset fixes every option, so show its values and only let "custom" be edited
+        preset = self.engine_preset.currentData()
+        custom = preset == "custom"
+        if custom:
+            options = {name: getattr(self.settings, name) for name in EngineConfig.OPTIONS}
+        else:
+            options = EngineConfig(preset).options
+        value = lambda name: options.get(name, BrowserSettings.FIELDS[name][1])
+        self.renderer_limit.setValue(value("renderer_limit"))
+        self.process_model.setCurrentIndex(max(self.process_model.findData(value("process_model")), 0))
+        self.raster_threads.setValue(value("raster_threads"))
+        self.compositing.setCurrentIndex(max(self.compositing.findData(value("compositing")), 0))
+        self.js_heap.setValue(value("js_heap_mb"))
+        for widget in (self.renderer_limit, self.process_model, self.raster_threads, self.compositing, self.js_heap):
+            widget.setEnabled(custom)
+    
+    def show_cache_usage(self, size, entries):
+        if size is None:
+            self.cache_usage.setText("Cache usage: nothing on disk")
+        else:
+            self.cache_usage.setText(f"Cache usage: {format_bytes(size)} in {entries} entries")
+    
+    def clear_cache(self):
+        self.profile.clear_cache()
+        self.cache_usage.setText("Cache usage: cleared")
+    
+    def clear_site(self):
+        self.clear_site_btn.setEnabled(False)
+        self.profile.clear_site(self.site)
+    
+    def site_cleared(self, site, removed):
+        self.profile.measure_cache()
+    
+    def save_settings(self):
+        # Unchanged values are ignored; the browser hears about each changed one
+        self.settings.dark_mode = self.dark_mode.isChecked()
+        self.settings.ad_blocker = self.ad_blocker.isChecked()
+        self.settings.cursor_lock = self.cursor_lock.isChecked()
+        self.settings.autoplay_media = self.autoplay_media.isChecked()
+        self.settings.restore_session = self.restore_session.isChecked()
+        self.settings.home_page = self.home_page.text()
+        self.settings.download_dir = self.download_dir.text()
+        self.settings.freeze_after_minutes = self.freeze_after.value()
+        self.settings.memory_budget_mb = self.memory_budget.value()
+        self.settings.max_downloads = self.max_downloads.value()
+        self.settings.download_rate_kb = self.download_rate.value()
+        self.settings.download_total_rate_kb = self.download_total_rate.value()
+        self.settings.segmented_downloads = self.segmented_downloads.isChecked()
+        self.settings.download_segments = self.download_segments.value()
+        # The name becomes a directory name
+        name = re.sub(r"[^\w.-]", "_", self.profile_name.text().strip()).strip(".")
+        self.settings.profile_name = name or "default"
+        self.settings.profile_dir = self.profile_dir.text().strip()
+        self.settings.ephemeral_profile = self.ephemeral_profile.isChecked()
+        self.settings.cache_type = self.cache_type.currentData()
+        self.settings.cache_size_mb = self.cache_size.value()
+        self.settings.engine_preset = self.engine_preset.currentData()
+        if self.settings.engine_preset == "custom":
+            self.settings.renderer_limit = self.renderer_limit.value()
+            self.settings.process_model = self.process_model.currentData()
+            self.settings.raster_threads = self.raster_threads.value()
+            self.settings.compositing = self.compositing.currentData()
+            self.settings.js_heap_mb = self.js_heap.value()
+        self.close()
+
+
+class TabActivity:
+    # Lifecycle bookkeeping for one tab. Frozen and discarded time are kept
+    # apart: a discarded tab has given up its memory, a frozen one has not
+    def __init__(self):
+        self.last_active = time.monotonic()
+        self.frozen_since = None
+        self.frozen_total = 0.0
+        self.discarded_since = None
+        self.discarded_total = 0.0
+
+    def frozen_seconds(self):
+        if self.frozen_since is None:
+            return self.frozen_total
+        return self.frozen_total + time.monotonic() - self.frozen_since
+
+    def discarded_seconds(self):
+        if self.discarded_since is None:
+            return self.discarded_total
+        return self.discarded_total + time.monotonic() - self.discarded_since
+
+    def inactive(self):
+        return self.frozen_since is not None or self.discarded_since is not None
+
+    def set_state(self, state, now):
+        # Close the running Frozen or Discarded period, then open one for the new state
+        if self.frozen_since is not None:
+            self.frozen_total += now - self.frozen_since
+            self.frozen_since = None
+        if self.discarded_since is not None:
+            self.discarded_total += now - self.discarded_since
+            self.discarded_since = None
+        if state == QWebEnginePage.LifecycleState.Frozen:
+            self.frozen_since = now
+        elif state == QWebEnginePage.LifecycleState.Discarded:
+            self.discarded_since = now
+
+
+class TabLifecycleManager(QObject):
+    # Freezes tabs that have been in the background for a while so their
+    # JavaScript, timers and media stop burning CPU. Tabs playing audio,
+    # holding the pointer lock or with edited form fields are left alone
+    stateChanged = Signal(object)
+    
+    # Evaluated in the page before freezing; true means the tab must stay active
+    BUSY_CHECK = "window.__arcwebFormDirty === true || document.pointerLockElement !== null"
+    
+    # Marks a page as having unsaved form input until the form is submitted
+    FORM_TRACKER = """
+        (function() {
+            if (window.__arcwebFormDirty !== undefined) return;
+            window.__arcwebFormDirty = false;
+            document.addEventListener("input", function(event) {
+                var target = event.target;
+                if (target && (target.form || target.isContentEditable ||
+                               /^(INPUT|TEXTAREA|SELECT)$/.test(target.tagName))) {
+                    window.__arcwebFormDirty = true;
+                }
+            }, true);
+            document.addEventListener("submit", function() {
+                window.__arcwebFormDirty = false;
+            }, true);
+        })();
+    """
+    
+    def __init__(self, settings, parent=None):
         super().__init__(parent)
-        self.blocked_hosts = set()
-        self.load_filters()
-        
-    def load_filters(self):
-        # Common ad domains - in a real implementation, this would load from a more comprehensive filter list
-        ad_domains = [
-            "ads.", "ad.", "banner.", "banners.", "adserv.", "adserver.",
-            "advert.", "popup.", "pop-up.", "track.", "tracker.", "tracking.",
-            "stats.", "stat.", "analytics.", "metric.", "googleadservices.",
-            "googlesyndication.", "doubleclick.", "amazon-adsystem.",
-            "facebook.net", "facebook.com/tr", "analytics.google.com",
-            "pagead2.", "2mdn.net", "serving-sys.com", "scdn.cxense.com", 
-            "scorecardresearch.com", "adnxs.com", "taboola.com", "outbrain.com"
-        ]
-        
-        for domain in ad_domains:
-            self.blocked_hosts.add(domain)
+        self.settings = settings
+        self.tabs = {}
+        self.current = None
+        self.timer = QTimer(self)
+        self.timer.setInterval(15000)
+        self.timer.timeout.connect(self.check_tabs)
+        self.timer.start()
     
-    def interceptRequest(self, info):
-        url = info.requestUrl().toString().lower()
+    @classmethod
+    def form_tracker_script(cls):
+        script = QWebEngineScript()
+        script.setName("arcweb-form-tracker")
+        script.setInjectionPoint(QWebEngineScript.InjectionPoint.DocumentCreation)
+        script.setWorldId(QWebEngineScript.ScriptWorldId.ApplicationWorld)
+        script.setRunsOnSubFrames(True)
+        script.setSourceCode(cls.FORM_TRACKER)
+        return script
+    
+    def track(self, browser):
+        self.tabs[browser] = TabActivity()
+        self.watch_page(browser)
+    
+    def watch_page(self, browser):
+        browser.page().lifecycleStateChanged.connect(
+            lambda state, browser=browser: self.lifecycle_state_changed(browser, state))
+    
+    def forget(self, browser):
+        self.tabs.pop(browser, None)
+        if self.current is browser:
+            self.current = None
+    
+    def activity(self, browser):
+        return self.tabs.get(browser)
+    
+    def tab_activated(self, browser):
+        now = time.monotonic()
+        previous = self.tabs.get(self.current)
+        if previous is not None and self.current is not browser:
+            # The tab being left starts its idle clock now
+            previous.last_active = now
+        self.current = browser
         
-        # Check if the URL contains any of the blocked hosts
-        for blocked_host in self.blocked_hosts:
-            if blocked_host in url:
-                info.block(True)
-                return
-                
-        # Let the request through
-        info.block(False)
+        activity = self.tabs.get(browser)
+        if activity is None:
+            return
+        activity.last_active = now
+        page = browser.page()
+        if page.lifecycleState() != QWebEnginePage.LifecycleState.Active:
+            page.setLifecycleState(QWebEnginePage.LifecycleState.Active)
+    
+    def check_tabs(self):
+        limit = self.settings.freeze_after_minutes * 60
+        if limit <= 0:
+            return
+        now = time.monotonic()
+        for browser, activity in list(self.tabs.items()):
+            if browser is self.current or now - activity.last_active < limit:
+                continue
+            page = browser.page()
+            if page.lifecycleState() != QWebEnginePage.LifecycleState.Active or page.recentlyAudible():
+                continue
+            page.runJavaScript(self.BUSY_CHECK, QWebEngineScript.ScriptWorldId.ApplicationWorld,
+                               lambda busy, browser=browser: self.freeze_if_idle(browser, busy))
+    
+    def freeze_if_idle(self, browser, busy):
+        # The tab may have been selected or closed while the check was running
+        if busy or browser is self.current or browser not in self.tabs:
+            return
+        page = browser.page()
+        if page.isVisible() or page.recentlyAudible():
+            return
+        if page.lifecycleState() == QWebEnginePage.LifecycleState.Active:
+            page.setLifecycleState(QWebEnginePage.LifecycleState.Frozen)
+    
+    def lifecycle_state_changed(self, browser, state):
+        activity = self.tabs.get(browser)
+        if activity is None:
+            return
+        activity.set_state(state, time.monotonic())
+        self.stateChanged.emit(browser)
 
 
-class CustomWebEnginePage(QWebEnginePage):
-    def __init__(self, profile, parent=None):
-        super().__init__(profile, parent)
+class MemoryGovernor(QObject):
+    # Keeps renderer memory under a budget by discarding the least recently
+    # used background tabs. A discarded tab keeps its title, URL and history
+    # and reloads when it is selected again
+    def __init__(self, settings, lifecycle, parent=None):
+        super().__init__(parent)
+        self.settings = settings
+        self.lifecycle = lifecycle
+        self.processes = {}
+        self.discards = deque()
+        self.pending_discard = None
+        self.last_total = 0
+        self.timer = QTimer(self)
+        self.timer.setInterval(10000)
+        self.timer.timeout.connect(self.check_memory)
+        self.timer.start()
+    
+    def process_rss(self, pid):
+        # Keep psutil handles around; creating one per sample is the expensive part
+        import psutil
+        process = self.processes.get(pid)
+        try:
+            if process is None:
+                process = self.processes[pid] = psutil.Process(pid)
+            return process.memory_info().rss
+        except psutil.Error:
+            self.processes.pop(pid, None)
+            return 0
+    
+    def sample(self):
+        # Renderer RSS per tab; tabs sharing a renderer process report the same pid
+        pids = {}
+        for browser in self.lifecycle.tabs:
+            pid = browser.page().renderProcessPid()
+            if pid > 0:
+                pids.setdefault(pid, []).append(browser)
+        for pid in list(self.processes):
+            if pid not in pids:
+                del self.processes[pid]
+        usage = {pid: self.process_rss(pid) for pid in pids}
+        return usage, pids
+    
+    def check_memory(self):
+        budget = self.settings.memory_budget_mb * 1024 * 1024
+        if budget <= 0:
+            return
+        usage, _ = self.sample()
+        total = sum(usage.values())
         
-        # Configure page settings using QWebEngineSettings
-        settings = self.settings()
-        settings.setAttribute(QWebEngineSettings.LocalContentCanAccessRemoteUrls, True)
-        settings.setAttribute(QWebEngineSettings.PlaybackRequiresUserGesture, False)
-        settings.setAttribute(QWebEngineSettings.PluginsEnabled, True)
+        if self.pending_discard is not None:
+            title, before = self.pending_discard
+            self.pending_discard = None
+            log.info("Discarded tab %r: freed %.1f MB (renderers now %.1f MB)",
+                     title, (before - total) / 1048576, total / 1048576)
+        self.last_total = total
+        if total <= budget:
+            return
         
-    def acceptNavigationRequest(self, url, type, isMainFrame):
-        # Always accept navigation request
-        return True
+        # One tab per sample, so the next sample shows what the discard actually freed
+        browser = self.next_victim()
+        if browser is None:
+            log.warning("Renderers use %.1f MB, over the %.1f MB budget, but no tab can be discarded",
+                        total / 1048576, budget / 1048576)
+            return
+        self.discard(browser, total)
+    
+    def next_victim(self):
+        candidates = []
+        for browser, activity in self.lifecycle.tabs.items():
+            page = browser.page()
+            if browser is self.lifecycle.current or page.isVisible() or page.recentlyAudible():
+                continue
+            if page.lifecycleState() == QWebEnginePage.LifecycleState.Discarded:
+                continue
+            candidates.append((activity.last_active, browser))
+        if not candidates:
+            return None
+        return min(candidates, key=lambda candidate: candidate[0])[1]
+    
+    def discard(self, browser, total):
+        page = browser.page()
+        page.setLifecycleState(QWebEnginePage.LifecycleState.Discarded)
+        self.pending_discard = (page.title(), total)
         
-    def javaScriptConsoleMessage(self, level, message, line, source):
-        # Optionally log JavaScript console messages for debugging
-        # print(f"JS [{level}] {message} (Line {line} in {source})")
-        pass
+        now = time.monotonic()
+        self.discards.append(now)
+        while self.discards and now - self.discards[0] > 3600:
+            self.discards.popleft()
+        log.info("Memory budget exceeded (%.1f MB): discarding %r, %d discards in the last hour",
+                 total / 1048576, page.title(), len(self.discards))
 
 
-class DownloadManager(QDialog):
+class ProcessSampler(QObject):
+    # CPU, RSS and I/O of renderer processes, sampled in one psutil pass a
+    # second on a background thread. The Qt thread swaps in the pid set;
+    # each pass reports {pid: (cpu_percent, rss, io_bytes_per_second)}
+    sampled = Signal(object)
+    INTERVAL = 1.0
+    
     def __init__(self, parent=None):
         super().__init__(parent)
-        self.setWindowTitle("Downloads")
-        self.setMinimumSize(500, 300)
-        
-        # Apply dark theme
-        self.set_dark_theme()
+        self.pids = frozenset()
+        self.stopped = None
+    
+    def start(self):
+        if self.stopped is not None:
+            return
+        # A fresh event per run, so a thread still finishing its last pass exits on its own
+        self.stopped = threading.Event()
+        threading.Thread(target=self.run, args=(self.stopped,), name="process-sampler", daemon=True).start()
+    
+    def stop(self):
+        if self.stopped is not None:
+            self.stopped.set()
+            self.stopped = None
+    
+    def run(self, stopped):
+        import psutil
+        # pid -> [psutil.Process, last I/O byte count, time of that count]. Handles
+        # are kept between passes: cpu_percent() measures since the previous call
+        processes = {}
+        while not stopped.wait(self.INTERVAL):
+            pids = self.pids
+            for pid in list(processes):
+                if pid not in pids:
+                    del processes[pid]
+            samples = {}
+            now = time.monotonic()
+            for pid in pids:
+                entry = processes.get(pid)
+                first = entry is None
+                try:
+                    if first:
+                        entry = processes[pid] = [psutil.Process(pid), None, now]
+                    process = entry[0]
+                    with process.oneshot():
+                        cpu = process.cpu_percent()
+                        rss = process.memory_info().rss
+                        io = self.io_bytes(process, psutil)
+                except psutil.Error:
+                    processes.pop(pid, None)
+                    continue
+                rate = None
+                if io is not None and entry[1] is not None and now > entry[2]:
+                    rate = (io - entry[1]) / (now - entry[2])
+                entry[1], entry[2] = io, now
+                # The first cpu_percent() call only starts the measurement
+                samples[pid] = (None if first else cpu, rss, rate)
+            if not stopped.is_set():
+                self.sampled.emit(samples)
+    
+    @staticmethod
+    def io_bytes(process, psutil):
+        # Not every platform reports per-process I/O (macOS does not)
+        try:
+            counters = process.io_counters()
+        except (AttributeError, psutil.AccessDenied):
+            return None
+        return counters.read_bytes + counters.write_bytes
+
+
+class TaskManagerModel(QAbstractTableModel):
+    # One row per open tab. The tab list and request counts are read on the
+    # Qt thread once a second; process figures come from ProcessSampler keyed
+    # by renderer pid, so tabs sharing a renderer show the same numbers
+    SortRole = Qt.UserRole
+    COLUMNS = ["Tab", "Process", "CPU %", "Memory", "I/O", "Requests", "Blocked"]
+    
+    def __init__(self, browser, parent=None):
+        super().__init__(parent)
+        self.browser = browser
+        self.views = []
+        self.pids = []
+        self.shared = {}
+        self.samples = {}
+        self.sampler = ProcessSampler(self)
+        self.sampler.sampled.connect(self.update_samples)
+        self.timer = QTimer(self)
+        self.timer.setInterval(1000)
+        self.timer.timeout.connect(self.refresh)
+    
+    def start(self):
+        self.refresh()
+        self.timer.start()
+        self.sampler.start()
+    
+    def stop(self):
+        self.timer.stop()
+        self.sampler.stop()
+    
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.views)
+    
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.COLUMNS)
+    
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if orientation == Qt.Horizontal and role == Qt.DisplayRole:
+            return self.COLUMNS[section]
+        return None
+    
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        view, pid, column = self.views[index.row()], self.pids[index.row()], index.column()
+        if role == Qt.ToolTipRole:
+            if column == 1 and self.shared.get(pid, 0) > 1:
+                return f"Renderer shared by {self.shared[pid]} tabs"
+            return view.url().toString() if column == 0 else None
+        if role == Qt.TextAlignmentRole:
+            return None if column == 0 else int(Qt.AlignRight | Qt.AlignVCenter)
+        if role not in (Qt.DisplayRole, self.SortRole):
+            return None
+        value = self.value(view, pid, column)
+        if role == self.SortRole:
+            # Missing figures sort below every real one
+            return -1 if value is None else value
+        if value is None:
+            return "\u2014"
+        if column == 2:
+            return f"{value:.1f}"
+        if column == 3:
+            return f"{value / 1048576:.1f} MB"
+        if column == 4:
+            return f"{value / 1024:.1f} KB/s"
+        return str(value)
+    
+    def value(self, view, pid, column):
+        if column == 0:
+            return view.page().title() or view.url().toString()
+        if column == 1:
+            # Discarded and crashed tabs have no renderer
+            return pid if pid > 0 else None
+        if column in (2, 3, 4):
+            sample = self.samples.get(pid)
+            return sample[column - 2] if sample else None
+        stats = self.browser.tab_request_stats(view)
+        if stats is None:
+            return None
+        return stats.allowed + stats.blocked if column == 5 else stats.blocked
+    
+    def refresh(self):
+        # Restored tabs that were never opened have no page and no renderer
+        views = [self.browser.tabs.widget(i) for i in range(self.browser.tabs.count())]
+        views = [view for view in views if isinstance(view, QWebEngineView)]
+        pids = [view.page().renderProcessPid() for view in views]
+        self.shared = {}
+        for pid in pids:
+            self.shared[pid] = self.shared.get(pid, 0) + 1
+        if views != self.views:
+            self.beginResetModel()
+            self.views, self.pids = views, pids
+            self.endResetModel()
+        elif views:
+            self.pids = pids
+            self.dataChanged.emit(self.index(0, 0), self.index(len(views) - 1, len(self.COLUMNS) - 1))
+        self.sampler.pids = frozenset(pid for pid in pids if pid > 0)
+    
+    def update_samples(self, samples):
+        self.samples = samples
+        if self.views:
+            self.dataChanged.emit(self.index(0, 2), self.index(len(self.views) - 1, 4))
+    
+    def kill_renderer(self, row):
+        # Every tab sharing the process goes down with it; each can then be reloaded
+        import psutil
+        pid = self.pids[row]
+        if pid <= 0:
+            return False
+        try:
+            psutil.Process(pid).kill()
+        except psutil.Error as exc:
+            log.warning("Could not end renderer %d: %s", pid, exc)
+            return False
+        return True
+
+
+class TaskManager(QDialog):
+    def __init__(self, browser, parent=None):
+        super().__init__(parent)
+        self.browser = browser
+        self.setWindowTitle("Task Manager")
+        self.setMinimumSize(700, 400)
         
-        # Main layout
         layout = QVBoxLayout(self)
         
-        # Downloads list
-        self.downloads_list = QListWidget()
-        layout.addWidget(self.downloads_list)
+        # Sorting goes through a proxy, on the raw numbers rather than the display text
+        self.model = TaskManagerModel(browser, self)
+        self.proxy = QSortFilterProxyModel(self)
+        self.proxy.setSourceModel(self.model)
+        self.proxy.setSortRole(TaskManagerModel.SortRole)
+        self.table = QTableView()
+        self.table.setModel(self.proxy)
+        self.table.setSortingEnabled(True)
+        self.table.setSelectionBehavior(QTableView.SelectionBehavior.SelectRows)
+        self.table.setSelectionMode(QTableView.SelectionMode.SingleSelection)
+        self.table.verticalHeader().hide()
+        self.table.horizontalHeader().setSectionResizeMode(0, QHeaderView.Stretch)
+        self.table.doubleClicked.connect(self.switch_to_tab)
+        layout.addWidget(self.table)
         
-        # Bottom buttons
         btn_layout = QHBoxLayout()
-        self.clear_btn = QPushButton("Clear Completed")
-        self.clear_btn.clicked.connect(self.clear_completed)
+        self.reload_btn = QPushButton("Reload")
+        self.reload_btn.clicked.connect(self.reload_selected)
+        self.kill_btn = QPushButton("End Process")
+        self.kill_btn.clicked.connect(self.kill_selected)
         self.close_btn = QPushButton("Close")
         self.close_btn.clicked.connect(self.close)
         
-        btn_layout.addWidget(self.clear_btn)
+        btn_layout.addWidget(self.reload_btn)
+        btn_layout.addWidget(self.kill_btn)
         btn_layout.addStretch()
         btn_layout.addWidget(self.close_btn)
         
         layout.addLayout(btn_layout)
+    
+    def showEvent(self, event):
+        # Sampling only runs while the dialog is open
+        super().showEvent(event)
+        self.model.start()
+    
+    def hideEvent(self, event):
+        super().hideEvent(event)
+        self.model.stop()
+    
+    def selected_row(self):
+        index = self.table.currentIndex()
+        return self.proxy.mapToSource(index).row() if index.isValid() else None
+    
+    def reload_selected(self):
+        row = self.selected_row()
+        if row is not None:
+            self.model.views[row].reload()
+    
+    def kill_selected(self):
+        row = self.selected_row()
+        if row is not None and self.model.kill_renderer(row):
+            self.browser.status_bar.showMessage("Renderer process ended; reload the tab to restart it", 3000)
+    
+    def switch_to_tab(self, index):
+        self.browser.tabs.setCurrentWidget(self.model.views[self.proxy.mapToSource(index).row()])
+
+
+def serialize_history(history):
+    # QWebEngineHistory -> base64 text that fits in the JSON session files
+    data = QByteArray()
+    stream = QDataStream(data, QIODevice.OpenModeFlag.WriteOnly)
+    stream << history
+    return bytes(data.toBase64()).decode("ascii")
+
+
+def restore_history(history, encoded):
+    data = QByteArray.fromBase64(encoded.encode("ascii"))
+    stream = QDataStream(data, QIODevice.OpenModeFlag.ReadOnly)
+    stream >> history
+
+
+class SessionStore:
+    # Crash-safe record of the open tabs: every open/close/move/navigate event is
+    # appended to a journal as one JSON line, and the journal is periodically
+    # folded into a snapshot that also carries each tab's serialized history.
+    # Restoring reads the snapshot and replays whatever the journal adds to it
+    COMPACT_AFTER = 1000
+
+    def __init__(self, directory):
+        # No directory (an ephemeral profile) keeps no session at all
+        self.directory = directory
+        self.journal_path = directory and os.path.join(directory, "journal.jsonl")
+        self.snapshot_path = directory and os.path.join(directory, "snapshot.json")
+        self.pending = 0
+        self.journal = None
+
+    def open_journal(self):
+        os.makedirs(self.directory, exist_ok=True)
+        # Line buffered, so each event reaches the OS as soon as it is written
+        self.journal = open(self.journal_path, "a", encoding="utf-8", buffering=1)
+
+    def record(self, event):
+        if self.directory is None:
+            return
+        if self.journal is None:
+            self.open_journal()
+        self.journal.write(json.dumps(event, separators=(",", ":")) + "\n")
+        self.pending += 1
+
+    def needs_compaction(self):
+        return self.pending >= self.COMPACT_AFTER
+
+    def compact(self, tabs, current):
+        if self.directory is None:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        temp_path = self.snapshot_path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as snapshot:
+            json.dump({"tabs": tabs, "current": current}, snapshot)
+            snapshot.flush()
+            os.fsync(snapshot.fileno())
+        os.replace(temp_path, self.snapshot_path)
         
-        # Downloads tracking
-        self.downloads = {}
+        # Everything in the journal is now in the snapshot
+        if self.journal is not None:
+            self.journal.close()
+        self.journal = open(self.journal_path, "w", encoding="utf-8", buffering=1)
+        self.pending = 0
+
+    def load(self):
+        tabs, order, current = {}, [], None
+        if self.directory is None:
+            return [], None
+        try:
+            with open(self.snapshot_path, encoding="utf-8") as snapshot:
+                state = json.load(snapshot)
+            for tab in state.get("tabs", []):
+                tabs[tab["id"]] = tab
+                order.append(tab["id"])
+            current = state.get("current")
+        except (OSError, ValueError, KeyError):
+            pass
         
-    def add_download(self, download):
-        download_id = id(download)
-        self.downloads[download_id] = download
+        try:
+            with open(self.journal_path, encoding="utf-8") as journal:
+                for line in journal:
+                    try:
+                        event = json.loads(line)
+                    except ValueError:
+                        # A torn last line from a crash; everything before it is good
+                        break
+                    self.replay(event, tabs, order)
+                    if event.get("type") == "select":
+                        current = event["id"]
+        except OSError:
+            pass
         
-        # Add to list
-        filename = os.path.basename(download.downloadDirectory() + "/" + download.downloadFileName())
-        item_text = f"Downloading: {filename}"
-        item = self.downloads_list.addItem(item_text)
-        download_item = self.downloads_list.item(self.downloads_list.count() - 1)
+        if current not in tabs:
+            current = order[-1] if order else None
+        return [tabs[tab_id] for tab_id in order], current
+
+    @staticmethod
+    def replay(event, tabs, order):
+        kind, tab_id = event.get("type"), event.get("id")
+        if kind == "open":
+            # A crash between writing the snapshot and emptying the journal leaves
+            # opens for tabs the snapshot already has, with their history
+            if tab_id in tabs:
+                return
+            tabs[tab_id] = {"id": tab_id, "url": event.get("url", ""), "title": "", "history": None}
+            order.insert(min(event.get("index", len(order)), len(order)), tab_id)
+        elif kind == "close" and tab_id in tabs:
+            del tabs[tab_id]
+            order.remove(tab_id)
+        elif kind == "move" and tab_id in tabs:
+            order.remove(tab_id)
+            order.insert(min(event.get("index", len(order)), len(order)), tab_id)
+        elif kind == "navigate" and tab_id in tabs:
+            tabs[tab_id]["url"] = event.get("url", "")
+        elif kind == "title" and tab_id in tabs:
+            tabs[tab_id]["title"] = event.get("title", "")
+
+    def close(self):
+        if self.journal is not None:
+            self.journal.close()
+            self.journal = None
+
+
+class TabPlaceholder(QWidget):
+    # Stands in for a restored tab until it is first selected, so restoring
+    # a session does not start a page load for every tab
+    def __init__(self, tab_id, url, title, history, parent=None):
+        super().__init__(parent)
+        self.tab_id = tab_id
+        self.url = url
+        self.title = title
+        self.history = history
         
-        # Connect signals
-        download.downloadProgress.connect(lambda received, total, d_id=download_id, idx=self.downloads_list.count() - 1: 
-                                         self.update_progress(d_id, idx, received, total))
-        download.finished.connect(lambda d_id=download_id, idx=self.downloads_list.count() - 1: 
-                                 self.download_finished(d_id, idx))
+        layout = QVBoxLayout(self)
+        label = QLabel(title or url)
+        label.setAlignment(Qt.AlignCenter)
+        layout.addWidget(label)
+
+
+def take_batch(events, interval):
+    # Block for the first event, then take whatever else arrives within the interval.
+    # A None event asks the writer to stop; returns (batch, keep_running)
+    batch = [events.get()]
+    deadline = time.monotonic() + interval
+    while batch[-1] is not None:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        try:
+            batch.append(events.get(timeout=remaining))
+        except queue.Empty:
+            break
+    if batch[-1] is None:
+        batch.pop()
+        return batch, False
+    return batch, True
+
+
+class HistoryStore:
+    # Visited pages in SQLite, ranked by frecency. Visits are queued and
+    # written in batches by a background thread; the URL bar reads through
+    # its own connection, which WAL mode lets run alongside the writer.
+    #
+    # Frecency decays with a half-life, stored as log2(score) + t / half-life
+    # so that ordering by the stored key ranks by the current score at any
+    # later time, and the column can be indexed
+    HALF_LIFE = 30 * 86400
+    VISIT_BONUS = 1.0
+    MAX_DAYS = 180
+    MAX_URLS = 200000
+    MAX_TOKENS = 24
+    FLUSH_INTERVAL = 1.0
+    RARE_TOKEN = 500
+    SCAN_LIMIT = 10000
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS urls (
+            id INTEGER PRIMARY KEY,
+            url TEXT NOT NULL UNIQUE,
+            title TEXT NOT NULL DEFAULT '',
+            visit_count INTEGER NOT NULL DEFAULT 0,
+            last_visit INTEGER NOT NULL,
+            frecency REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS urls_frecency ON urls(frecency);
+        CREATE TABLE IF NOT EXISTS visits (
+            url_id INTEGER NOT NULL REFERENCES urls(id) ON DELETE CASCADE,
+            visited INTEGER NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS visits_visited ON visits(visited);
+        CREATE INDEX IF NOT EXISTS visits_url ON visits(url_id);
+        CREATE TABLE IF NOT EXISTS url_tokens (
+            token TEXT NOT NULL,
+            url_id INTEGER NOT NULL REFERENCES urls(id) ON DELETE CASCADE,
+            PRIMARY KEY (token, url_id)
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS url_tokens_url ON url_tokens(url_id, token);
+    """
+    
+    def __init__(self, path):
+        self.path = path
+        self.db = self.connect()
+        self.db.executescript(self.SCHEMA)
+        self.scan_floor = None
+        self.queue = queue.Queue()
+        self.thread = threading.Thread(target=self.run_writer, name="history-writer", daemon=True)
+        self.thread.start()
+    
+    def connect(self):
+        db = connect_database(self.path)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        db.execute("PRAGMA foreign_keys=ON")
+        return db
+    
+    @staticmethod
+    def tokens(url, title):
+        # Host labels, path words and title words, lowercased
+        parts = urlsplit(url)
+        host = (parts.hostname or "").lower()
+        if host.startswith("www."):
+            host = host[4:]
+        words = [host] + re.findall(r"[a-z0-9]+", (host + " " + parts.path + " " + title).lower())
+        return list(dict.fromkeys(word for word in words if word))[:HistoryStore.MAX_TOKENS]
+    
+    @classmethod
+    def bump_frecency(cls, key, now):
+        score = 2 ** (key - now / cls.HALF_LIFE) if key is not None else 0.0
+        return math.log2(score + cls.VISIT_BONUS) + now / cls.HALF_LIFE
+    
+    def record_visit(self, url, title=""):
+        if url.startswith(("http://", "https://")):
+            self.queue.put(("visit", url, title, int(time.time())))
+    
+    def record_title(self, url, title):
+        if title and url.startswith(("http://", "https://")):
+            self.queue.put(("title", url, title, 0))
+    
+    def close(self):
+        self.queue.put(None)
+        self.thread.join(timeout=5)
+    
+    def run_writer(self):
+        db = self.connect()
+        last_expiry = None
+        running = True
+        while running:
+            if last_expiry is None or time.monotonic() - last_expiry > 86400:
+                try:
+                    self.expire(db)
+                    last_expiry = time.monotonic()
+                except sqlite3.Error:
+                    # Another connection may hold the write lock; retried after the next batch
+                    log.exception("Failed to expire old history")
+            events, running = take_batch(self.queue, self.FLUSH_INTERVAL)
+            try:
+                with db:
+                    for kind, url, title, visited in events:
+                        if kind == "visit":
+                            self.write_visit(db, url, title, visited)
+                        else:
+                            self.write_title(db, url, title)
+                self.scan_floor = None
+            except sqlite3.Error:
+                log.exception("Failed to write history")
+        db.close()
+    
+    def write_visit(self, db, url, title, visited):
+        row = db.execute("SELECT id, frecency FROM urls WHERE url = ?", (url,)).fetchone()
+        if row:
+            url_id, key = row
+            key = self.bump_frecency(key, visited)
+            db.execute("UPDATE urls SET visit_count = visit_count + 1, last_visit = ?, frecency = ? WHERE id = ?",
+                       (visited, key, url_id))
+        else:
+            key = self.bump_frecency(None, visited)
+            url_id = db.execute("INSERT INTO urls (url, title, visit_count, last_visit, frecency) "
+                                "VALUES (?, ?, 1, ?, ?)", (url, title, visited, key)).lastrowid
+            db.executemany("INSERT OR IGNORE INTO url_tokens (token, url_id) VALUES (?, ?)",
+                           [(token, url_id) for token in self.tokens(url, title)])
+        db.execute("INSERT INTO visits (url_id, visited) VALUES (?, ?)", (url_id, visited))
+    
+    def write_title(self, db, url, title):
+        row = db.execute("SELECT id, title FROM urls WHERE url = ?", (url,)).fetchone()
+        if not row or row[1] == title:
+            return
+        url_id = row[0]
+        db.execute("UPDATE urls SET title = ? WHERE id = ?", (title, url_id))
+        db.execute("DELETE FROM url_tokens WHERE url_id = ?", (url_id,))
+        db.executemany("INSERT OR IGNORE INTO url_tokens (token, url_id) VALUES (?, ?)",
+                       [(token, url_id) for token in self.tokens(url, title)])
+    
+    def expire(self, db):
+        # Keep the store bounded: drop old visits, then pages never visited since,
+        # then the lowest ranked pages beyond the size cap
+        cutoff = int(time.time()) - self.MAX_DAYS * 86400
+        with db:
+            db.execute("DELETE FROM visits WHERE visited < ?", (cutoff,))
+            db.execute("DELETE FROM urls WHERE last_visit < ?", (cutoff,))
+            excess = db.execute("SELECT count(*) FROM urls").fetchone()[0] - self.MAX_URLS
+            if excess > 0:
+                db.execute("DELETE FROM urls WHERE id IN (SELECT id FROM urls ORDER BY frecency LIMIT ?)",
+                           (excess,))
+    
+    def suggest(self, text, limit=8):
+        words = re.findall(r"[a-z0-9]+", text.lower())[:4]
+        if not words:
+            return []
+        ranges = [(word, word + "\uffff") for word in words]
         
-        # Show the dialog to make downloads visible to user
-        self.show()
-        return download_item
-    
-    def update_progress(self, download_id, index, received, total):
-        if download_id in self.downloads and total > 0 and index < self.downloads_list.count():
-            progress = int(received * 100 / total)
-            filename = os.path.basename(self.downloads[download_id].downloadDirectory() + "/" + self.downloads[download_id].downloadFileName())
-            self.downloads_list.item(index).setText(f"Downloading: {filename} - {progress}%")
-    
-    def download_finished(self, download_id, index):
-        if download_id in self.downloads and index < self.downloads_list.count():
-            filename = os.path.basename(self.downloads[download_id].downloadDirectory() + "/" + self.downloads[download_id].downloadFileName())
-            self.downloads_list.item(index).setText(f"Completed: {filename}")
-            # Show notification
-            self.show()
-            self.raise_()
+        # How many pages each typed word (as a token prefix) could match, capped
+        # so that counting never costs more than a short index range scan
+        sizes = [self.db.execute("SELECT count(*) FROM (SELECT 1 FROM url_tokens "
+                                 "WHERE token >= ? AND token < ? LIMIT ?)", (low, high, self.RARE_TOKEN)).fetchone()[0]
+                 for low, high in ranges]
+        exists = " AND ".join(["EXISTS (SELECT 1 FROM url_tokens t WHERE t.url_id = u.id "
+                               "AND t.token >= ? AND t.token < ?)"] * len(ranges))
+        rarest = min(range(len(ranges)), key=sizes.__getitem__)
+        if sizes[rarest] < self.RARE_TOKEN:
+            # A rare word: rank its few candidates directly
+            params = list(ranges[rarest]) + [bound for pair in ranges for bound in pair] + [limit]
+            query = (f"SELECT url, title FROM urls u WHERE u.id IN (SELECT url_id FROM url_tokens "
+                     f"WHERE token >= ? AND token < ?) AND {exists} ORDER BY +u.frecency DESC LIMIT ?")
+        else:
+            # Only common words: walk pages best first and stop at the first few hits,
+            # never looking further down than the SCAN_LIMIT best pages
+            if self.scan_floor is None:
+                floor = self.db.execute("SELECT frecency FROM urls ORDER BY frecency DESC LIMIT 1 OFFSET ?",
+                                        (self.SCAN_LIMIT,)).fetchone()
+                self.scan_floor = floor[0] if floor else float("-inf")
+            params = [self.scan_floor] + [bound for pair in ranges for bound in pair] + [limit]
+            query = (f"SELECT url, title FROM urls u WHERE u.frecency >= ? AND {exists} "
+                     f"ORDER BY u.frecency DESC LIMIT ?")
+        return self.db.execute(query, params).fetchall()
+
+
+class PageIndex:
+    # Full text of visited pages, so something read last week can be found
+    # offline. Text is handed over after each load and indexed by a background
+    # thread into an SQLite FTS5 table, an on-disk inverted index ranked with
+    # BM25. Pages with identical text share one document, found by content
+    # hash. The writer keeps a running total of stored text, and the documents
+    # seen longest ago are dropped beyond MAX_BYTES or MAX_DOCUMENTS
+    MAX_DOCUMENTS = 50000
+    MAX_BYTES = 256 * 1024 * 1024
+    MAX_TEXT = 50000
+    MIN_TEXT = 50
+    RANK_LIMIT = 1000
+    FLUSH_INTERVAL = 2.0
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS documents (
+            id INTEGER PRIMARY KEY,
+            hash TEXT NOT NULL UNIQUE,
+            size INTEGER NOT NULL,
+            indexed INTEGER NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS documents_indexed ON documents(indexed);
+        CREATE TABLE IF NOT EXISTS pages (
+            url TEXT PRIMARY KEY,
+            title TEXT NOT NULL DEFAULT '',
+            document_id INTEGER NOT NULL,
+            visited INTEGER NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS pages_document ON pages(document_id);
+        CREATE VIRTUAL TABLE IF NOT EXISTS page_text USING fts5(
+            title, body, tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3'
+        );
+    """
+    
+    def __init__(self, path):
+        self.path = path
+        self.db = self.connect()
+        self.db.executescript(self.SCHEMA)
+        with self.db:
+            # Title matches count ten times as much as body matches
+            self.db.execute("INSERT INTO page_text (page_text, rank) VALUES ('rank', 'bm25(10.0, 1.0)')")
+        self.stored_bytes = self.count_bytes(self.db)
+        self.queue = queue.Queue()
+        self.thread = threading.Thread(target=self.run_writer, name="page-indexer", daemon=True)
+        self.thread.start()
+    
+    def connect(self):
+        db = connect_database(self.path)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        return db
+    
+    def record(self, url, title, text):
+        # Called on the UI thread with the result of toPlainText(); hashing and
+        # tokenizing happen on the indexer thread
+        if url.startswith(("http://", "https://")) and len(text) >= self.MIN_TEXT:
+            self.queue.put((url, title, text, int(time.time())))
+    
+    def close(self):
+        self.queue.put(None)
+        self.thread.join(timeout=5)
+    
+    def run_writer(self):
+        db = self.connect()
+        running = True
+        while running:
+            pages, running = take_batch(self.queue, self.FLUSH_INTERVAL)
+            try:
+                with db:
+                    for url, title, text, visited in pages:
+                        self.index(db, url, title, text, visited)
+                    self.prune(db)
+            except sqlite3.Error:
+                log.exception("Failed to index page text")
+                # The batch was rolled back, so the running total no longer matches
+                self.stored_bytes = self.count_bytes(db)
+        db.close()
+    
+    @staticmethod
+    def count_bytes(db):
+        return db.execute("SELECT coalesce(sum(size), 0) FROM documents").fetchone()[0]
+    
+    def index(self, db, url, title, text, visited):
+        text = " ".join(text[:self.MAX_TEXT].split())
+        data = text.encode("utf-8")
+        digest = hashlib.sha256(data).hexdigest()
+        row = db.execute("SELECT id FROM documents WHERE hash = ?", (digest,)).fetchone()
+        if row:
+            document_id = row[0]
+            db.execute("UPDATE documents SET indexed = ? WHERE id = ?", (visited, document_id))
+        else:
+            size = len(data) + len(title.encode("utf-8"))
+            document_id = db.execute("INSERT INTO documents (hash, size, indexed) VALUES (?, ?, ?)",
+                                     (digest, size, visited)).lastrowid
+            db.execute("INSERT INTO page_text (rowid, title, body) VALUES (?, ?, ?)", (document_id, title, text))
+            self.stored_bytes += size
+        
+        previous = db.execute("SELECT document_id FROM pages WHERE url = ?", (url,)).fetchone()
+        db.execute("INSERT OR REPLACE INTO pages (url, title, document_id, visited) VALUES (?, ?, ?, ?)",
+                   (url, title, document_id, visited))
+        if previous and previous[0] != document_id:
+            # The page changed; drop its old text unless another page still shares it
+            if not db.execute("SELECT 1 FROM pages WHERE document_id = ?", (previous[0],)).fetchone():
+                self.delete_documents(db, [previous[0]])
+    
+    def prune(self, db):
+        # Documents are re-stamped on every visit, so the oldest stamps are the
+        # least recently seen; take them until both limits are met
+        excess_documents = db.execute("SELECT count(*) FROM documents").fetchone()[0] - self.MAX_DOCUMENTS
+        excess_bytes = self.stored_bytes - self.MAX_BYTES
+        if excess_documents <= 0 and excess_bytes <= 0:
+            return
+        oldest = []
+        for document_id, size in db.execute("SELECT id, size FROM documents ORDER BY indexed"):
+            if len(oldest) >= excess_documents and excess_bytes <= 0:
+                break
+            oldest.append(document_id)
+            excess_bytes -= size
+        self.delete_documents(db, oldest)
+    
+    def delete_documents(self, db, document_ids):
+        rows = [(document_id,) for document_id in document_ids]
+        for row in rows:
+            size = db.execute("SELECT size FROM documents WHERE id = ?", row).fetchone()
+            self.stored_bytes -= size[0] if size else 0
+        db.executemany("DELETE FROM page_text WHERE rowid = ?", rows)
+        db.executemany("DELETE FROM pages WHERE document_id = ?", rows)
+        db.executemany("DELETE FROM documents WHERE id = ?", rows)
+    
+    @staticmethod
+    def match_query(text):
+        # Every word must appear; the last one may still be half typed
+        words = re.findall(r"\w+", text.lower())
+        if not words:
+            return None
+        terms = [f'"{word}"' for word in words]
+        terms[-1] += "*"
+        return " ".join(terms)
+    
+    @staticmethod
+    def excerpt(body, words, width=160):
+        # Text around the first place any of the words starts a word
+        found = re.search(r"\b(?:" + "|".join(map(re.escape, words)) + ")", body, re.IGNORECASE)
+        start = max(found.start() - width // 3, 0) if found else 0
+        text = body[start:start + width]
+        return ("..." if start else "") + text + ("..." if start + width < len(body) else "")
+    
+    def search(self, text, limit=50):
+        # Returns (url, title, excerpt) rows, best match first
+        query = self.match_query(text)
+        if query is None:
+            return []
+        try:
+            # Words found on most pages would have every document scored; rank only
+            # the newest RANK_LIMIT matches, which walking the doclist finds cheaply
+            floor = self.db.execute("SELECT rowid FROM page_text WHERE page_text MATCH ? "
+                                    "ORDER BY rowid DESC LIMIT 1 OFFSET ?", (query, self.RANK_LIMIT)).fetchone()
+            ranked = [row[0] for row in self.db.execute(
+                "SELECT rowid FROM page_text WHERE page_text MATCH ? AND rowid > ? ORDER BY rank LIMIT ?",
+                (query, floor[0] if floor else 0, limit))]
+            if not ranked:
+                return []
             
-            # Optional: Display a status message
-            if self.parent():
-                self.parent().status_bar.showMessage(f"Download complete: {filename}", 3000)
+            # FTS5's snippet() re-tokenizes whole documents, so cut excerpts here instead
+            marks = ",".join("?" * len(ranked))
+            bodies = dict(self.db.execute(f"SELECT rowid, body FROM page_text WHERE rowid IN ({marks})", ranked))
+            order = {document_id: position for position, document_id in enumerate(ranked)}
+            pages = self.db.execute(f"SELECT url, title, document_id, visited FROM pages "
+                                    f"WHERE document_id IN ({marks})", ranked).fetchall()
+            pages.sort(key=lambda page: (order[page[2]], -page[3]))
+            words = re.findall(r"\w+", text.lower())
+            return [(url, title, self.excerpt(bodies.get(document_id, ""), words))
+                    for url, title, document_id, _ in pages[:limit]]
+        except sqlite3.OperationalError:
+            log.exception("Page text query failed: %s", query)
+            return []
+
+
+class PageSearchDialog(QDialog):
+    pageSelected = Signal(str)
     
-    def clear_completed(self):
-        for i in range(self.downloads_list.count() - 1, -1, -1):
-            item = self.downloads_list.item(i)
-            if item and "Completed: " in item.text():
-                self.downloads_list.takeItem(i)
+    def __init__(self, page_index, parent=None):
+        super().__init__(parent)
+        self.page_index = page_index
+        self.setWindowTitle("Search Visited Pages")
+        self.setMinimumSize(600, 400)
+        
+        layout = QVBoxLayout(self)
+        
+        self.query_edit = QLineEdit()
+        self.query_edit.setPlaceholderText("Words from a page you have visited...")
+        self.query_edit.textEdited.connect(self.schedule_search)
+        self.query_edit.returnPressed.connect(self.search)
+        layout.addWidget(self.query_edit)
+        
+        self.results_list = QListWidget()
+        self.results_list.setWordWrap(True)
+        self.results_list.itemActivated.connect(self.open_result)
+        layout.addWidget(self.results_list)
+        
+        self.summary_label = QLabel()
+        layout.addWidget(self.summary_label)
+        
+        # Search once typing pauses rather than on every keystroke
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(150)
+        self.search_timer.timeout.connect(self.search)
+    
+    def schedule_search(self):
+        self.search_timer.start()
+    
+    def search(self):
+        self.search_timer.stop()
+        start = time.perf_counter()
+        results = self.page_index.search(self.query_edit.text())
+        elapsed = (time.perf_counter() - start) * 1000
+        
+        self.results_list.clear()
+        for url, title, excerpt in results:
+            item = QListWidgetItem(f"{title or url}\n{excerpt}")
+            item.setData(Qt.UserRole, url)
+            item.setToolTip(url)
+            self.results_list.addItem(item)
+        self.summary_label.setText(f"{len(results)} pages in {elapsed:.1f} ms" if self.query_edit.text() else "")
+    
+    def open_result(self, item):
+        self.pageSelected.emit(item.data(Qt.UserRole))
+        self.close()
+    
+    def showEvent(self, event):
+        super().showEvent(event)
+        self.query_edit.setFocus()
+        self.query_edit.selectAll()
+
+
+class BrowserProfile(QObject):
+    # A named QWebEngineProfile with its own cookies, HTTP cache and browsing
+    # data. The default profile keeps the browser's data directory, others
+    # live under profiles/<name> (or <name> in the configured profile
+    # directory). An ephemeral profile is off the record: Chromium keeps
+    # cookies and cache in memory and the browser's own stores are in-memory
+    # databases, so a kiosk session leaves nothing behind on disk
+    cacheMeasured = Signal(object, object)
+    siteCleared = Signal(str, int)
+    CACHE_TYPES = {
+        "disk": QWebEngineProfile.DiskHttpCache,
+        "memory": QWebEngineProfile.MemoryHttpCache,
+        "none": QWebEngineProfile.NoCache,
+    }
+    # Chromium's simple cache backend: one "<key hash>_0" file per entry,
+    # starting with a fixed header followed by the entry's key
+    CACHE_ENTRY = re.compile(r"[0-9a-f]{16}_0")
+    CACHE_HEADER = struct.Struct("<QIII4x")
+    CACHE_MAGIC = 0xfcfb6d1ba7725c30
+    
+    def __init__(self, settings, name=None, ephemeral=None, parent=None):
+        super().__init__(parent)
+        self.settings = settings
+        self.name = name or settings.profile_name
+        self.ephemeral = settings.ephemeral_profile if ephemeral is None else ephemeral
+        if self.ephemeral:
+            self.profile = QWebEngineProfile(self)
+        else:
+            self.profile = QWebEngineProfile(self.name, self)
+            self.profile.setPersistentStoragePath(self.path("webengine"))
+            self.profile.setCachePath(self.path("cache"))
+            self.profile.setPersistentCookiesPolicy(QWebEngineProfile.AllowPersistentCookies)
+        self.apply_cache_settings()
+        
+        # The cookie store has no lookup by site, so keep an index of its cookies
+        self.cookies = {}
+        cookie_store = self.profile.cookieStore()
+        cookie_store.cookieAdded.connect(self.cookie_added)
+        cookie_store.cookieRemoved.connect(self.cookie_removed)
+        cookie_store.loadAllCookies()
+    
+    def path(self, *parts):
+        # None for an ephemeral profile
+        if self.ephemeral:
+            return None
+        if self.settings.profile_dir:
+            return os.path.join(self.settings.profile_dir, self.name, *parts)
+        if self.name == "default":
+            return app_data_path(*parts)
+        return app_data_path("profiles", self.name, *parts)
+    
+    def database(self, name):
+        if self.ephemeral:
+            return memory_database(name)
+        return self.path(name + ".db")
+    
+    def apply_cache_settings(self):
+        # Takes effect for new requests; open pages keep working
+        self.profile.setHttpCacheType(self.CACHE_TYPES.get(self.settings.cache_type,
+                                                           QWebEngineProfile.DiskHttpCache))
+        # 0 lets Chromium size the cache from the free disk space
+        self.profile.setHttpCacheMaximumSize(self.settings.cache_size_mb * 1024 * 1024)
+    
+    def disk_cache(self):
+        return (self.profile.httpCacheType() == QWebEngineProfile.DiskHttpCache
+                and not self.profile.isOffTheRecord())
+    
+    @staticmethod
+    def cookie_key(cookie):
+        return cookie.domain(), cookie.name().data(), cookie.path()
+    
+    def cookie_added(self, cookie):
+        self.cookies[self.cookie_key(cookie)] = cookie
+    
+    def cookie_removed(self, cookie):
+        self.cookies.pop(self.cookie_key(cookie), None)
+    
+    @staticmethod
+    def on_site(host, site):
+        host = host.lstrip(".").lower()
+        return host == site or host.endswith("." + site)
+    
+    def measure_cache(self):
+        # Bytes and entries in the disk cache, counted off the UI thread and
+        # reported through cacheMeasured; (None, None) without a disk cache
+        if not self.disk_cache():
+            self.cacheMeasured.emit(None, None)
+            return
+        threading.Thread(target=self.count_cache, name="cache-usage", daemon=True).start()
     
-    def set_dark_theme(self):
-        # Set dark palette
+    def count_cache(self):
+        size = entries = 0
+        for directory, _, files in os.walk(self.profile.cachePath()):
+            for filename in files:
+                try:
+                    size += os.path.getsize(os.path.join(directory, filename))
+                except OSError:
+                    continue
+                if self.CACHE_ENTRY.fullmatch(filename):
+                    entries += 1
+        self.cacheMeasured.emit(size, entries)
+    
+    def clear_cache(self):
+        self.profile.clearHttpCache()
+    
+    def clear_site(self, host):
+        # Deletes the site's cookies, including its subdomains', and its HTTP
+        # cache entries. Chromium can only clear a whole cache, so disk entries
+        # are found by key and removed by a background scan (a missing entry
+        # file is just a cache miss); siteCleared reports the count. A memory
+        # cache is small enough to clear whole
+        site = host.lower()
+        if site.startswith("www."):
+            site = site[4:]
+        cookie_store = self.profile.cookieStore()
+        for cookie in [cookie for cookie in self.cookies.values() if self.on_site(cookie.domain(), site)]:
+            cookie_store.deleteCookie(cookie)
+        if self.disk_cache():
+            threading.Thread(target=self.remove_cache_entries, args=(site,),
+                             name="cache-clear", daemon=True).start()
+        else:
+            self.profile.clearHttpCache()
+            self.siteCleared.emit(site, 0)
+    
+    def cache_entries(self):
+        # (path, key) for each entry file in the disk cache
+        for directory, _, files in os.walk(self.profile.cachePath()):
+            for filename in files:
+                if not self.CACHE_ENTRY.fullmatch(filename):
+                    continue
+                path = os.path.join(directory, filename)
+                try:
+                    with open(path, "rb") as entry:
+                        header = entry.read(self.CACHE_HEADER.size)
+                        if len(header) < self.CACHE_HEADER.size:
+                            continue
+                        magic, _, key_length, _ = self.CACHE_HEADER.unpack(header)
+                        if magic != self.CACHE_MAGIC:
+                            continue
+                        key = entry.read(key_length).decode("utf-8", "replace")
+                except OSError:
+                    continue
+                yield path, key
+    
+    def remove_cache_entries(self, site):
+        # Keys are the resource URL, prefixed with the sites it was loaded
+        # from when the cache is partitioned ("1/0/_dk_https://a.com https://a.com https://b.com/x.js")
+        removed = 0
+        for path, key in self.cache_entries():
+            hosts = (urlsplit(part.rpartition("_dk_")[2]).hostname or "" for part in key.split())
+            if any(self.on_site(host, site) for host in hosts):
+                try:
+                    os.remove(path)
+                    removed += 1
+                except OSError:
+                    pass
+        self.siteCleared.emit(site, removed)
+
+
+class ThemeEngine:
+    # Builds each theme's palette and style sheet once and applies them to the
+    # whole application, so every window and dialog, including ones created
+    # later, follows without a palette or style sheet of its own. Switching
+    # is one application-wide polish pass rather than one per widget tree
+    DARK_STYLE = """
+        QMainWindow, QDialog {
+            background-color: #353535;
+        }
+        QTabWidget::pane {
+            border: 1px solid #6c6c6c;
+            border-radius: 8px;
+            top: -1px;
+        }
+        QTabBar::tab {
+            background-color: #2a2a2a;
+            color: #ffffff;
+            border: 1px solid #6c6c6c;
+            border-bottom: none;
+            border-top-left-radius: 6px;
+            border-top-right-radius: 6px;
+            padding: 6px 12px;
+            margin-right: 2px;
+        }
+        QTabBar::tab:selected {
+            background-color: #3a3a3a;
+            border-bottom: none;
+        }
+        QLineEdit, QPushButton, QListWidget {
+            border: 1px solid #6c6c6c;
+            border-radius: 6px;
+            padding: 3px;
+            background-color: #2a2a2a;
+            color: white;
+        }
+        QPushButton:hover {
+            background-color: #3a3a3a;
+        }
+        QToolBar {
+            background-color: #2a2a2a;
+            border-radius: 8px;
+        }
+        QStatusBar {
+            background-color: #2a2a2a;
+            color: white;
+        }
+    """
+    LIGHT_STYLE = """
+        QTabWidget::pane {
+            border: 1px solid #b5b5b5;
+            border-radius: 8px;
+            top: -1px;
+        }
+        QTabBar::tab {
+            background-color: #e6e6e6;
+            border: 1px solid #b5b5b5;
+            border-bottom: none;
+            border-top-left-radius: 6px;
+            border-top-right-radius: 6px;
+            padding: 6px 12px;
+            margin-right: 2px;
+        }
+        QTabBar::tab:selected {
+            background-color: #ffffff;
+            border-bottom: none;
+        }
+        QLineEdit, QPushButton, QListWidget {
+            border: 1px solid #b5b5b5;
+            border-radius: 6px;
+            padding: 3px;
+        }
+        QPushButton:hover {
+            background-color: #f0f0f0;
+        }
+        QToolBar {
+            border-radius: 8px;
+        }
+    """
+    
+    def __init__(self, app):
+        self.app = app
+        self.themes = {}
+        self.current = None
+    
+    def theme(self, name):
+        if name not in self.themes:
+            if name == "dark":
+                self.themes[name] = (self.dark_palette(), self.DARK_STYLE)
+            else:
+                self.themes[name] = (self.app.style().standardPalette(), self.LIGHT_STYLE)
+        return self.themes[name]
+    
+    def apply(self, name):
+        if name == self.current:
+            return
+        palette, style = self.theme(name)
+        self.app.setPalette(palette)
+        self.app.setStyleSheet(style)
+        self.current = name
+    
+    @staticmethod
+    def dark_palette():
         palette = QPalette()
         palette.setColor(QPalette.Window, QColor(53, 53, 53))
         palette.setColor(QPalette.WindowText, Qt.white)
@@ -159,232 +4223,681 @@ class DownloadManager(QDialog):
         palette.setColor(QPalette.Link, QColor(42, 130, 218))
         palette.setColor(QPalette.Highlight, QColor(42, 130, 218))
         palette.setColor(QPalette.HighlightedText, Qt.black)
-        self.setPalette(palette)
+        return palette
 
 
-class BookmarksManager(QDialog):
-    bookmarkSelected = Signal(str)
+class PageSlot:
+    # One pooled view. While a job loads, loaded holds its callback
+    def __init__(self, view, timer):
+        self.view = view
+        self.timer = timer
+        self.page = None
+        self.loaded = None
+        self.url = None
+        self.started = 0.0
+
+
+class PagePool(QObject):
+    # A fixed set of offscreen views, each with a CustomWebEnginePage on one
+    # shared profile and ad blocker, working through a queue of URLs. Pages
+    # are reused from job to job, so a URL costs a navigation rather than a
+    # new page. submit() calls loaded(slot, ok) once the page has loaded,
+    # failed or run out of time; the caller hands the slot back with
+    # release() when it has finished with the page
+    pdfPrinted = Signal(str, bool)
+    drained = Signal()
     
-    def __init__(self, settings, parent=None):
+    def __init__(self, profile, ad_blocker, size, viewport=QSize(1280, 800), timeout=30.0, parent=None):
         super().__init__(parent)
-        self.settings = settings
-        self.setWindowTitle("Bookmarks")
-        self.setMinimumSize(500, 300)
-        
-        # Apply dark theme
-        self.set_dark_theme()
-        
-        # Main layout
-        layout = QVBoxLayout(self)
-        
-        # Bookmarks list
-        self.bookmarks_list = QListWidget()
-        self.bookmarks_list.itemDoubleClicked.connect(self.open_bookmark)
-        layout.addWidget(self.bookmarks_list)
-        
-        # Bottom buttons
-        btn_layout = QHBoxLayout()
-        self.delete_btn = QPushButton("Delete")
-        self.delete_btn.clicked.connect(self.delete_bookmark)
-        self.close_btn = QPushButton("Close")
-        self.close_btn.clicked.connect(self.close)
-        
-        btn_layout.addWidget(self.delete_btn)
-        btn_layout.addStretch()
-        btn_layout.addWidget(self.close_btn)
-        
-        layout.addLayout(btn_layout)
-        
-        # Load bookmarks
-        self.load_bookmarks()
+        self.profile = profile
+        self.ad_blocker = ad_blocker
+        self.viewport = viewport
+        self.timeout = timeout
+        self.queue = deque()
+        self.slots = []
+        for _ in range(size):
+            view = QWebEngineView()
+            view.resize(viewport)
+            # Shown but never put on screen: a hidden view does not paint, so grab() would be empty
+            view.setAttribute(Qt.WA_DontShowOnScreen)
+            view.show()
+            timer = QTimer(self)
+            timer.setSingleShot(True)
+            slot = PageSlot(view, timer)
+            timer.timeout.connect(lambda slot=slot: self.timed_out(slot))
+            self.new_page(slot)
+            self.slots.append(slot)
+        self.idle = list(self.slots)
+    
+    def new_page(self, slot):
+        if slot.page is not None:
+            slot.page.deleteLater()
+        slot.page = CustomWebEnginePage(self.profile, slot.view, self.ad_blocker)
+        slot.page.loadFinished.connect(lambda ok, slot=slot, page=slot.page: self.load_finished(slot, page, ok))
+        slot.page.pdfPrintingFinished.connect(self.pdfPrinted)
+        slot.view.setPage(slot.page)
+    
+    def submit(self, url, loaded, tag=None):
+        self.queue.append((url, loaded, tag))
+        self.dispatch()
+    
+    def cancel(self, tag):
+        # Drops queued jobs submitted with this tag; jobs already loading finish
+        kept = deque(job for job in self.queue if job[2] != tag)
+        dropped = len(self.queue) - len(kept)
+        self.queue = kept
+        return dropped
+    
+    def dispatch(self):
+        while self.idle and self.queue:
+            slot = self.idle.pop()
+            slot.url, slot.loaded, _ = self.queue.popleft()
+            slot.started = time.monotonic()
+            slot.timer.start(int(self.timeout * 1000))
+            slot.page.load(QUrl(slot.url))
+    
+    def load_finished(self, slot, page, ok):
+        if page is not slot.page or slot.loaded is None:
+            return
+        slot.timer.stop()
+        loaded, slot.loaded = slot.loaded, None
+        loaded(slot, ok)
+    
+    def timed_out(self, slot):
+        # The abandoned load can still signal later, so the slot gets a fresh
+        # page rather than risk that being taken for the next job's
+        loaded, slot.loaded = slot.loaded, None
+        self.new_page(slot)
+        loaded(slot, False)
+    
+    def release(self, slot):
+        slot.url = None
+        self.idle.append(slot)
+        self.dispatch()
+        if not self.queue and len(self.idle) == len(self.slots):
+            self.drained.emit()
+    
+    def busy(self):
+        return len(self.slots) - len(self.idle)
+    
+    def close(self):
+        # Pages have to go before their profile
+        for slot in self.slots:
+            slot.timer.stop()
+            slot.view.deleteLater()
+        QApplication.sendPostedEvents(None, QEvent.DeferredDelete)
+
+
+class BatchRenderer(QObject):
+    # Renders a list of URLs through a PagePool to numbered PDF or PNG files
+    finished = Signal()
+    FORMATS = ("pdf", "png")
+    MAX_PAGE_HEIGHT = 16384
+    
+    def __init__(self, pool, urls, directory, output_format="pdf", full_page=False, settle=0.5, parent=None):
+        super().__init__(parent)
+        self.pool = pool
+        self.directory = directory
+        self.format = output_format
+        self.full_page = full_page
+        self.settle = settle
+        self.jobs = [(url, os.path.join(directory, self.file_name(index, url, output_format)))
+                     for index, url in enumerate(urls)]
+        self.pending = len(self.jobs)
+        self.failed = 0
+        self.printing = {}
+        pool.pdfPrinted.connect(self.pdf_printed)
+    
+    @staticmethod
+    def file_name(index, url, extension):
+        parts = urlsplit(url)
+        slug = re.sub(r"[^\w.-]+", "_", (parts.hostname or "") + parts.path).strip("_.")[:80]
+        return f"{index + 1:04d}-{slug or 'page'}.{extension}"
+    
+    def start(self):
+        os.makedirs(self.directory, exist_ok=True)
+        if not self.jobs:
+            QTimer.singleShot(0, self.finished.emit)
+        for url, path in self.jobs:
+            self.pool.submit(url, lambda slot, ok, path=path: self.loaded(slot, ok, path))
+    
+    def loaded(self, slot, ok, path):
+        if not ok:
+            self.done(slot, path, "failed to load or timed out")
+        elif self.format == "pdf":
+            self.printing[path] = slot
+            slot.page.printToPdf(path)
+        else:
+            if self.full_page:
+                height = min(int(slot.page.contentsSize().height()), self.MAX_PAGE_HEIGHT)
+                slot.view.resize(self.pool.viewport.width(), max(height, self.pool.viewport.height()))
+            # Give the compositor a moment to paint the loaded page before grabbing it
+            QTimer.singleShot(int(self.settle * 1000), lambda: self.grab(slot, path))
+    
+    def grab(self, slot, path):
+        saved = slot.view.grab().save(path)
+        slot.view.resize(self.pool.viewport)
+        self.done(slot, path, None if saved else "could not write the image")
+    
+    def pdf_printed(self, path, ok):
+        slot = self.printing.pop(path, None)
+        if slot is not None:
+            self.done(slot, path, None if ok else "printing failed")
+    
+    def done(self, slot, path, error):
+        elapsed = time.monotonic() - slot.started
+        if error:
+            self.failed += 1
+            log.warning("%s: %s", slot.url, error)
+        else:
+            log.info("%s -> %s (%.1f s)", slot.url, path, elapsed)
+        self.pool.release(slot)
+        self.pending -= 1
+        if not self.pending:
+            self.finished.emit()
+
+
+def viewport_size(text):
+    width, _, height = text.lower().partition("x")
+    if not (width.isdigit() and height.isdigit() and int(width) > 0 and int(height) > 0):
+        raise argparse.ArgumentTypeError(f"expected WIDTHxHEIGHT, got {text!r}")
+    return QSize(int(width), int(height))
+
+
+def render_urls(app, args):
+    # --render: no window, just a page pool working through the URL list.
+    # Returns the exit status: 1 if any URL failed
+    with open(args.render, encoding="utf-8") as url_file:
+        urls = [QUrl.fromUserInput(line.strip()).toString() for line in url_file
+                if line.strip() and not line.lstrip().startswith("#")]
+    settings = BrowserSettings(QSettings("ModernBrowser", "WebBrowser"))
+    browser_profile = BrowserProfile(settings, args.profile, args.ephemeral or None, app)
+    browser_profile.profile.settings().setAttribute(QWebEngineSettings.ShowScrollBars, False)
+    ad_blocker = AdBlocker()
+    ad_blocker.enabled = settings.ad_blocker
+    
+    pool = PagePool(browser_profile.profile, ad_blocker, args.concurrency, args.viewport, args.timeout)
+    renderer = BatchRenderer(pool, urls, args.out, args.format, args.full_page)
+    renderer.finished.connect(app.quit)
+    renderer.start()
+    app.exec()
+    pool.close()
+    log.info("Rendered %d of %d pages", len(urls) - renderer.failed, len(urls))
+    return 1 if renderer.failed else 0
+
+
+def once(signal, callback):
+    # Connects callback for the next emission only
+    def handler(*args):
+        signal.disconnect(handler)
+        callback(*args)
+    signal.connect(handler)
+
+
+def settle(future, value=None, error=None):
+    # Completes a future from the Qt thread; the waiting thread may have given up already
+    try:
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(value)
+    except InvalidStateError:
+        pass
+
+
+class AutomationBusy(Exception):
+    pass
+
+
+class AutomationGone(LookupError):
+    # An id that existed once but has since been dropped
+    pass
+
+
+class AutomationBridge(QObject):
+    # Hands calls from HTTP threads to the Qt thread. Calls wait in a bounded
+    # queue: a caller blocks for up to PUT_TIMEOUT for room and is then turned
+    # away, so a flood of requests backs up in the clients rather than in
+    # memory. The Qt thread drains the queue in slices of at most SLICE_MS
+    # and yields to the event loop between them, keeping painting and input
+    # responsive however many calls are waiting. A call is function(future)
+    # and completes the future itself, possibly later from a Qt callback
+    MAX_PENDING = 1000
+    PUT_TIMEOUT = 1.0
+    SLICE_MS = 8
+    wake = Signal()
     
-    def load_bookmarks(self):
-        self.bookmarks_list.clear()
-        size = self.settings.beginReadArray("bookmarks")
-        
-        for i in range(size):
-            self.settings.setArrayIndex(i)
-            title = self.settings.value("title")
-            url = self.settings.value("url")
-            self.bookmarks_list.addItem(f"{title} - {url}")
-        
-        self.settings.endArray()
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.calls = queue.Queue(self.MAX_PENDING)
+        self.lock = threading.Lock()
+        self.scheduled = False
+        # Emitted from other threads, so delivered as a queued call on this one
+        self.wake.connect(self.drain)
     
-    def add_bookmark(self, title, url):
-        # Add to settings
-        size = self.settings.beginReadArray("bookmarks")
-        self.settings.endArray()
-        
-        self.settings.beginWriteArray("bookmarks", size + 1)
-        self.settings.setArrayIndex(size)
-        self.settings.setValue("title", title)
-        self.settings.setValue("url", url)
-        self.settings.endArray()
-        
-        # Add to list
-        self.bookmarks_list.addItem(f"{title} - {url}")
+    def call(self, function, timeout):
+        # From an HTTP thread: runs function on the Qt thread and waits for its result
+        future = Future()
+        try:
+            self.calls.put((function, future), timeout=self.PUT_TIMEOUT)
+        except queue.Full:
+            raise AutomationBusy()
+        with self.lock:
+            wake = not self.scheduled
+            self.scheduled = True
+        if wake:
+            self.wake.emit()
+        try:
+            return future.result(timeout)
+        except FutureTimeout:
+            future.cancel()
+            raise
     
-    def delete_bookmark(self):
-        current_row = self.bookmarks_list.currentRow()
-        if current_row >= 0:
-            # Remove from list
-            self.bookmarks_list.takeItem(current_row)
-            
-            # Rebuild settings
-            bookmarks = []
-            size = self.settings.beginReadArray("bookmarks")
-            
-            for i in range(size):
-                if i != current_row:
-                    self.settings.setArrayIndex(i)
-                    title = self.settings.value("title")
-                    url = self.settings.value("url")
-                    bookmarks.append((title, url))
-            
-            self.settings.endArray()
-            
-            # Write back
-            self.settings.beginWriteArray("bookmarks", len(bookmarks))
-            for i, (title, url) in enumerate(bookmarks):
-                self.settings.setArrayIndex(i)
-                self.settings.setValue("title", title)
-                self.settings.setValue("url", url)
-            self.settings.endArray()
-    
-    def open_bookmark(self, item):
-        # Extract URL from item text
-        url = item.text().split(" - ")[1]
-        self.bookmarkSelected.emit(url)
-        self.close()
+    def drain(self):
+        deadline = time.perf_counter() + self.SLICE_MS / 1000
+        while time.perf_counter() < deadline:
+            try:
+                function, future = self.calls.get_nowait()
+            except queue.Empty:
+                break
+            if not future.set_running_or_notify_cancel():
+                # The caller stopped waiting before its turn came
+                continue
+            try:
+                function(future)
+            except Exception as error:
+                settle(future, error=error)
+        with self.lock:
+            if self.calls.empty():
+                self.scheduled = False
+                return
+        QTimer.singleShot(0, self.drain)
+
+
+class AutomationBatch:
+    # URLs spread over the automation page pool, with one result per URL
+    def __init__(self, batch_id, urls, extract, script):
+        self.id = batch_id
+        self.urls = urls
+        self.extract = extract
+        self.script = script
+        self.results = [None] * len(urls)
+        self.finished = 0
+        self.cancelled = False
+        self.done_at = None
     
-    def set_dark_theme(self):
-        # Set dark palette
-        palette = QPalette()
-        palette.setColor(QPalette.Window, QColor(53, 53, 53))
-        palette.setColor(QPalette.WindowText, Qt.white)
-        palette.setColor(QPalette.Base, QColor(25, 25, 25))
-        palette.setColor(QPalette.AlternateBase, QColor(53, 53, 53))
-        palette.setColor(QPalette.ToolTipBase, Qt.white)
-        palette.setColor(QPalette.ToolTipText, Qt.white)
-        palette.setColor(QPalette.Text, Qt.white)
-        palette.setColor(QPalette.Button, QColor(53, 53, 53))
-        palette.setColor(QPalette.ButtonText, Qt.white)
-        palette.setColor(QPalette.BrightText, Qt.red)
-        palette.setColor(QPalette.Link, QColor(42, 130, 218))
-        palette.setColor(QPalette.Highlight, QColor(42, 130, 218))
-        palette.setColor(QPalette.HighlightedText, Qt.black)
-        self.setPalette(palette)
+    def done(self):
+        return self.cancelled or self.finished == len(self.urls)
+    
+    def status(self, include_results=True):
+        status = {"id": self.id, "total": len(self.urls), "finished": self.finished,
+                  "done": self.done(), "cancelled": self.cancelled}
+        if include_results:
+            status["results"] = [result for result in self.results if result is not None]
+        return status
 
 
-class SettingsDialog(QDialog):
-    settingsChanged = Signal()
+class AutomationServer(QObject):
+    # Optional localhost-only HTTP API for driving the browser in bulk
+    # (--automation-port). Every request needs the bearer token written to
+    # automation.token in the data directory, and a Host of 127.0.0.1 or
+    # localhost, so neither web pages nor DNS rebinding can reach it.
+    # Requests are served on HTTP threads and each one runs on the Qt thread
+    # through the AutomationBridge. Batches load on a PagePool of their own,
+    # so they never touch the user's tabs. A finished batch is dropped once
+    # its results have been fetched, or after BATCH_TTL seconds, and at most
+    # MAX_FINISHED are kept; dropped ids answer 410
+    DEFAULT_TIMEOUT = 30.0
+    MAX_TIMEOUT = 600.0
+    BATCH_PAGES = 4
+    MAX_BATCH = 10000
+    BATCH_TTL = 600.0
+    MAX_FINISHED = 20
+    EXTRACT = ("none", "html", "text")
     
-    def __init__(self, settings, parent=None):
+    def __init__(self, browser, port, parent=None):
         super().__init__(parent)
-        self.settings = settings
-        self.setWindowTitle("Settings")
-        self.setMinimumSize(400, 300)
+        self.browser = browser
+        self.port = port
+        self.bridge = AutomationBridge(self)
+        self.token = secrets.token_urlsafe(32)
+        self.token_path = app_data_path("automation.token")
+        self.pool = None
+        self.batches = {}
+        self.last_batch_id = 0
+        self.server = None
+    
+    def start(self):
+        # Flask is optional; without it the browser simply runs without the API
+        try:
+            from werkzeug.serving import make_server
+        except ImportError:
+            log.warning("Flask is not installed; the automation API is disabled")
+            return False
+        self.server = make_server("127.0.0.1", self.port, self.create_app(), threaded=True)
+        os.makedirs(os.path.dirname(self.token_path), exist_ok=True)
+        fd = os.open(self.token_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w") as token_file:
+            token_file.write(self.token)
+        threading.Thread(target=self.server.serve_forever, name="automation-http", daemon=True).start()
+        log.info("Automation API on http://127.0.0.1:%d/ (token in %s)", self.server.port, self.token_path)
+        return True
+    
+    def stop(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server = None
+        if self.pool is not None:
+            self.pool.close()
+            self.pool = None
+    
+    def create_app(self):
+        import flask
+        app = flask.Flask("arcweb-automation")
         
-        # Apply dark theme
-        self.set_dark_theme()
+        @app.before_request
+        def check_caller():
+            if urlsplit("//" + flask.request.host).hostname not in ("127.0.0.1", "localhost"):
+                return self.respond({"error": "forbidden host"}, 403)
+            expected = f"Bearer {self.token}"
+            if not hmac.compare_digest(flask.request.headers.get("Authorization", ""), expected):
+                return self.respond({"error": "missing or wrong token"}, 401)
         
-        # Main layout
-        layout = QVBoxLayout(self)
+        def body():
+            return flask.request.get_json(silent=True) or {}
         
-        # Dark mode setting
-        self.dark_mode = QCheckBox("Dark Mode")
-        self.dark_mode.setChecked(self.settings.value("darkMode", True, type=bool))
-        layout.addWidget(self.dark_mode)
+        def timeout():
+            value = body().get("timeout", flask.request.args.get("timeout", self.DEFAULT_TIMEOUT))
+            try:
+                return min(max(float(value), 0.0), self.MAX_TIMEOUT)
+            except (TypeError, ValueError):
+                return self.DEFAULT_TIMEOUT
         
-        # Ad blocker setting
-        self.ad_blocker = QCheckBox("Enable Ad Blocker")
-        self.ad_blocker.setChecked(self.settings.value("adBlocker", True, type=bool))
-        layout.addWidget(self.ad_blocker)
+        @app.get("/tabs")
+        def list_tabs():
+            return self.run(self.list_tabs)
         
-        # Cursor lock setting
-        self.cursor_lock = QCheckBox("Enable Cursor Lock for Games")
-        self.cursor_lock.setChecked(self.settings.value("cursorLock", True, type=bool))
-        layout.addWidget(self.cursor_lock)
+        @app.post("/tabs")
+        def open_tab():
+            return self.run(self.open_tab, body().get("url"), bool(body().get("wait")), timeout=timeout())
         
-        # Home page setting
-        home_layout = QHBoxLayout()
-        home_layout.addWidget(QLabel("Home Page:"))
-        self.home_page = QLineEdit()
-        self.home_page.setText(self.settings.value("homePage", "https://www.google.com"))
-        home_layout.addWidget(self.home_page)
-        layout.addLayout(home_layout)
+        @app.delete("/tabs/<int:tab_id>")
+        def close_tab(tab_id):
+            return self.run(self.close_tab, tab_id)
         
-        # Download directory
-        download_layout = QHBoxLayout()
-        download_layout.addWidget(QLabel("Download Directory:"))
-        self.download_dir = QLineEdit()
-        self.download_dir.setText(self.settings.value("downloadDir", os.path.expanduser("~/Downloads")))
-        download_layout.addWidget(self.download_dir)
-        browse_btn = QPushButton("Browse")
-        browse_btn.clicked.connect(self.browse_directory)
-        download_layout.addWidget(browse_btn)
-        layout.addLayout(download_layout)
+        @app.post("/tabs/<int:tab_id>/navigate")
+        def navigate(tab_id):
+            return self.run(self.navigate, tab_id, body().get("url"), bool(body().get("wait")), timeout=timeout())
         
-        # Bottom buttons
-        btn_layout = QHBoxLayout()
-        self.save_btn = QPushButton("Save")
-        self.save_btn.clicked.connect(self.save_settings)
-        self.cancel_btn = QPushButton("Cancel")
-        self.cancel_btn.clicked.connect(self.close)
+        @app.post("/tabs/<int:tab_id>/wait")
+        def wait(tab_id):
+            return self.run(self.wait, tab_id, timeout=timeout())
         
-        btn_layout.addWidget(self.save_btn)
-        btn_layout.addStretch()
-        btn_layout.addWidget(self.cancel_btn)
+        @app.get("/tabs/<int:tab_id>/html")
+        def page_html(tab_id):
+            return self.run(self.page_content, tab_id, "html", timeout=timeout())
         
-        layout.addStretch()
-        layout.addLayout(btn_layout)
+        @app.get("/tabs/<int:tab_id>/text")
+        def page_text(tab_id):
+            return self.run(self.page_content, tab_id, "text", timeout=timeout())
+        
+        @app.post("/tabs/<int:tab_id>/js")
+        def run_javascript(tab_id):
+            return self.run(self.run_javascript, tab_id, body().get("script"), timeout=timeout())
+        
+        @app.post("/batches")
+        def submit_batch():
+            request = body()
+            return self.run(self.submit_batch, request.get("urls"), request.get("extract", "text"),
+                            request.get("script"))
+        
+        @app.get("/batches/<int:batch_id>")
+        def batch_status(batch_id):
+            return self.run(self.batch_status, batch_id, flask.request.args.get("results", "1") != "0")
+        
+        @app.delete("/batches/<int:batch_id>")
+        def cancel_batch(batch_id):
+            return self.run(self.cancel_batch, batch_id)
+        
+        return app
     
-    def browse_directory(self):
-        directory = QFileDialog.getExistingDirectory(self, "Select Download Directory")
-        if directory:
-            self.download_dir.setText(directory)
+    @staticmethod
+    def respond(payload, status=200, headers=None):
+        # JavaScript results can hold anything; what JSON cannot encode is sent as text
+        import flask
+        return flask.Response(json.dumps(payload, default=str), status, headers, mimetype="application/json")
     
-    def save_settings(self):
-        self.settings.setValue("darkMode", self.dark_mode.isChecked())
-        self.settings.setValue("adBlocker", self.ad_blocker.isChecked())
-        self.settings.setValue("cursorLock", self.cursor_lock.isChecked())
-        self.settings.setValue("homePage", self.home_page.text())
-        self.settings.setValue("downloadDir", self.download_dir.text())
-        self.settingsChanged.emit()
-        self.close()
+    def run(self, function, *args, timeout=DEFAULT_TIMEOUT):
+        # On an HTTP thread: run function(future, *args) on the Qt thread and answer with its result
+        try:
+            result = self.bridge.call(lambda future: function(future, *args), timeout)
+        except AutomationBusy:
+            return self.respond({"error": "too many requests queued"}, 503, {"Retry-After": "1"})
+        except FutureTimeout:
+            return self.respond({"error": "timed out"}, 504)
+        except AutomationGone as error:
+            return self.respond({"error": str(error)}, 410)
+        except LookupError as error:
+            return self.respond({"error": str(error)}, 404)
+        except ValueError as error:
+            return self.respond({"error": str(error)}, 400)
+        return self.respond(result)
     
-    def set_dark_theme(self):
-        # Set dark palette
-        palette = QPalette()
-        palette.setColor(QPalette.Window, QColor(53, 53, 53))
-        palette.setColor(QPalette.WindowText, Qt.white)
-        palette.setColor(QPalette.Base, QColor(25, 25, 25))
-        palette.setColor(QPalette.AlternateBase, QColor(53, 53, 53))
-        palette.setColor(QPalette.ToolTipBase, Qt.white)
-        palette.setColor(QPalette.ToolTipText, Qt.white)
-        palette.setColor(QPalette.Text, Qt.white)
-        palette.setColor(QPalette.Button, QColor(53, 53, 53))
-        palette.setColor(QPalette.ButtonText, Qt.white)
-        palette.setColor(QPalette.BrightText, Qt.red)
-        palette.setColor(QPalette.Link, QColor(42, 130, 218))
-        palette.setColor(QPalette.Highlight, QColor(42, 130, 218))
-        palette.setColor(QPalette.HighlightedText, Qt.black)
-        self.setPalette(palette)
+    # Everything below runs on the Qt thread
+    
+    def tab_index(self, tab_id):
+        tabs = self.browser.tabs
+        for index in range(tabs.count()):
+            if tabs.widget(index).tab_id == tab_id:
+                return index
+        raise LookupError(f"no tab {tab_id}")
+    
+    def find_tab(self, tab_id):
+        # The view for a tab id, created first if the tab is a restored placeholder
+        index = self.tab_index(tab_id)
+        widget = self.browser.tabs.widget(index)
+        if isinstance(widget, TabPlaceholder):
+            widget = self.browser.materialize_tab(index)
+        return widget
+    
+    @staticmethod
+    def page_url(url):
+        if not isinstance(url, str) or not url.strip():
+            raise ValueError("a url is required")
+        return QUrl.fromUserInput(url.strip())
+    
+    def list_tabs(self, future):
+        tabs = []
+        for index in range(self.browser.tabs.count()):
+            widget = self.browser.tabs.widget(index)
+            if isinstance(widget, TabPlaceholder):
+                tabs.append({"id": widget.tab_id, "url": widget.url, "title": widget.title, "loading": False})
+            else:
+                tabs.append({"id": widget.tab_id, "url": widget.url().toString(),
+                             "title": widget.page().title(), "loading": widget.loading})
+        settle(future, {"tabs": tabs})
+    
+    def open_tab(self, future, url, wait):
+        url = self.page_url(url)
+        view = self.browser.add_new_tab(url.toString())
+        self.finish_load(future, view, wait, {"id": view.tab_id})
+    
+    def close_tab(self, future, tab_id):
+        # Closing the last tab loads the home page in it instead, as in the UI
+        self.browser.close_tab(self.tab_index(tab_id))
+        settle(future, {"id": tab_id})
+    
+    def navigate(self, future, tab_id, url, wait):
+        view = self.find_tab(tab_id)
+        url = self.page_url(url)
+        if wait:
+            self.wait_for_navigation(view.page(), url, lambda ok: settle(future, {"id": tab_id, "ok": ok}))
+        view.load(url)
+        if not wait:
+            settle(future, {"id": tab_id})
+    
+    def wait(self, future, tab_id):
+        self.finish_load(future, self.find_tab(tab_id), True, {"id": tab_id})
+    
+    @staticmethod
+    def wait_for_navigation(page, url, callback):
+        # Calls callback(ok) when the load of url ends. A load still in flight
+        # when the navigation starts ends as aborted, possibly after it; that
+        # and any other load's result is ignored. Redirects keep the load going,
+        # so once ours has started, success under another URL counts too
+        Status = QWebEngineLoadingInfo.LoadStatus
+        requested = url.adjusted(QUrl.StripTrailingSlash)
+        started = []
+        
+        def changed(info):
+            if info.status() == Status.LoadStartedStatus:
+                if not started and info.url().adjusted(QUrl.StripTrailingSlash) == requested:
+                    started.append(info.url())
+                return
+            if not started:
+                return
+            ok = info.status() == Status.LoadSucceededStatus
+            if ok or info.url() == started[0]:
+                page.loadingChanged.disconnect(changed)
+                callback(ok)
+        page.loadingChanged.connect(changed)
+    
+    @staticmethod
+    def finish_load(future, view, wait, result):
+        # Settles now, or once the view's current load has finished
+        if wait and view.loading:
+            once(view.page().loadFinished, lambda ok: settle(future, dict(result, ok=ok)))
+        else:
+            settle(future, result)
+    
+    def page_content(self, future, tab_id, kind):
+        page = self.find_tab(tab_id).page()
+        if kind == "html":
+            page.toHtml(lambda html: settle(future, {"id": tab_id, "html": html}))
+        else:
+            page.toPlainText(lambda text: settle(future, {"id": tab_id, "text": text}))
+    
+    def run_javascript(self, future, tab_id, script):
+        if not isinstance(script, str):
+            raise ValueError("a script is required")
+        page = self.find_tab(tab_id).page()
+        page.runJavaScript(script, QWebEngineScript.ScriptWorldId.MainWorld,
+                           lambda result: settle(future, {"id": tab_id, "result": result}))
+    
+    def submit_batch(self, future, urls, extract, script):
+        if not isinstance(urls, list) or not urls or not all(isinstance(url, str) for url in urls):
+            raise ValueError("urls must be a non-empty list of strings")
+        if len(urls) > self.MAX_BATCH:
+            raise ValueError(f"at most {self.MAX_BATCH} urls per batch")
+        if extract not in self.EXTRACT:
+            raise ValueError(f"extract must be one of {', '.join(self.EXTRACT)}")
+        if script is not None and not isinstance(script, str):
+            raise ValueError("script must be a string")
+        if self.pool is None:
+            self.pool = PagePool(self.browser.profile, self.browser.ad_blocker, self.BATCH_PAGES,
+                                 timeout=self.DEFAULT_TIMEOUT, parent=self)
+        self.prune_batches()
+        self.last_batch_id += 1
+        batch = AutomationBatch(self.last_batch_id, [self.page_url(url).toString() for url in urls],
+                                extract, script)
+        self.batches[batch.id] = batch
+        for index, url in enumerate(batch.urls):
+            self.pool.submit(url, lambda slot, ok, batch=batch, index=index: self.batch_loaded(batch, index, slot, ok),
+                             batch.id)
+        settle(future, batch.status(include_results=False))
+    
+    def batch_loaded(self, batch, index, slot, ok):
+        result = {"url": batch.urls[index], "ok": ok}
+        if not ok or batch.cancelled:
+            self.batch_result(batch, index, slot, result)
+        elif batch.script is not None:
+            slot.page.runJavaScript(batch.script, QWebEngineScript.ScriptWorldId.MainWorld,
+                                    lambda value: self.batch_extract(batch, index, slot, dict(result, result=value)))
+        else:
+            self.batch_extract(batch, index, slot, result)
+    
+    def batch_extract(self, batch, index, slot, result):
+        if batch.extract == "html":
+            slot.page.toHtml(lambda html: self.batch_result(batch, index, slot, dict(result, html=html)))
+        elif batch.extract == "text":
+            slot.page.toPlainText(lambda text: self.batch_result(batch, index, slot, dict(result, text=text)))
+        else:
+            self.batch_result(batch, index, slot, result)
+    
+    def batch_result(self, batch, index, slot, result):
+        batch.results[index] = result
+        batch.finished += 1
+        if batch.done() and batch.done_at is None:
+            batch.done_at = time.monotonic()
+        self.pool.release(slot)
+    
+    def prune_batches(self):
+        # Finished batches hold every page's html or text; keep them briefly and few
+        now = time.monotonic()
+        finished = [batch for batch in self.batches.values() if batch.done_at is not None]
+        for count, batch in enumerate(sorted(finished, key=lambda batch: batch.done_at, reverse=True)):
+            if count >= self.MAX_FINISHED or now - batch.done_at > self.BATCH_TTL:
+                del self.batches[batch.id]
+    
+    def find_batch(self, batch_id):
+        self.prune_batches()
+        batch = self.batches.get(batch_id)
+        if batch is not None:
+            return batch
+        if 0 < batch_id <= self.last_batch_id:
+            raise AutomationGone(f"batch {batch_id} has expired")
+        raise LookupError(f"no batch {batch_id}")
+    
+    def batch_status(self, future, batch_id, include_results):
+        batch = self.find_batch(batch_id)
+        status = batch.status(include_results)
+        if include_results and batch.done():
+            # The results have been handed over; nothing else needs them
+            del self.batches[batch_id]
+        settle(future, status)
+    
+    def cancel_batch(self, future, batch_id):
+        # Queued URLs are dropped; the batch and its results so far are forgotten
+        batch = self.find_batch(batch_id)
+        del self.batches[batch_id]
+        batch.cancelled = True
+        dropped = self.pool.cancel(batch_id)
+        settle(future, dict(batch.status(include_results=False), dropped=dropped))
 
 
 class Browser(QMainWindow):
-    def __init__(self):
+    def __init__(self, urls=(), profile_name=None, ephemeral=None):
         super().__init__()
         
         # Initialize settings
-        self.settings = QSettings("ModernBrowser", "WebBrowser")
+        self.settings = BrowserSettings(QSettings("ModernBrowser", "WebBrowser"), self)
+        self.settings.changed.connect(self.setting_changed)
+        
+        # Creating the first profile starts the WebEngine core. The profile
+        # outlives the window, whose pages must be deleted before it
+        self.browser_profile = BrowserProfile(self.settings, profile_name, ephemeral, QApplication.instance())
+        self.browser_profile.siteCleared.connect(self.site_cleared)
+        self.profile = self.browser_profile.profile
+        startup.mark("WebEngine init")
+        
+        # Browsing history, also used for URL bar suggestions
+        self.history = HistoryStore(self.browser_profile.database("history"))
+        self.page_index = PageIndex(self.browser_profile.database("pages"))
         
         # Set window properties
         self.setWindowTitle("arkbrowser")
         self.setMinimumSize(1024, 768)
         
+        # Freeze idle background tabs
+        self.lifecycle = TabLifecycleManager(self.settings, self)
+        self.lifecycle.stateChanged.connect(self.update_tab_lifecycle)
+        
+        # Discard least recently used tabs when renderers exceed the memory budget
+        self.memory_governor = MemoryGovernor(self.settings, self.lifecycle, self)
+        
         # Set up ad blocker
         self.ad_blocker = AdBlocker(self)
+        self.ad_blocker.filtersReloaded.connect(self.filters_reloaded)
         
         # Create a central widget and layout
         self.central_widget = QWidget()
@@ -400,6 +4913,7 @@ class Browser(QMainWindow):
         self.tabs.setDocumentMode(True)
         self.tabs.tabCloseRequested.connect(self.close_tab)
         self.tabs.currentChanged.connect(self.tab_changed)
+        self.tabs.tabBar().tabMoved.connect(self.tab_moved)
         
         # Style the tab bar
         tab_bar = self.tabs.tabBar()
@@ -423,22 +4937,97 @@ class Browser(QMainWindow):
         self.progress_bar.setVisible(False)
         self.status_bar.addPermanentWidget(self.progress_bar)
         
-        # Initialize download manager
-        self.download_manager = DownloadManager(self)
+        # Blocked request count for the current tab, refreshed once a second
+        self.blocked_label = QLabel()
+        self.status_bar.addPermanentWidget(self.blocked_label)
+        self.stats_timer = QTimer(self)
+        self.stats_timer.setInterval(1000)
+        self.stats_timer.timeout.connect(self.update_request_stats)
+        self.stats_timer.start()
         
-        # Initialize bookmarks manager
-        self.bookmarks_manager = BookmarksManager(self.settings, self)
-        self.bookmarks_manager.bookmarkSelected.connect(self.navigate_to_url)
+        # Every download goes through one scheduler, connected once for the shared profile
+        self.download_scheduler = DownloadScheduler(self.settings, self.profile,
+                                                    self.browser_profile.path("downloads.json"), self)
+        self.profile.downloadRequested.connect(self.handle_download)
+        self.segmented_bypass = set()
+        
+        # Dialogs are built the first time they are opened, not before the first paint
+        self._download_manager = None
+        self._bookmarks_manager = None
+        self._page_search = None
+        self._task_manager = None
         
         # Apply theme based on settings - after all UI elements are created
+        self.theme = ThemeEngine(QApplication.instance())
         self.apply_theme()
         
         # Enable ad blocker if set in settings
-        if self.settings.value("adBlocker", True, type=bool):
-            QWebEngineProfile.defaultProfile().setUrlRequestInterceptor(self.ad_blocker)
+        self.ad_blocker.enabled = self.settings.ad_blocker
+        
+        # Attributes every page inherits from the profile
+        self.apply_web_settings()
         
-        # Create first tab
-        self.add_new_tab()
+        # Reopen the last session, or start with a single tab
+        self.tab_ids = itertools.count(1)
+        self.restoring_session = False
+        self.session = SessionStore(self.browser_profile.path("session"))
+        restored = self.settings.restore_session and self.restore_session()
+        for url in urls:
+            self.add_new_tab(QUrl.fromUserInput(url).toString())
+        if not (restored or urls):
+            self.add_new_tab()
+        
+        # Work that can wait until the window is on screen
+        self.painted = False
+        
+        # Fold the journal into a snapshot once a minute
+        self.session_timer = QTimer(self)
+        self.session_timer.setInterval(60000)
+        self.session_timer.timeout.connect(self.save_session_if_changed)
+        self.session_timer.start()
+    
+    @property
+    def download_manager(self):
+        if self._download_manager is None:
+            self._download_manager = DownloadManager(self.download_scheduler, self)
+        return self._download_manager
+    
+    @property
+    def bookmarks_manager(self):
+        if self._bookmarks_manager is None:
+            store = BookmarkStore(self.browser_profile.database("bookmarks"))
+            if self.browser_profile.path() == app_data_path():
+                # One-time move of the list older versions kept in QSettings
+                store.migrate_settings(self.settings.store)
+            self._bookmarks_manager = BookmarksManager(store, self)
+            self._bookmarks_manager.bookmarkSelected.connect(self.navigate_to_url)
+        return self._bookmarks_manager
+    
+    @property
+    def page_search(self):
+        # Full-text search over visited pages
+        if self._page_search is None:
+            self._page_search = PageSearchDialog(self.page_index, self)
+            self._page_search.pageSelected.connect(self.add_new_tab)
+        return self._page_search
+    
+    @property
+    def task_manager(self):
+        if self._task_manager is None:
+            self._task_manager = TaskManager(self, self)
+        return self._task_manager
+    
+    def paintEvent(self, event):
+        super().paintEvent(event)
+        if not self.painted:
+            self.painted = True
+            startup.mark("first paint")
+            QTimer.singleShot(0, self.finish_startup)
+    
+    def finish_startup(self):
+        # Pick up downloads still queued when the browser last closed; this
+        # may create a hidden page, so it waits until after the first paint
+        self.download_scheduler.restore()
     
     def create_navigation_bar(self):
         # Create toolbar
@@ -483,6 +5072,14 @@ class Browser(QMainWindow):
         self.url_bar.setPlaceholderText("Enter URL or search term...")
         self.url_bar.returnPressed.connect(self.navigate_to_url)
         self.url_bar.setStyleSheet("QLineEdit { border-radius: 15px; padding: 5px 10px; }")
+        
+        # Suggestions from history, ranked by frecency rather than filtered by the completer
+        self.url_suggestions = QStringListModel(self)
+        self.url_completer = QCompleter(self.url_suggestions, self)
+        self.url_completer.setCompletionMode(QCompleter.UnfilteredPopupCompletion)
+        self.url_completer.activated.connect(self.navigate_to_url)
+        self.url_bar.setCompleter(self.url_completer)
+        self.url_bar.textEdited.connect(self.update_url_suggestions)
         self.navbar.addSeparator()
         self.navbar.addWidget(self.url_bar)
         
@@ -496,18 +5093,39 @@ class Browser(QMainWindow):
         self.bookmarks_btn.triggered.connect(self.show_bookmarks)
         self.navbar.addAction(self.bookmarks_btn)
         
+        # Search visited pages
+        self.page_search_btn = QAction(QIcon.fromTheme("edit-find"), "Search History", self)
+        self.page_search_btn.setShortcut("Ctrl+H")
+        self.page_search_btn.triggered.connect(self.show_page_search)
+        self.navbar.addAction(self.page_search_btn)
+        
         # Downloads button
         self.downloads_btn = QAction(QIcon.fromTheme("document-save"), "Downloads", self)
         self.downloads_btn.triggered.connect(self.show_downloads)
         self.navbar.addAction(self.downloads_btn)
         
+        # Per-tab CPU, memory and requests
+        self.task_manager_btn = QAction(QIcon.fromTheme("utilities-system-monitor"), "Task Manager", self)
+        self.task_manager_btn.setShortcut("Shift+Esc")
+        self.task_manager_btn.triggered.connect(self.show_task_manager)
+        self.navbar.addAction(self.task_manager_btn)
+        
         # Ad blocker toggle
         self.ad_block_btn = QAction(QIcon.fromTheme("security-high"), "Ad Blocker", self)
         self.ad_block_btn.setCheckable(True)
-        self.ad_block_btn.setChecked(self.settings.value("adBlocker", True, type=bool))
+        self.ad_block_btn.setChecked(self.settings.ad_blocker)
         self.ad_block_btn.triggered.connect(self.toggle_ad_blocker)
         self.navbar.addAction(self.ad_block_btn)
         
+        # Network capture for the current tab, saved as HAR
+        self.record_btn = QAction(QIcon.fromTheme("media-record"), "Record Network Activity", self)
+        self.record_btn.setCheckable(True)
+        self.record_btn.triggered.connect(self.toggle_recording)
+        self.navbar.addAction(self.record_btn)
+        self.export_har_btn = QAction(QIcon.fromTheme("document-export"), "Export HAR", self)
+        self.export_har_btn.triggered.connect(self.export_har)
+        self.navbar.addAction(self.export_har_btn)
+        
         # Settings button
         self.settings_btn = QAction(QIcon.fromTheme("preferences-system"), "Settings", self)
         self.settings_btn.triggered.connect(self.show_settings)
@@ -520,33 +5138,96 @@ class Browser(QMainWindow):
         self.navbar.addAction(self.new_tab_btn)
         
     def toggle_ad_blocker(self):
+        # setting_changed swaps the interceptors
         is_enabled = self.ad_block_btn.isChecked()
-        self.settings.setValue("adBlocker", is_enabled)
-        
+        self.settings.ad_blocker = is_enabled
         if is_enabled:
-            QWebEngineProfile.defaultProfile().setUrlRequestInterceptor(self.ad_blocker)
             self.status_bar.showMessage("Ad blocker enabled", 3000)
         else:
-            QWebEngineProfile.defaultProfile().setUrlRequestInterceptor(None)
             self.status_bar.showMessage("Ad blocker disabled", 3000)
         
         # Reload current page to apply changes
         self.current_browser().reload()
     
-    def add_new_tab(self, url=None):
-        if not url:
-            url = self.settings.value("homePage", "https://www.google.com")
+    def toggle_recording(self, checked):
+        browser = self.current_browser()
+        if not isinstance(browser, QWebEngineView):
+            self.record_btn.setChecked(False)
+            return
+        browser.page().set_recording(checked)
+        if checked:
+            self.status_bar.showMessage("Recording network activity for this tab", 3000)
+        else:
+            self.status_bar.showMessage("Stopped recording network activity", 3000)
+    
+    def export_har(self):
+        browser = self.current_browser()
+        if not isinstance(browser, QWebEngineView) or browser.page().recorder is None:
+            self.status_bar.showMessage("Turn on network recording for this tab first", 3000)
+            return
+        name = f"{browser.url().host() or 'page'}.har"
+        path, _ = QFileDialog.getSaveFileName(self, "Export HAR", os.path.join(self.settings.download_dir, name),
+                                              "HAR files (*.har)")
+        if path:
+            # Take the timings the page has buffered since the last collection first
+            browser.page().collect_timings(lambda recorder: self.write_har(recorder, path))
+    
+    def write_har(self, recorder, path):
+        with open(path, "w", encoding="utf-8") as har_file:
+            json.dump(recorder.har(), har_file, indent=2)
+        self.status_bar.showMessage(f"Saved {len(recorder.requests)} requests to {path}", 3000)
+    
+    def tab_request_stats(self, browser=None):
+        # Allowed/blocked counts for a tab (the current one by default)
+        browser = browser or self.current_browser()
+        if not isinstance(browser, QWebEngineView):
+            # Restored tabs that were never opened have no page yet
+            return None
+        return getattr(browser.page(), "request_stats", None)
+    
+    def host_request_stats(self):
+        # Allowed/blocked counts per request host, summed over all open tabs
+        totals = {}
+        for i in range(self.tabs.count()):
+            stats = self.tab_request_stats(self.tabs.widget(i))
+            if stats is None:
+                continue
+            for host, (allowed, blocked) in stats.hosts.items():
+                counts = totals.setdefault(host, [0, 0])
+                counts[0] += allowed
+                counts[1] += blocked
+        return totals
+    
+    def update_request_stats(self):
+        stats = self.tab_request_stats()
+        if stats is None:
+            return
+        self.blocked_label.setText(f"{stats.blocked} blocked")
         
+        lines = [f"Allowed: {stats.allowed}  Blocked: {stats.blocked}"]
+        lines += [f"{host}: {count}" for host, count in stats.top_blocked()]
+        cache = self.ad_blocker.decisions.stats()
+        lines.append(f"Decision cache: {cache['size']}/{cache['capacity']}, "
+                     f"{cache['hit_rate']:.0%} hits, {cache['evictions']} evictions")
+        self.blocked_label.setToolTip("\n".join(lines))
+    
+    def filters_reloaded(self):
+        stats = self.ad_blocker.reload_stats()
+        self.status_bar.showMessage(
+            f"Filter lists reloaded: {stats['rules']} rules in {stats['build_ms']:.0f} ms "
+            f"({stats['cache_bytes'] / 1024:.0f} KiB compiled)", 5000)
+    
+    def create_browser_view(self, tab_id=None):
         # Create web view
         browser = QWebEngineView()
+        browser.tab_id = tab_id or next(self.tab_ids)
         
         # Create custom page with enhanced settings
-        custom_page = CustomWebEnginePage(QWebEngineProfile.defaultProfile(), browser)
+        custom_page = CustomWebEnginePage(self.profile, browser, self.ad_blocker)
         browser.setPage(custom_page)
         
-        # Enable cursor lock for games
-        if self.settings.value("cursorLock", True, type=bool):
-            browser.page().featurePermissionRequested.connect(self.handle_permission_request)
+        # Enable cursor lock for games; the handler checks the setting on each request
+        browser.page().featurePermissionRequested.connect(self.handle_permission_request)
         
         # Connect signals
         browser.page().titleChanged.connect(lambda title, browser=browser: 
@@ -554,37 +5235,155 @@ class Browser(QMainWindow):
         browser.page().urlChanged.connect(lambda url, browser=browser: 
                                          self.update_url_bar(url, browser))
         browser.page().loadProgress.connect(self.update_progress)
+        browser.loading = False
+        browser.page().loadStarted.connect(lambda browser=browser: setattr(browser, "loading", True))
+        browser.page().loadFinished.connect(lambda ok, browser=browser: setattr(browser, "loading", False))
         browser.page().loadFinished.connect(lambda: self.progress_bar.setVisible(False))
+        browser.page().loadFinished.connect(lambda ok, browser=browser: self.index_page_text(browser, ok))
+        browser.page().loadFinished.connect(lambda: startup.mark("first loadFinished"))
+        
+        # Record visits for history and URL bar suggestions. Fragment and pushState
+        # changes stay in the same document and finish no load, so they are not visits
+        browser.page().loadFinished.connect(lambda ok, browser=browser: self.record_visit(browser, ok))
+        browser.page().titleChanged.connect(lambda title, browser=browser:
+                                           self.history.record_title(browser.url().toString(), title))
+        
+        # Journal navigation so the session survives a crash
+        browser.page().urlChanged.connect(lambda url, browser=browser:
+                                         self.record_session({"type": "navigate", "id": browser.tab_id,
+                                                              "url": url.toString()}))
+        browser.page().titleChanged.connect(lambda title, browser=browser:
+                                           self.record_session({"type": "title", "id": browser.tab_id,
+                                                                "title": title}))
+        
+        # Track idle time so the tab can be frozen in the background
+        self.lifecycle.track(browser)
+        startup.mark("first tab created")
+        
+        # Update URL bar when tab is switched
+        browser.urlChanged.connect(lambda url, browser=browser: 
+                                  self.update_url_bar(url, browser))
+        return browser
+    
+    def add_new_tab(self, url=None):
+        if not url:
+            url = self.settings.home_page
         
-        # Handle downloads
-        profile = QWebEngineProfile.defaultProfile()
-        profile.downloadRequested.connect(self.handle_download)
+        browser = self.create_browser_view()
         
         # Load the URL
         browser.load(QUrl(url))
         
         # Add browser to tabs
         index = self.tabs.addTab(browser, "New Tab")
+        self.record_session({"type": "open", "id": browser.tab_id, "url": url, "index": index})
         self.tabs.setCurrentIndex(index)
         
-        # Update URL bar when tab is switched
-        browser.urlChanged.connect(lambda url, browser=browser: 
-                                  self.update_url_bar(url, browser))
-        
         # Focus URL bar when new tab is added
         self.url_bar.setFocus()
         
         return browser
+    
+    def tab_moved(self, old_index, new_index):
+        browser = self.tabs.widget(new_index)
+        self.record_session({"type": "move", "id": browser.tab_id, "index": new_index})
+    
+    def record_session(self, event):
+        if self.restoring_session:
+            return
+        self.session.record(event)
+        if self.session.needs_compaction():
+            self.save_session()
+    
+    def save_session(self):
+        tabs = []
+        for i in range(self.tabs.count()):
+            widget = self.tabs.widget(i)
+            if isinstance(widget, TabPlaceholder):
+                tabs.append({"id": widget.tab_id, "url": widget.url, "title": widget.title,
+                             "history": widget.history})
+            else:
+                tabs.append({"id": widget.tab_id, "url": widget.url().toString(),
+                             "title": widget.page().title(), "history": serialize_history(widget.history())})
+        current = self.tabs.currentWidget()
+        self.session.compact(tabs, current.tab_id if current is not None else None)
+    
+    def save_session_if_changed(self):
+        if self.session.pending:
+            self.save_session()
+    
+    def closeEvent(self, event):
+        # Final snapshot so the next launch reopens exactly what was open
+        self.save_session()
+        self.session.close()
+        self.history.close()
+        self.page_index.close()
+        self.download_scheduler.save()
+        self.settings.flush()
+        super().closeEvent(event)
+    
+    def restore_session(self):
+        tabs, current = self.session.load()
+        if not tabs:
+            return False
+        
+        # Placeholders only; a tab's view and page load are created when it is first selected
+        self.restoring_session = True
+        try:
+            current_index = 0
+            for tab in tabs:
+                placeholder = TabPlaceholder(next(self.tab_ids), tab.get("url", ""), tab.get("title", ""),
+                                             tab.get("history"))
+                index = self.tabs.addTab(placeholder, "New Tab")
+                self.update_tab_title(placeholder, placeholder.title or placeholder.url)
+                if tab["id"] == current:
+                    current_index = index
+            self.tabs.setCurrentIndex(current_index)
+        finally:
+            self.restoring_session = False
         
+        self.tab_changed(self.tabs.currentIndex())
+        # Tab ids were reassigned, so start a fresh journal from the restored state
+        self.save_session()
+        return True
+    
+    def materialize_tab(self, index):
+        placeholder = self.tabs.widget(index)
+        browser = self.create_browser_view(placeholder.tab_id)
+        if placeholder.history:
+            restore_history(browser.history(), placeholder.history)
+        if not placeholder.history or browser.url().toString() != placeholder.url:
+            browser.load(QUrl(placeholder.url))
+        
+        self.restoring_session = True
+        try:
+            self.tabs.insertTab(index, browser, "New Tab")
+            self.tabs.removeTab(index + 1)
+            self.tabs.setCurrentIndex(index)
+        finally:
+            self.restoring_session = False
+        self.update_tab_title(browser, placeholder.title or placeholder.url)
+        placeholder.deleteLater()
+        return browser
+    
     def handle_permission_request(self, url, feature):
-        # Always grant cursor lock permission for compatible websites
+        # Grant cursor lock permission for compatible websites while the setting is on
+        if not self.settings.cursor_lock:
+            return
         self.sender().setFeaturePermission(url, feature, QWebEnginePage.PermissionGrantedByUser)
     
     def tab_changed(self, index):
-        if index >= 0:
+        if index >= 0 and not self.restoring_session:
+            if isinstance(self.tabs.widget(index), TabPlaceholder):
+                self.materialize_tab(index)
             browser = self.tabs.widget(index)
+            self.record_session({"type": "select", "id": browser.tab_id})
+            # Thaw the tab before it is painted
+            self.lifecycle.tab_activated(browser)
             self.update_url_bar(browser.url(), browser)
             self.update_navigation_buttons()
+            self.update_request_stats()
+            self.record_btn.setChecked(browser.page().recorder is not None)
     
     def update_tab_title(self, browser, title):
         index = self.tabs.indexOf(browser)
@@ -596,9 +5395,33 @@ class Browser(QMainWindow):
     
     def close_tab(self, index):
         if self.tabs.count() > 1:
+            browser = self.tabs.widget(index)
+            self.record_session({"type": "close", "id": browser.tab_id})
             self.tabs.removeTab(index)
+            self.lifecycle.forget(browser)
+            # removeTab only hides the view; delete it so its renderer goes away
+            browser.deleteLater()
         else:
-            self.tabs.widget(0).load(QUrl(self.settings.value("homePage", "https://www.google.com")))
+            self.tabs.widget(0).load(QUrl(self.settings.home_page))
+    
+    def update_tab_lifecycle(self, browser):
+        index = self.tabs.indexOf(browser)
+        activity = self.lifecycle.activity(browser)
+        if index < 0 or activity is None:
+            return
+        frozen_minutes = activity.frozen_seconds() / 60
+        discarded_minutes = activity.discarded_seconds() / 60
+        lifecycle_state = browser.page().lifecycleState()
+        if lifecycle_state == QWebEnginePage.LifecycleState.Discarded:
+            state = "Discarded"
+        elif lifecycle_state == QWebEnginePage.LifecycleState.Frozen:
+            state = "Frozen"
+        else:
+            state = "Active"
+        self.tabs.setTabToolTip(index, f"{state} - frozen {frozen_minutes:.0f} min, "
+                                       f"discarded {discarded_minutes:.0f} min in total")
+        # Grey out frozen and discarded tabs; an invalid color restores the theme's default
+        self.tabs.tabBar().setTabTextColor(index, QColor(Qt.gray) if activity.inactive() else QColor())
     
     def current_browser(self):
         return self.tabs.currentWidget()
@@ -625,6 +5448,11 @@ class Browser(QMainWindow):
         self.url_bar.setCursorPosition(0)
         self.update_navigation_buttons()
     
+    def update_url_suggestions(self, text):
+        self.url_suggestions.setStringList([url for url, title in self.history.suggest(text)])
+        if self.url_suggestions.rowCount():
+            self.url_completer.complete()
+    
     def update_navigation_buttons(self):
         browser = self.current_browser()
         if browser:
@@ -632,7 +5460,7 @@ class Browser(QMainWindow):
             self.forward_btn.setEnabled(browser.history().canGoForward())
     
     def navigate_home(self):
-        self.current_browser().load(QUrl(self.settings.value("homePage", "https://www.google.com")))
+        self.current_browser().load(QUrl(self.settings.home_page))
     
     def update_progress(self, progress):
         self.progress_bar.setValue(progress)
@@ -647,25 +5475,51 @@ class Browser(QMainWindow):
         self.bookmarks_manager.add_bookmark(title, url)
     
     def show_bookmarks(self):
-        self.bookmarks_manager.load_bookmarks()
         self.bookmarks_manager.show()
     
+    def show_page_search(self):
+        self.page_search.show()
+        self.page_search.raise_()
+    
+    def record_visit(self, browser, ok):
+        if ok:
+            self.history.record_visit(browser.url().toString(), browser.page().title())
+    
+    def index_page_text(self, browser, ok):
+        # The text arrives asynchronously from the renderer; the index does the rest off the UI thread
+        if not ok:
+            return
+        url = browser.url().toString()
+        title = browser.page().title()
+        browser.page().toPlainText(lambda text: self.page_index.record(url, title, text))
+    
     def show_downloads(self):
         self.download_manager.show()
     
+    def show_task_manager(self):
+        self.task_manager.show()
+        self.task_manager.raise_()
+    
     def handle_download(self, download):
         # Set download directory
-        download_dir = self.settings.value("downloadDir", os.path.expanduser("~/Downloads"))
-        download.setDownloadDirectory(download_dir)
+        download_dir = self.settings.download_dir
         
         # Make sure directory exists
         os.makedirs(download_dir, exist_ok=True)
         
+        # Large files go over parallel range requests instead, if the server allows
+        if self.use_segmented_download(download):
+            url, filename, total = download.url().toString(), download.downloadFileName(), download.totalBytes()
+            download.cancel()
+            download = SegmentedDownloadRequest(url, filename, total,
+                                                self.settings.download_segments, self)
+            download.fallbackRequested.connect(lambda download=download: self.segmented_fallback(download))
+        
         # Set up download to show notifications on completion
         download.isFinishedChanged.connect(lambda: self.notify_download_finished(download))
         
-        # Accept download
-        download.accept()
+        # Accept it and queue it behind the running downloads
+        self.download_scheduler.add(download, download_dir)
         
         # Add to download manager
         self.download_manager.add_download(download)
@@ -676,158 +5530,130 @@ class Browser(QMainWindow):
         # Update status bar
         self.status_bar.showMessage(f"Downloading: {download.downloadFileName()}", 3000)
         
+    def use_segmented_download(self, download):
+        url = download.url().toString()
+        if url in self.segmented_bypass:
+            self.segmented_bypass.discard(url)
+            return False
+        return (self.settings.segmented_downloads
+                and url.startswith(("http://", "https://"))
+                and not download.isSavePageDownload()
+                and download.totalBytes() >= SegmentedDownloadRequest.MIN_SIZE)
+    
+    def segmented_fallback(self, download):
+        # The server cannot serve ranges; hand the download back to Chromium
+        self.segmented_bypass.add(download.url().toString())
+        self.download_scheduler.request_again(download.id())
+    
     def notify_download_finished(self, download):
-        if download.isFinished():
+        if download.state() == QWebEngineDownloadRequest.DownloadCompleted:
             filename = download.downloadFileName()
             self.status_bar.showMessage(f"Download complete: {filename}", 5000)
             # Force update in download manager
             self.download_manager.show()
     
     def show_settings(self):
-        settings_dialog = SettingsDialog(self.settings, self)
-        settings_dialog.settingsChanged.connect(self.apply_theme)
+        browser = self.current_browser()
+        site = browser.url().host() if isinstance(browser, QWebEngineView) else ""
+        settings_dialog = SettingsDialog(self.settings, self.browser_profile, site, self)
+        settings_dialog.setAttribute(Qt.WA_DeleteOnClose)
         settings_dialog.exec()
     
+    def site_cleared(self, site, removed):
+        self.status_bar.showMessage(f"Cleared cookies and {removed} cached files for {site}", 5000)
+    
+    def setting_changed(self, name):
+        # Apply just the setting that changed. Open pages are never recreated
+        # or reloaded; settings not handled here are read where they are used
+        if name == "dark_mode":
+            self.apply_theme()
+        elif name == "ad_blocker":
+            self.ad_block_btn.setChecked(self.settings.ad_blocker)
+            self.set_ad_blocking(self.settings.ad_blocker)
+        elif name == "autoplay_media":
+            self.apply_web_settings()
+        elif name in ("max_downloads", "download_rate_kb", "download_total_rate_kb"):
+            self.download_scheduler.load_limits()
+        elif name in ("cache_type", "cache_size_mb"):
+            self.browser_profile.apply_cache_settings()
+        elif name in ("profile_name", "profile_dir", "ephemeral_profile"):
+            self.status_bar.showMessage("The profile changes when the browser is restarted", 5000)
+        elif name == "engine_preset" or name in EngineConfig.OPTIONS:
+            self.status_bar.showMessage("Engine options apply when the browser is restarted", 5000)
+    
     def apply_theme(self):
-        if self.settings.value("darkMode", True, type=bool):
-            self.set_dark_theme()
-        else:
-            self.set_light_theme()
-            
-        # Update ad blocker based on settings
-        if self.settings.value("adBlocker", True, type=bool):
-            QWebEngineProfile.defaultProfile().setUrlRequestInterceptor(self.ad_blocker)
-        else:
-            QWebEngineProfile.defaultProfile().setUrlRequestInterceptor(None)
-            
-        # Update cursor lock permissions on existing tabs if tabs are already created
-        if hasattr(self, 'tabs'):
-            for i in range(self.tabs.count()):
-                browser = self.tabs.widget(i)
-                if browser and isinstance(browser, QWebEngineView):
-                    # Re-create the page with proper settings
-                    url = browser.url()
-                    # Remember the history
-                    history = browser.history()
-                    
-                    # Create new page with proper settings
-                    custom_page = CustomWebEnginePage(QWebEngineProfile.defaultProfile(), browser)
-                    browser.setPage(custom_page)
-                    
-                    # Reload the current URL
-                    browser.load(url)
-    
-    def set_dark_theme(self):
-        # Set dark palette
-        palette = QPalette()
-        palette.setColor(QPalette.Window, QColor(53, 53, 53))
-        palette.setColor(QPalette.WindowText, Qt.white)
-        palette.setColor(QPalette.Base, QColor(25, 25, 25))
-        palette.setColor(QPalette.AlternateBase, QColor(53, 53, 53))
-        palette.setColor(QPalette.ToolTipBase, Qt.white)
-        palette.setColor(QPalette.ToolTipText, Qt.white)
-        palette.setColor(QPalette.Text, Qt.white)
-        palette.setColor(QPalette.Button, QColor(53, 53, 53))
-        palette.setColor(QPalette.ButtonText, Qt.white)
-        palette.setColor(QPalette.BrightText, Qt.red)
-        palette.setColor(QPalette.Link, QColor(42, 130, 218))
-        palette.setColor(QPalette.Highlight, QColor(42, 130, 218))
-        palette.setColor(QPalette.HighlightedText, Qt.black)
-        
-        # Apply palette
-        QApplication.setPalette(palette)
-        
-        # Style sheets for rounded corners
-        self.setStyleSheet("""
-            QMainWindow, QDialog {
-                background-color: #353535;
-            }
-            QTabWidget::pane {
-                border: 1px solid #6c6c6c;
-                border-radius: 8px;
-                top: -1px;
-            }
-            QTabBar::tab {
-                background-color: #2a2a2a;
-                color: #ffffff;
-                border: 1px solid #6c6c6c;
-                border-bottom: none;
-                border-top-left-radius: 6px;
-                border-top-right-radius: 6px;
-                padding: 6px 12px;
-                margin-right: 2px;
-            }
-            QTabBar::tab:selected {
-                background-color: #3a3a3a;
-                border-bottom: none;
-            }
-            QLineEdit, QPushButton, QListWidget {
-                border: 1px solid #6c6c6c;
-                border-radius: 6px;
-                padding: 3px;
-                background-color: #2a2a2a;
-                color: white;
-            }
-            QPushButton:hover {
-                background-color: #3a3a3a;
-            }
-            QToolBar {
-                background-color: #2a2a2a;
-                border-radius: 8px;
-            }
-            QStatusBar {
-                background-color: #2a2a2a;
-                color: white;
-            }
-        """)
-    
-    def set_light_theme(self):
-        # Reset to default palette
-        QApplication.setPalette(QApplication.style().standardPalette())
-        
-        # Style sheets for rounded corners
-        self.setStyleSheet("""
-            QTabWidget::pane {
-                border: 1px solid #b5b5b5;
-                border-radius: 8px;
-                top: -1px;
-            }
-            QTabBar::tab {
-                background-color: #e6e6e6;
-                border: 1px solid #b5b5b5;
-                border-bottom: none;
-                border-top-left-radius: 6px;
-                border-top-right-radius: 6px;
-                padding: 6px 12px;
-                margin-right: 2px;
-            }
-            QTabBar::tab:selected {
-                background-color: #ffffff;
-                border-bottom: none;
-            }
-            QLineEdit, QPushButton, QListWidget {
-                border: 1px solid #b5b5b5;
-                border-radius: 6px;
-                padding: 3px;
-            }
-            QPushButton:hover {
-                background-color: #f0f0f0;
-            }
-            QToolBar {
-                border-radius: 8px;
-            }
-        """)
+        # Palette and style sheets only; pages are untouched
+        self.theme.apply("dark" if self.settings.dark_mode else "light")
+    
+    def apply_web_settings(self):
+        # Pages inherit attributes from the profile's QWebEngineSettings, so setting
+        # them here updates every open page in place. None of these need a reload
+        web_settings = self.profile.settings()
+        web_settings.setAttribute(QWebEngineSettings.LocalContentCanAccessRemoteUrls, True)
+        web_settings.setAttribute(QWebEngineSettings.PluginsEnabled, True)
+        web_settings.setAttribute(QWebEngineSettings.PlaybackRequiresUserGesture,
+                                  not self.settings.autoplay_media)
+    
+    def set_ad_blocking(self, enabled):
+        # Swap each open page's interceptor in or out; placeholders pick it up when created
+        self.ad_blocker.enabled = enabled
+        for i in range(self.tabs.count()):
+            browser = self.tabs.widget(i)
+            if isinstance(browser, QWebEngineView):
+                browser.page().set_ad_blocking(enabled)
 
 
 if __name__ == "__main__":
-    app = QApplication(sys.argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s: %(message)s")
+    
+    # Parsed before QApplication exists, since engine flags must be set before WebEngine
+    # starts. Anything unrecognised goes on to Qt and Chromium; Qt options that take a
+    # value need the -option=value form
+    parser = argparse.ArgumentParser(prog="web.py")
+    parser.add_argument("urls", nargs="*", help="pages to open in new tabs")
+    parser.add_argument("--profile", help="named profile to use instead of the one in settings")
+    parser.add_argument("--ephemeral", action="store_true",
+                        help="keep cookies, cache and history in memory only, for kiosk sessions")
+    parser.add_argument("--engine-preset", choices=list(EngineConfig.PRESETS),
+                        help="Chromium process and rendering preset, instead of the one in settings")
+    parser.add_argument("--profile-startup", action="store_true",
+                        help="print a timeline of startup phases once the first page has loaded")
+    parser.add_argument("--automation-port", type=int, metavar="PORT",
+                        help="serve the automation API on 127.0.0.1:PORT (needs Flask)")
+    render = parser.add_argument_group("batch rendering")
+    render.add_argument("--render", metavar="FILE",
+                        help="render each URL in FILE (one per line) without a window, then exit")
+    render.add_argument("--out", default="renders", help="directory for rendered files")
+    render.add_argument("--format", choices=BatchRenderer.FORMATS, default="pdf")
+    render.add_argument("--concurrency", type=int, default=4, help="pages loading at once")
+    render.add_argument("--timeout", type=float, default=30, help="seconds allowed for each page to load")
+    render.add_argument("--viewport", type=viewport_size, default=QSize(1280, 800), metavar="WxH")
+    render.add_argument("--full-page", action="store_true", help="grab the whole page height, not just the viewport")
+    args, qt_args = parser.parse_known_args()
+    if args.concurrency < 1:
+        parser.error("--concurrency must be at least 1")
+    startup.enabled = args.profile_startup
+    if args.render:
+        os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    preset = args.engine_preset or ("headless-server" if args.render else None)
+    EngineConfig.from_settings(QSettings("ModernBrowser", "WebBrowser"), preset).apply()
+    
+    app = QApplication(sys.argv[:1] + qt_args)
+    startup.mark("QApplication created")
+    if args.render:
+        sys.exit(render_urls(app, args))
     
     # Set application style
     app.setStyle("Fusion")
     
     # Create and show browser
-    browser = Browser()
+    browser = Browser(args.urls, args.profile, args.ephemeral or None)
     browser.show()
     
+    if args.automation_port is not None:
+        automation = AutomationServer(browser, args.automation_port, browser)
+        if automation.start():
+            app.aboutToQuit.connect(automation.stop)
+    
     # Run application
-    sys.exit(app.exec())
\ No newline at end of file
+    sys.exit(app.exec())